@@ -41,6 +41,9 @@ celery_app.conf.update(
     timezone="Asia/Kolkata",
     enable_utc=True,
     result_expires=86400,
+    # imported by the worker at startup, after this module has loaded
+    # (app.payroll.tasks imports celery_app from here)
+    include=["app.payroll.tasks"],
 )
 
 # 👇 make sure the task module is imported and registered
@@ -0,0 +1,89 @@
+"""
+Parity and latency check of the compiled attrition scorer (compiled.py)
+against the saved sklearn pipeline.
+
+    python check_compiled.py [--rows 2000] [--tolerance 1e-6]
+
+Scores rows of the training CSV plus synthetic probes (every category and
+an unknown one, null numerics) both ways, checks that records missing a
+column are rejected by both, then times single-row scoring. Exits non-zero
+when the two disagree.
+"""
+import argparse
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from compiled import CompiledPipeline, max_parity_error, probe_records
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="models/attrition.joblib")
+    parser.add_argument("--data", default="data/synthetic_employee_data_final.csv")
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--tolerance", type=float, default=1e-6)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)["model"]
+    compiled = CompiledPipeline.from_pipeline(model)
+    if compiled is None:
+        print("❌ Pipeline layout not supported by the compiled scorer")
+        return 1
+
+    df = pd.read_csv(args.data).drop(columns=["EmployeeID", "Attrition"], errors="ignore").head(args.rows)
+    records = df.to_dict("records")
+    probes = probe_records(compiled, 64)
+    for i, probe in enumerate(probes[::8]):
+        probe[compiled.numeric[i % len(compiled.numeric)][0]] = None
+
+    errors = {
+        "dataset (batch)": max_parity_error(compiled, model, records),
+        "dataset (row by row)": max(max_parity_error(compiled, model, [r]) for r in records[:200]),
+        "probes": max_parity_error(compiled, model, probes),
+    }
+    for name, err in errors.items():
+        print(f"{name}: max |diff| = {err:.3g}")
+
+    # a record without a column must fail both ways, never be scored
+    scored = []
+    for col in sorted(compiled.columns):
+        probe = {k: v for k, v in records[0].items() if k != col}
+        outcomes = []
+        for fn in (compiled.predict_proba, lambda r: model.predict_proba(pd.DataFrame.from_records(r))):
+            try:
+                fn([probe])
+                outcomes.append("scored")
+            except ValueError:
+                outcomes.append("rejected")
+        if outcomes != ["rejected", "rejected"]:
+            scored.append(f"{col} (compiled {outcomes[0]}, pipeline {outcomes[1]})")
+    print(f"missing-column probes: {len(compiled.columns) - len(scored)}/{len(compiled.columns)} rejected by both")
+
+    def p50(fn):
+        times = []
+        for i in range(args.repeat):
+            rec = [records[i % len(records)]]
+            t = time.perf_counter()
+            fn(rec)
+            times.append(time.perf_counter() - t)
+        return np.median(times) * 1e3
+
+    print(f"p50 single row: pipeline {p50(lambda r: model.predict_proba(pd.DataFrame.from_records(r))):.3f} ms, "
+          f"compiled {p50(compiled.predict_proba):.3f} ms")
+
+    if max(errors.values()) > args.tolerance or scored:
+        for probe in scored:
+            print(f"❌ record missing {probe}")
+        print("❌ Compiled scorer does not match the pipeline")
+        return 1
+    print("✅ Compiled scorer matches the pipeline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+
+def _is_passthrough(transformer) -> bool:
+    if isinstance(transformer, str):
+        return transformer == "passthrough"
+    # a fitted "passthrough" is an identity FunctionTransformer on newer scikit-learn
+    return type(transformer).__name__ == "FunctionTransformer" and transformer.func is None
+
+
+class CompiledPipeline:
+    """
+    The saved Pipeline(ColumnTransformer(num passthrough, cat OneHotEncoder),
+    XGBClassifier) flattened for inference without pandas.
+
+    At load time the numeric column order and the one-hot vocabularies are
+    read from the fitted ColumnTransformer; at request time records are
+    written straight into a preallocated float32 array (one per thread)
+    and scored with the booster's inplace_predict. Null numeric values
+    become NaN (XGBoost's missing value); unknown categories encode as all
+    zeros, as OneHotEncoder(handle_unknown="ignore") does. A record
+    without one of the columns raises ValueError, as the pipeline does.
+
+    from_pipeline() returns None for pipelines it does not understand;
+    callers then keep using predict_proba.
+    """
+
+    def __init__(self, booster, n_features: int, numeric, categorical, iteration_range=(0, 0), missing=np.nan):
+        self.booster = booster
+        self.n_features = n_features
+        self.numeric = numeric          # [(column, output index)]
+        self.categorical = categorical  # [(column, {category: output index})]
+        self.iteration_range = iteration_range
+        self.missing = missing
+        self.columns = frozenset(col for col, _ in numeric) | frozenset(col for col, _ in categorical)
+        self._local = threading.local()
+
+    @classmethod
+    def from_pipeline(cls, pipeline) -> Optional["CompiledPipeline"]:
+        try:
+            pre = pipeline.named_steps["preprocessor"]
+            clf = pipeline.named_steps["classifier"]
+            booster = clf.get_booster()
+        except (AttributeError, KeyError):
+            return None
+        if getattr(clf, "objective", None) != "binary:logistic":
+            return None
+
+        numeric, categorical = [], []
+        for name, transformer, columns in pre.transformers_:
+            if name == "remainder":
+                if not (isinstance(transformer, str) and transformer == "drop"):
+                    return None
+                continue
+            offset = pre.output_indices_[name].start
+            columns = list(columns)
+            if _is_passthrough(transformer):
+                numeric.extend((col, offset + i) for i, col in enumerate(columns))
+            elif type(transformer).__name__ == "OneHotEncoder":
+                if transformer.drop is not None or transformer.handle_unknown != "ignore" \
+                        or getattr(transformer, "infrequent_categories_", None):
+                    return None
+                for col, cats in zip(columns, transformer.categories_):
+                    categorical.append((col, {c: offset + i for i, c in enumerate(cats)}))
+                    offset += len(cats)
+            else:
+                return None
+
+        n_features = booster.num_features()
+        best = getattr(clf, "best_iteration", None)
+        return cls(booster, n_features, numeric, categorical,
+                   iteration_range=(0, best + 1) if best is not None else (0, 0),
+                   missing=clf.missing)
+
+    def _buffer(self, n: int) -> np.ndarray:
+        buf = getattr(self._local, "buf", None)
+        if buf is None or buf.shape[0] < n:
+            buf = self._local.buf = np.empty((max(n, 1), self.n_features), dtype=np.float32)
+        return buf[:n]
+
+    def encode(self, employees: List[dict]) -> np.ndarray:
+        """Feature matrix for `employees`, in the column layout the booster was trained on."""
+        x = self._buffer(len(employees))
+        x.fill(0.0)
+        for row, employee in zip(x, employees):
+            if not self.columns <= employee.keys():
+                raise ValueError(f"columns are missing: {sorted(self.columns - employee.keys())}")
+            for col, idx in self.numeric:
+                v = employee.get(col)
+                row[idx] = np.nan if v is None else float(v)
+            for col, vocab in self.categorical:
+                idx = vocab.get(employee.get(col))
+                if idx is not None:
+                    row[idx] = 1.0
+        return x
+
+    def predict_proba(self, employees: List[dict]) -> np.ndarray:
+        """Probability of the positive class for each record."""
+        x = self.encode(employees)
+        return self.booster.inplace_predict(x, iteration_range=self.iteration_range, missing=self.missing)
+
+
+def max_parity_error(compiled: CompiledPipeline, pipeline, employees: List[dict]) -> float:
+    """Largest |compiled - pipeline.predict_proba| over `employees`."""
+    import pandas as pd
+    expected = pipeline.predict_proba(pd.DataFrame.from_records(employees))[:, 1]
+    return float(np.abs(compiled.predict_proba(employees) - expected).max())
+
+
+def probe_records(compiled: CompiledPipeline, n: int = 32) -> List[dict]:
+    """Synthetic records cycling through every known category (plus an unknown one)."""
+    records = []
+    for i in range(n):
+        record = {col: float(i * 7 % 50 + j) for j, (col, _) in enumerate(compiled.numeric)}
+        for col, vocab in compiled.categorical:
+            cats = list(vocab) + ["__unknown__"]
+            record[col] = cats[i % len(cats)]
+        records.append(record)
+    return records
@@ -1,23 +1,162 @@
-from fastapi import FastAPI
+import asyncio
+import os
+from typing import List
+
+from fastapi import FastAPI, HTTPException
 import joblib
 import pandas as pd
 
+from compiled import CompiledPipeline, max_parity_error, probe_records
+
 app = FastAPI()
 
 saved = joblib.load("models/attrition.joblib")
 model = saved["model"]
 threshold = saved["threshold"]
 
+# every record must carry these columns (an explicit null is fine)
+FEATURES = list(getattr(model, "feature_names_in_", []))
+
+# pandas-free scoring path; only used when it matches the sklearn pipeline
+PARITY_TOLERANCE = 1e-6
+compiled = CompiledPipeline.from_pipeline(model) if os.getenv("ATTRITION_COMPILED", "1") != "0" else None
+if compiled is not None and max_parity_error(compiled, model, probe_records(compiled)) > PARITY_TOLERANCE:
+    print("⚠️ Compiled attrition scorer disagrees with the pipeline; using predict_proba")
+    compiled = None
+
+# Concurrent single requests are scored together: the first waits at most
+# BATCH_WAIT_MS for others to join, and a batch holds at most MAX_BATCH rows.
+MAX_BATCH = int(os.getenv("ATTRITION_MAX_BATCH", "256"))
+BATCH_WAIT_MS = float(os.getenv("ATTRITION_BATCH_WAIT_MS", "2"))
+
+
+def score(employees: List[dict]):
+    """Attrition probabilities for a list of employee records, in one model call."""
+    if compiled is not None:
+        return compiled.predict_proba(employees)
+    df = pd.DataFrame.from_records(employees)
+    return model.predict_proba(df)[:, 1]
+
+
+def check_features(employees: List[dict]):
+    """
+    Reject records missing a model column up front (422): batched with
+    complete records, DataFrame.from_records would fill the gap with NaN
+    and score them instead of failing as a lone record does.
+    """
+    errors = []
+    for i, employee in enumerate(employees):
+        missing = [f for f in FEATURES if f not in employee]
+        if missing:
+            errors.append({"index": i, "missing_columns": missing})
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+
+
+def result(proba) -> dict:
+    return {
+        "attrition_probability": float(proba),
+        "attrition_prediction": int(proba >= threshold)
+    }
+
+
+class MicroBatcher:
+    def __init__(self, max_batch: int = MAX_BATCH, wait_ms: float = BATCH_WAIT_MS):
+        self.max_batch = max_batch
+        self.wait = wait_ms / 1000.0
+        self.queue = None
+        self.worker = None
+
+    def start(self):
+        if self.worker is None:
+            self.queue = asyncio.Queue()
+            self.worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
+
+    async def submit(self, employee: dict) -> float:
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((employee, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # model call runs off the event loop so requests keep queueing meanwhile
+            await loop.run_in_executor(None, self._score, batch)
+
+    @staticmethod
+    def _score(batch):
+        try:
+            probas = score([employee for employee, _ in batch])
+            outcomes = [(future, proba, None) for (_, future), proba in zip(batch, probas)]
+        except Exception:
+            # a malformed record must not fail the requests batched with it
+            outcomes = []
+            for employee, future in batch:
+                try:
+                    outcomes.append((future, score([employee])[0], None))
+                except Exception as e:
+                    outcomes.append((future, None, e))
+        for future, proba, error in outcomes:
+            future.get_loop().call_soon_threadsafe(_resolve, future, proba, error)
+
+
+def _resolve(future, proba, error):
+    if future.done():  # client went away
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(proba)
+
+
+batcher = MicroBatcher()
+
+
+@app.on_event("startup")
+async def start_batcher():
+    batcher.start()
+
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    await batcher.stop()
+
+
 @app.get("/")
 def root():
     return {"message": "HRMS Attrition Prediction API is running 🚀"}
 
 @app.post("/predict_attrition/")
-def predict_attrition(employee: dict):
-    df = pd.DataFrame([employee])
-    proba = model.predict_proba(df)[:, 1][0]
-    pred = int(proba >= threshold)
-    return {
-        "attrition_probability": float(proba),
-        "attrition_prediction": pred
-    }
+async def predict_attrition(employee: dict):
+    check_features([employee])
+    proba = await batcher.submit(employee)
+    return result(proba)
+
+@app.post("/predict_attrition/batch")
+def predict_attrition_batch(employees: List[dict]):
+    """Score many employees (e.g. the whole company) in one call; results keep the request order."""
+    if not employees:
+        return {"count": 0, "predictions": []}
+    check_features(employees)
+    probas = score(employees)
+    predictions = [result(p) for p in probas]
+    for employee, prediction in zip(employees, predictions):
+        if "EmployeeID" in employee:
+            prediction["EmployeeID"] = employee["EmployeeID"]
+    return {"count": len(predictions), "predictions": predictions}
@@ -1,7 +1,14 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
 import pandas as pd
 import xgboost as xgb
 import joblib
-from sklearn.model_selection import train_test_split, RandomizedSearchCV
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split, ParameterSampler, StratifiedKFold
 from sklearn.preprocessing import OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
@@ -42,50 +49,184 @@ def build_preprocessor(X, categorical_features):
 # --------------------------
 # Step 3: Model & Hyperparameter Tuning
 # --------------------------
-def tune_model(preprocessor, scale_pos_weight, X_train, y_train):
-    """Tunes XGBoost model with RandomizedSearchCV for best performance."""
-    pipeline = Pipeline(steps=[
-        ("preprocessor", preprocessor),
-        ("classifier", xgb.XGBClassifier(
-            use_label_encoder=False,
-            eval_metric="logloss",
-            random_state=42,
-            scale_pos_weight=scale_pos_weight
-        ))
-    ])
-
-    param_dist = {
-        "classifier__max_depth": [3, 5, 7, 9],
-        "classifier__learning_rate": [0.01, 0.05, 0.1, 0.2],
-        "classifier__n_estimators": [100, 200, 500, 800],
-        "classifier__subsample": [0.6, 0.8, 1.0],
-        "classifier__colsample_bytree": [0.6, 0.8, 1.0],
-        "classifier__gamma": [0, 0.25, 0.5, 1],
-        "classifier__min_child_weight": [1, 3, 5]
-    }
-
-    search = RandomizedSearchCV(
-        pipeline,
-        param_distributions=param_dist,
-        n_iter=15,
-        scoring="f1",
-        cv=3,
-        verbose=2,
-        n_jobs=-1,
-        random_state=42
+PARAM_DIST = {
+    "classifier__max_depth": [3, 5, 7, 9],
+    "classifier__learning_rate": [0.01, 0.05, 0.1, 0.2],
+    "classifier__n_estimators": [100, 200, 500, 800],
+    "classifier__subsample": [0.6, 0.8, 1.0],
+    "classifier__colsample_bytree": [0.6, 0.8, 1.0],
+    "classifier__gamma": [0, 0.25, 0.5, 1],
+    "classifier__min_child_weight": [1, 3, 5]
+}
+
+SEARCH_STRATEGIES = ("halving", "early_stopping", "random")
+HALVING_CANDIDATES = 18
+HALVING_FACTOR = 3
+HALVING_MIN_TREES = 50
+MAX_TREES = max(PARAM_DIST["classifier__n_estimators"])
+EARLY_STOPPING_ROUNDS = 30
+
+
+def build_classifier(scale_pos_weight, **params):
+    return xgb.XGBClassifier(
+        use_label_encoder=False,
+        eval_metric="logloss",
+        random_state=42,
+        scale_pos_weight=scale_pos_weight,
+        **params
     )
 
-    search.fit(X_train, y_train)
+
+class SearchTrace:
+    """
+    Append-only JSONL log of fold scores. A restarted search reads it back
+    and skips every (candidate, trees, fold) already scored on the same data.
+    """
+
+    def __init__(self, path, data_key):
+        self.path = path
+        self.data_key = data_key
+        self.scores = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line of an interrupted run
+                    self.scores[entry["key"]] = entry
+        self.resumed = len(self.scores)
+
+    def key(self, strategy, params, n_estimators, fold):
+        return json.dumps([self.data_key, strategy, params, n_estimators, fold], sort_keys=True, default=str)
+
+    def get(self, key):
+        return self.scores.get(key)
+
+    def add(self, key, entry):
+        entry = dict(entry, key=key)
+        self.scores[key] = entry
+        if self.path:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+
+
+def fold_features(preprocessor, memory, X_train, X_valid):
+    """
+    Fit the preprocessor on a fold. The Pipeline memory= cache makes every
+    candidate (and every resumed run) reuse the fold's fitted ColumnTransformer.
+    """
+    pipe = Pipeline(steps=[("preprocessor", clone(preprocessor)), ("classifier", "passthrough")], memory=memory)
+    pipe.fit(X_train)
+    return pipe.transform(X_train), pipe.transform(X_valid)
+
+
+def tune_model(preprocessor, scale_pos_weight, X_train, y_train, strategy="halving",
+               cache_dir=None, trace_path=None, n_iter=15, cv=3):
+    """
+    Tunes XGBoost with 3-fold CV on F1 and refits the best candidate.
+
+    strategy:
+      "halving"        successive halving over the number of trees: HALVING_CANDIDATES
+                       candidates start with HALVING_MIN_TREES trees and the best third
+                       go on with three times as many, until HALVING_FACTOR are left
+                       (or MAX_TREES is reached); the winner keeps its tree count
+      "early_stopping" n_iter candidates, each fold trains up to MAX_TREES trees and
+                       stops after EARLY_STOPPING_ROUNDS rounds without improvement
+      "random"         n_iter candidates scored as sampled (the RandomizedSearchCV run)
+
+    Fold preprocessors are cached in cache_dir (Pipeline memory=) and every
+    fold score is appended to trace_path, so an interrupted search resumes.
+    """
+    if strategy not in SEARCH_STRATEGIES:
+        raise ValueError(f"strategy must be one of {SEARCH_STRATEGIES}")
+    memory = joblib.Memory(cache_dir, verbose=0) if cache_dir else None
+    trace = SearchTrace(trace_path, joblib.hash((X_train, y_train, scale_pos_weight)))
+    if trace.resumed:
+        print(f"Resuming search: {trace.resumed} fold scores read from {trace_path}")
+
+    folds = []
+    for train_idx, valid_idx in StratifiedKFold(n_splits=cv).split(X_train, y_train):
+        Xt, Xv = fold_features(preprocessor, memory, X_train.iloc[train_idx], X_train.iloc[valid_idx])
+        folds.append((Xt, y_train.iloc[train_idx], Xv, y_train.iloc[valid_idx]))
+
+    # halving: each rung keeps boosting the previous rung's fold models
+    # instead of training the larger tree count from scratch
+    boosters = {}
+
+    def evaluate(params, n_estimators):
+        """Mean F1 over the folds (and the mean best iteration with early stopping)."""
+        scores, best_iterations = [], []
+        for i, (Xt, yt, Xv, yv) in enumerate(folds):
+            key = trace.key(strategy, params, n_estimators, i)
+            entry = trace.get(key)
+            if entry is None:
+                start = time.perf_counter()
+                prev_trees, prev = boosters.get(trace.key(strategy, params, None, i), (0, None))
+                clf = build_classifier(scale_pos_weight, n_estimators=n_estimators - prev_trees,
+                                       **{k.split("__", 1)[1]: v for k, v in params.items()})
+                if strategy == "early_stopping":
+                    clf.set_params(early_stopping_rounds=EARLY_STOPPING_ROUNDS)
+                    clf.fit(Xt, yt, eval_set=[(Xv, yv)], verbose=False)
+                else:
+                    clf.fit(Xt, yt, xgb_model=prev)
+                if strategy == "halving":
+                    boosters[trace.key(strategy, params, None, i)] = (n_estimators, clf.get_booster())
+                entry = {
+                    "params": params, "n_estimators": n_estimators, "fold": i,
+                    "f1": f1_score(yv, clf.predict(Xv)),
+                    "best_iteration": getattr(clf, "best_iteration", None) if strategy == "early_stopping" else None,
+                    "seconds": round(time.perf_counter() - start, 3)
+                }
+                trace.add(key, entry)
+            scores.append(entry["f1"])
+            if entry.get("best_iteration") is not None:
+                best_iterations.append(entry["best_iteration"] + 1)
+        return float(np.mean(scores)), (int(round(np.mean(best_iterations))) if best_iterations else n_estimators)
+
+    if strategy == "halving":
+        dist = {k: v for k, v in PARAM_DIST.items() if k != "classifier__n_estimators"}
+        candidates = list(ParameterSampler(dist, n_iter=HALVING_CANDIDATES, random_state=42))
+        n_estimators = HALVING_MIN_TREES
+        while True:
+            ranked = sorted(candidates, key=lambda p: evaluate(p, n_estimators)[0], reverse=True)
+            print(f"  {len(candidates)} candidates x {n_estimators} trees: best F1={evaluate(ranked[0], n_estimators)[0]:.4f}")
+            if len(ranked) <= HALVING_FACTOR or n_estimators >= MAX_TREES:
+                break
+            candidates = ranked[:max(1, -(-len(ranked) // HALVING_FACTOR))]
+            survivors = {trace.key(strategy, p, None, i) for p in candidates for i in range(len(folds))}
+            for k in [k for k in boosters if k not in survivors]:
+                del boosters[k]
+            n_estimators = min(n_estimators * HALVING_FACTOR, MAX_TREES)
+        best_params = dict(ranked[0], classifier__n_estimators=n_estimators)
+    else:
+        dist = PARAM_DIST
+        if strategy == "early_stopping":
+            dist = {k: v for k, v in PARAM_DIST.items() if k != "classifier__n_estimators"}
+        results = []
+        for params in ParameterSampler(dist, n_iter=n_iter, random_state=42):
+            n_estimators = params.pop("classifier__n_estimators", MAX_TREES)
+            score, trees = evaluate(params, n_estimators)
+            results.append((score, dict(params, classifier__n_estimators=trees)))
+        best_score, best_params = max(results, key=lambda r: r[0])
 
     print("\n✅ Best Hyperparameters:")
-    print(search.best_params_)
-    return search.best_estimator_
+    print(best_params)
+
+    pipeline = Pipeline(steps=[
+        ("preprocessor", clone(preprocessor)),
+        ("classifier", build_classifier(scale_pos_weight))
+    ], memory=memory)
+    pipeline.set_params(**best_params)
+    pipeline.fit(X_train, y_train)
+    # the cache location is a training-time detail; don't pickle it with the model
+    return pipeline.set_params(memory=None)
 
 
 # --------------------------
 # Step 4: Train & Find Best Threshold
 # --------------------------
-def train_and_find_threshold(model, X, y, thresholds=[0.3, 0.35, 0.4, 0.5], optimize_for="f1"):
+def train_and_find_threshold(model, X, y, thresholds=[0.3, 0.35, 0.4, 0.5], optimize_for="f1", **search):
     """Trains model, evaluates different probability thresholds, and selects the best one."""
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.2, random_state=42, stratify=y
@@ -95,7 +236,7 @@ def train_and_find_threshold(model, X, y, thresholds=[0.3, 0.35, 0.4, 0.5], opti
     scale_pos_weight = (y == 0).sum() / (y == 1).sum()
 
     # Tune model
-    model = tune_model(model.named_steps["preprocessor"], scale_pos_weight, X_train, y_train)
+    model = tune_model(model.named_steps["preprocessor"], scale_pos_weight, X_train, y_train, **search)
 
     # Predict probabilities
     y_proba = model.predict_proba(X_test)[:, 1]
@@ -130,7 +271,20 @@ def train_and_find_threshold(model, X, y, thresholds=[0.3, 0.35, 0.4, 0.5], opti
 # --------------------------
 def main():
     """Main training function for HR Attrition Model."""
-    df = load_data("C:\\Users\\PRATHAM\\OneDrive\\Desktop\\HRMS--Hackathon\\backend\\ML_models\\employee_attrition\\data\\synthetic_employee_data_final.csv")
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Train the HR attrition model")
+    parser.add_argument("--data", default=os.path.join(here, "data", "synthetic_employee_data_final.csv"))
+    parser.add_argument("--output", default=os.path.join(here, "models", "attrition.joblib"))
+    parser.add_argument("--strategy", choices=SEARCH_STRATEGIES, default="halving",
+                        help="hyperparameter search (default: successive halving)")
+    parser.add_argument("--cache-dir", default=os.path.join(here, "models", ".search_cache"),
+                        help="fitted-preprocessor cache (Pipeline memory=); '' disables it")
+    parser.add_argument("--trace", default=os.path.join(here, "models", "search_trace.jsonl"),
+                        help="fold scores of the search; a rerun resumes from it ('' disables it)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    df = load_data(args.data)
     X, y = split_features_target(df)
 
     # Updated categorical columns (based on cleaned dataset)
@@ -143,16 +297,14 @@ def main():
     # Base model
     dummy_model = Pipeline(steps=[
         ("preprocessor", preprocessor),
-        ("classifier", xgb.XGBClassifier(
-            use_label_encoder=False,
-            eval_metric="logloss",
-            random_state=42,
-            scale_pos_weight=scale_pos_weight
-        ))
+        ("classifier", build_classifier(scale_pos_weight))
     ])
 
     # Train and find best decision threshold
-    trained_model, best_threshold = train_and_find_threshold(dummy_model, X, y)
+    trained_model, best_threshold = train_and_find_threshold(
+        dummy_model, X, y, strategy=args.strategy,
+        cache_dir=args.cache_dir or None, trace_path=args.trace or None
+    )
 
     # Display top features (from trained model)
     try:
@@ -166,11 +318,8 @@ def main():
         print("\nCould not extract feature importances (possible version mismatch).")
 
     # Save final model
-    joblib.dump(
-        {"model": trained_model, "threshold": best_threshold},
-        "C:\\Users\\PRATHAM\\OneDrive\\Desktop\\HRMS--Hackathon\\backend\\ML_models\\employee_attrition\\models\\attrition.joblib"
-    )
-    print("\n Model saved at models/attrition.joblib")
+    joblib.dump({"model": trained_model, "threshold": best_threshold}, args.output)
+    print(f"\n Model saved at {args.output} ({time.perf_counter() - start:.1f}s)")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,273 @@
+"""
+Two-tier response cache: a bounded in-process LRU in front of Redis.
+
+Entries are invalidated by tag. Every tag (a cache prefix such as
+"hr_employees", or a table name such as "job_postings") has a generation
+counter at `cache_gen:<tag>`, and the generations of an entry's tags are
+part of its key:
+
+    hr_employees:g3.7:get_employees_by_company:company_id=...
+
+invalidate(tag) is one INCR: every key built from the old generation
+becomes unreachable in both tiers and simply expires. No SCAN is needed
+(Upstash REST has none), so TTLs can be long - but only for data the
+backend itself writes. The frontend writes some tables straight through
+Supabase (employees, departments, applications) and never invalidates
+their tags; entries carrying one of CACHE_EXTERNAL_TAGS live at most
+CACHE_EXTERNAL_TTL seconds, however long the endpoint asks for.
+
+Local hits cost a dict lookup; only local misses go to Redis, through
+the async client (aget/aset) on the event loop. Each worker re-reads
+the generations of its tags (one MGET) at most every CACHE_GEN_POLL
+seconds, so other workers see an invalidation within that time; the
+invalidating worker sees it at once. The LRU is bounded by
+CACHE_LOCAL_MAX_ENTRIES and by CACHE_LOCAL_MAX_BYTES of JSON-encoded
+values, and local entries live at most CACHE_LOCAL_TTL seconds.
+
+Cached values are shared between requests and must not be mutated.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from app.redis_client import async_redis_client, redis_client
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = int(os.getenv("CACHE_DEFAULT_TTL", str(6 * 3600)))
+LOCAL_MAX_ENTRIES = int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", "2048"))
+LOCAL_MAX_BYTES = int(os.getenv("CACHE_LOCAL_MAX_BYTES", str(64 * 1024 * 1024)))
+LOCAL_TTL = float(os.getenv("CACHE_LOCAL_TTL", "300"))
+GEN_POLL = float(os.getenv("CACHE_GEN_POLL", "1.0"))
+GEN_KEY = "cache_gen:{}"
+EXTERNAL_TTL = int(os.getenv("CACHE_EXTERNAL_TTL", "60"))
+EXTERNAL_TAGS = frozenset(
+    t.strip() for t in os.getenv("CACHE_EXTERNAL_TAGS", "employees,departments,applications").split(",") if t.strip()
+)
+
+MISS = object()
+
+
+def ttl_for(tags: Sequence[str], ttl: int) -> int:
+    """`ttl`, capped at EXTERNAL_TTL when a tag's table is also written outside the backend."""
+    return min(ttl, EXTERNAL_TTL) if EXTERNAL_TAGS.intersection(tags) else ttl
+
+
+class LocalCache:
+    """Thread-safe LRU with per-entry expiry and a total size bound."""
+
+    def __init__(self, max_entries: int = LOCAL_MAX_ENTRIES, max_bytes: int = LOCAL_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> (value, expires_at, size)
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISS
+            if entry[1] <= time.monotonic():
+                self._pop(key)
+                return MISS
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value: Any, ttl: float, size: int):
+        if size > self.max_bytes or ttl <= 0:
+            return
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (value, time.monotonic() + ttl, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _pop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def delete_prefix(self, prefix: str) -> int:
+        with self._lock:
+            keys = [k for k in self._entries if k.startswith(prefix)]
+            for k in keys:
+                self._pop(k)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "evictions": self.evictions}
+
+
+class TwoTierCache:
+    def __init__(self, local: Optional[LocalCache] = None, local_ttl: float = LOCAL_TTL,
+                 gen_poll: float = GEN_POLL):
+        self.local = local or LocalCache()
+        self.local_ttl = local_ttl
+        self.gen_poll = gen_poll
+        self._gens: Dict[str, Tuple[int, float]] = {}
+        self._gens_lock = threading.Lock()
+        self.hits = {"local": 0, "redis": 0}
+        self.misses = 0
+
+    # -------------------------
+    # generations
+    # -------------------------
+    def _stale(self, tags: Sequence[str]) -> list:
+        now = time.monotonic()
+        return [t for t in tags if t not in self._gens or now - self._gens[t][1] >= self.gen_poll]
+
+    def _store_generations(self, tags: Sequence[str], values: Sequence[Any]):
+        now = time.monotonic()
+        with self._gens_lock:
+            for tag, value in zip(tags, values):
+                self._gens[tag] = (int(value or 0), now)
+
+    def generations(self, tags: Sequence[str]) -> Tuple[int, ...]:
+        """Current generation of each tag; stale ones are re-read from Redis in one MGET."""
+        stale = self._stale(tags)
+        if stale:
+            self._store_generations(stale, redis_client.mget(*[GEN_KEY.format(t) for t in stale]))
+        return tuple(self._gens[t][0] for t in tags)
+
+    def generations_fresh(self, tags: Sequence[str]) -> bool:
+        """True when generations(tags) can be answered without a Redis call."""
+        return not self._stale(tags)
+
+    @staticmethod
+    def _versioned(gens: Sequence[int], key: str) -> str:
+        prefix, _, rest = key.partition(":")
+        return f"{prefix}:g{'.'.join(str(g) for g in gens)}:{rest}"
+
+    def key(self, tags: Sequence[str], key: str) -> str:
+        """Storage key: `key` with the generations of `tags` after its prefix (the first tag)."""
+        return self._versioned(self.generations(tags), key)
+
+    # -------------------------
+    # reads / writes
+    # -------------------------
+    def get_local(self, tags: Sequence[str], key: str) -> Any:
+        """The local entry, or MISS; never touches the network (generations must be fresh)."""
+        if not self.generations_fresh(tags):
+            return MISS
+        value = self.local.get(self.key(tags, key))
+        if value is not MISS:
+            self.hits["local"] += 1
+        return value
+
+    def get(self, tags: Sequence[str], key: str) -> Any:
+        """Cached value of `key` (local tier first, then Redis), or MISS."""
+        full_key = self.key(tags, key)
+        value = self.local.get(full_key)
+        if value is not MISS:
+            self.hits["local"] += 1
+            return value
+        envelope = redis_client.get(full_key)
+        if isinstance(envelope, dict) and "data" in envelope:
+            self.hits["redis"] += 1
+            ttl = min(envelope.get("ttl") or self.local_ttl, self.local_ttl)
+            self.local.set(full_key, envelope["data"], ttl, envelope.get("size", 0))
+            return envelope["data"]
+        self.misses += 1
+        return MISS
+
+    def set(self, tags: Sequence[str], key: str, value: Any, ttl: int = DEFAULT_TTL):
+        full_key = self.key(tags, key)
+        size = len(json.dumps(value, default=str))
+        redis_client.set(full_key, {"ttl": ttl, "size": size, "data": value}, ex=ttl)
+        self.local.set(full_key, value, min(ttl, self.local_ttl), size)
+
+    async def akey(self, tags: Sequence[str], key: str) -> str:
+        """key() for the event loop."""
+        stale = self._stale(tags)
+        if stale:
+            self._store_generations(stale, await async_redis_client.mget(*[GEN_KEY.format(t) for t in stale]))
+        return self._versioned([self._gens[t][0] for t in tags], key)
+
+    async def aget(self, tags: Sequence[str], key: str) -> Tuple[Any, Optional[str]]:
+        """
+        get() for the event loop. A generation refresh and the Redis lookup
+        (under the generations known so far) share one pipelined request;
+        a second GET is needed only when a generation has changed.
+
+        Returns (value or MISS, storage key). On a miss, the result must be
+        stored with aset() under that key, resolved before the handler ran:
+        if the tags are invalidated meanwhile, the result lands under the old
+        generation, where nobody reads it. The key is None when Redis is
+        unreachable; nothing should be stored then.
+        """
+        stale = self._stale(tags)
+        guess = self._versioned([self._gens[t][0] if t in self._gens else 0 for t in tags], key)
+        envelope = MISS
+        if stale:
+            try:
+                pipe = async_redis_client.pipeline()
+                pipe.mget(*[GEN_KEY.format(t) for t in stale])
+                pipe.get(guess)
+                values, raw = await pipe.exec()
+                self._store_generations(stale, values)
+                envelope = json.loads(raw) if raw else None
+            except Exception as e:
+                _logger.warning("Cache pipeline failed: %s", e)
+                return MISS, None
+        full_key = self._versioned([self._gens[t][0] for t in tags], key) if stale else guess
+        value = self.local.get(full_key)
+        if value is not MISS:
+            self.hits["local"] += 1
+            return value, full_key
+        if envelope is MISS or full_key != guess:
+            envelope = await async_redis_client.get(full_key)
+        if isinstance(envelope, dict) and "data" in envelope:
+            self.hits["redis"] += 1
+            ttl = min(envelope.get("ttl") or self.local_ttl, self.local_ttl)
+            self.local.set(full_key, envelope["data"], ttl, envelope.get("size", 0))
+            return envelope["data"], full_key
+        self.misses += 1
+        return MISS, full_key
+
+    async def aset(self, full_key: str, value: Any, ttl: int = DEFAULT_TTL):
+        """set() for the event loop, under a storage key from aget() or akey()."""
+        size = len(json.dumps(value, default=str))
+        await async_redis_client.set(full_key, {"ttl": ttl, "size": size, "data": value}, ex=ttl)
+        self.local.set(full_key, value, min(ttl, self.local_ttl), size)
+
+    def invalidate(self, tag: str) -> int:
+        """Bump the generation of `tag`; entries carrying it become unreachable in every worker."""
+        return self._invalidated(tag, redis_client.incr(GEN_KEY.format(tag)))
+
+    async def ainvalidate(self, tag: str) -> int:
+        """invalidate() for the event loop."""
+        return self._invalidated(tag, await async_redis_client.incr(GEN_KEY.format(tag)))
+
+    def _invalidated(self, tag: str, gen: int) -> int:
+        with self._gens_lock:
+            if gen:
+                self._gens[tag] = (gen, time.monotonic())
+            else:
+                # Redis unavailable: re-read the generation on the next request
+                self._gens.pop(tag, None)
+        # entries of other prefixes carrying the tag are unreachable now and age out of the LRU
+        dropped = self.local.delete_prefix(tag + ":")
+        _logger.debug("Cache tag %s invalidated (generation %s, %d local entries dropped)", tag, gen, dropped)
+        return gen
+
+    def info(self) -> Dict[str, Any]:
+        return {"local": self.local.info(), "hits": dict(self.hits), "misses": self.misses,
+                "generations": {t: g for t, (g, _) in self._gens.items()}}
+
+
+cache = TwoTierCache()
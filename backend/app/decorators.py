@@ -1,33 +1,40 @@
 from functools import wraps
-from typing import Any, Callable
+from typing import Any, Callable, Sequence
 from fastapi import Request, HTTPException
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime
+import inspect
 import json
-from app.redis_client import redis_client
+import logging
+from app.cache import cache, ttl_for, DEFAULT_TTL, MISS
+
+_logger = logging.getLogger(__name__)
 
 def invalidate_cache(prefix: str):
     """
-    Invalidate all cache keys with the given prefix.
+    Invalidate all cache keys with the given prefix or tag.
 
     Args:
-        prefix: The cache key prefix to invalidate (e.g., "hr_companies")
+        prefix: The cache key prefix or tag to invalidate (e.g., "hr_companies", "job_postings")
     """
-    cursor = 0
-    while True:
-        cursor, keys = redis_client.scan(cursor, match=f"{prefix}:*")
-        if keys:
-            redis_client.delete(*keys)
-        if cursor == 0:
-            break
+    # one INCR of the tag's generation; keys built from the old one are never read again
+    cache.invalidate(prefix)
 
-def cached_endpoint(cache_key_prefix: str, ttl: int = 300):
+def cached_endpoint(cache_key_prefix: str, ttl: int = DEFAULT_TTL, tags: Sequence[str] = ()):
     """
     Decorator to cache API endpoint responses.
 
     Args:
-        cache_key_prefix: Prefix for the cache key (e.g., "jobs")
-        ttl: Time to live in seconds (default 5 minutes)
+        cache_key_prefix: Prefix for the cache key (e.g., "jobs"); also a tag
+        ttl: Time to live in seconds (default CACHE_DEFAULT_TTL, 6 hours); capped at
+             CACHE_EXTERNAL_TTL when a tag is in CACHE_EXTERNAL_TAGS
+        tags: Extra invalidation tags, usually the tables the endpoint reads
+              (invalidate_cache("job_postings") drops every endpoint tagged with it)
     """
+    all_tags = (cache_key_prefix,) + tuple(tags)
+    # tables the frontend writes directly are never invalidated: bound the staleness instead
+    ttl = ttl_for(all_tags, ttl)
+
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         async def wrapper(*args, **kwargs):
@@ -50,51 +57,65 @@ def cached_endpoint(cache_key_prefix: str, ttl: int = 300):
                     sorted_kwargs = sorted(kwargs.items())
                     cache_key += ":" + ":".join(f"{k}={v}" for k, v in sorted_kwargs)
 
+            # Hot path: a local hit needs no network call and no threadpool hop
+            cached_data = cache.get_local(all_tags, cache_key)
+            if cached_data is not MISS:
+                return cached_data
+
+            # The storage key is resolved before the handler runs: a write that
+            # invalidates a tag meanwhile moves readers to a newer generation,
+            # and this result lands under the old one instead of shadowing it
+            storage_key = None
             try:
                 # Check cache first
-                cached_data = redis_client.get(cache_key)
-                if cached_data:
-                    print(f"Cache hit for Cache Key: {cache_key}")
+                cached_data, storage_key = await cache.aget(all_tags, cache_key)
+                if cached_data is not MISS:
+                    _logger.debug("Cache hit for Cache Key: %s", cache_key)
                     return cached_data
+            except Exception as e:
+                print(f"Caching error: {e}")
 
-                # Execute the function
-                result = await func(*args, **kwargs) if hasattr(func, '__call__') and hasattr(func, '__code__') and 'async' in str(func.__code__.co_flags) else func(*args, **kwargs)
-
-                # Serialize result for caching (handle datetime objects)
-                if isinstance(result, list):
-                    serialized_result = []
-                    for item in result:
-                        if hasattr(item, 'dict'):
-                            item_dict = item.dict()
-                            # Convert datetime to ISO string
-                            for key, value in item_dict.items():
-                                if isinstance(value, datetime):
-                                    item_dict[key] = value.isoformat()
-                            serialized_result.append(item_dict)
-                        else:
-                            serialized_result.append(item)
-                elif hasattr(result, 'dict'):
-                    serialized_result = result.dict()
-                    # Convert datetime to ISO string
-                    for key, value in serialized_result.items():
-                        if isinstance(value, datetime):
-                            serialized_result[key] = value.isoformat()
-                else:
-                    serialized_result = result
-
-                # Cache the result
-                redis_client.set(cache_key, serialized_result, ex=ttl)
-                print(f"Cache miss for Cache Key: {cache_key}")
+            # Execute the function
+            if inspect.iscoroutinefunction(func):
+                result = await func(*args, **kwargs)
+            else:
+                result = await run_in_threadpool(func, *args, **kwargs)
 
-                return result
+            if storage_key is not None:
+                try:
+                    # Cache the result
+                    await cache.aset(storage_key, _serialize(result), ttl)
+                    _logger.debug("Cache miss for Cache Key: %s", cache_key)
+                except Exception as e:
+                    # If caching fails, just return the result
+                    print(f"Caching error: {e}")
 
-            except HTTPException as e:
-                # Re-raise HTTPExceptions without caching
-                raise e
-            except Exception as e:
-                print(f"Caching error: {e}")
-                # If caching fails, just execute the function
-                return await func(*args, **kwargs) if hasattr(func, '__call__') and hasattr(func, '__code__') and 'async' in str(func.__code__.co_flags) else func(*args, **kwargs)
+            return result
 
         return wrapper
     return decorator
+
+
+def _serialize(result: Any) -> Any:
+    """Serialize result for caching (handle datetime objects)."""
+    if isinstance(result, list):
+        serialized_result = []
+        for item in result:
+            if hasattr(item, 'dict'):
+                item_dict = item.dict()
+                # Convert datetime to ISO string
+                for key, value in item_dict.items():
+                    if isinstance(value, datetime):
+                        item_dict[key] = value.isoformat()
+                serialized_result.append(item_dict)
+            else:
+                serialized_result.append(item)
+        return serialized_result
+    if hasattr(result, 'dict'):
+        serialized_result = result.dict()
+        # Convert datetime to ISO string
+        for key, value in serialized_result.items():
+            if isinstance(value, datetime):
+                serialized_result[key] = value.isoformat()
+        return serialized_result
+    return result
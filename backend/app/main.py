@@ -28,23 +28,6 @@ from app.routes import auth, hr, public, jobs, candidate
 from app.payroll import routes as payroll_routes
 from app.leave.routes import router as leave_router
 from app.performance import routes as performance_routes
-app = FastAPI(title="Your HRMS")
-
-# CORS must be registered before custom middlewares that may short-circuit requests
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[
-        "http://localhost:3000",
-        "http://127.0.0.1:3000",
-    ],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# custom middlewares
-app.add_middleware(RateLimitMiddleware, requests_per_minute=100)
-app.add_middleware(CacheMiddleware, cache_ttl=300)
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware # Keep only one import
 from dotenv import load_dotenv
@@ -64,13 +47,10 @@ load_dotenv()
 from app.routes import ai_interview # Import the new AI interview router file
 from app.routes import auth, hr, public, jobs, candidate
 from app.payroll.routes import router as payroll_router
-from app.performance.routes import router as perf_router
+from app.performance import write_buffer as performance_write_buffer
+from app.redis_client import async_redis_client
 # *** ADD IMPORT FOR THE NEW AI INTERVIEW ROUTER ***
 
-# --- Import Middleware ---
-# Ensure these middleware files/classes exist in app/middleware.py or comment out
-# from app.middleware import RateLimitMiddleware, CacheMiddleware
-
 # --- Create the main FastAPI app instance ---
 app = FastAPI(title="HRMS Main API")
 
@@ -89,9 +69,9 @@ app.add_middleware(
     allow_headers=["*"], # Allows all standard headers
 )
 
-# Add your other middleware *after* CORS if you have implemented them
-# app.add_middleware(RateLimitMiddleware, requests_per_minute=100)
-# app.add_middleware(CacheMiddleware, cache_ttl=300)
+# Add your other middleware *after* CORS
+app.add_middleware(RateLimitMiddleware, requests_per_minute=100)
+app.add_middleware(CacheMiddleware, cache_ttl=300)
 
 # --- Root & health endpoints ---
 @app.get("/")
@@ -111,7 +91,7 @@ app.include_router(jobs.router)
 app.include_router(candidate.router)
 app.include_router(payroll_routes.router)
 app.include_router(leave_router)
-app.include_router(performance_routes.router, prefix="/api/performance")
+app.include_router(performance_routes.router)
 
 # DEV-only: detailed exception handler (temporary — remove in prod)
 @app.exception_handler(Exception)
@@ -147,11 +127,25 @@ app.include_router(candidate.router)
 
 # Include feature routers
 app.include_router(payroll_router)
-app.include_router(perf_router)
+# performance_routes.router (/api/performance) is included above
 
 # *** INCLUDE THE NEW AI INTERVIEW ROUTER ***
 app.include_router(ai_interview.router) # This adds the /ai-interview/* routes
 
+# Buffered task updates/confirmations: replay journals left by a crashed worker
+# on startup, flush what is still queued on shutdown.
+@app.on_event("startup")
+def start_performance_write_buffer():
+    performance_write_buffer.start()
+
+@app.on_event("shutdown")
+def stop_performance_write_buffer():
+    performance_write_buffer.stop()
+
+@app.on_event("shutdown")
+async def close_redis():
+    await async_redis_client.close()
+
 # --- Optional database initialization ---
 # Uncomment and implement if you need tables created on startup via SQLAlchemy
 # @app.on_event("startup")
@@ -1,75 +1,246 @@
-import json
+import base64
+import hashlib
+from typing import Dict, List, Optional, Sequence, Tuple
 from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
 from starlette.middleware.base import BaseHTTPMiddleware
-import time
-from app.redis_client import redis_client
+from app.rate_limit import DEFAULT_POLICIES, Policy, Rule, SlidingWindowLimiter, user_id_from_token
+from app.cache import cache, MISS
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, requests_per_minute: int = 100):
+    """
+    Applies a SlidingWindowLimiter (see app.rate_limit): per-route policies
+    and costs, counted per authenticated user or else per client IP.
+    `requests_per_minute` sets the limit of the "default" policy.
+    """
+
+    def __init__(self, app, requests_per_minute: int = 100, policies: Optional[Dict[str, Policy]] = None,
+                 rules: Optional[List[Rule]] = None, sync_every: Optional[int] = None,
+                 sync_interval: float = 1.0):
         super().__init__(app)
-        self.requests_per_minute = requests_per_minute
+        policies = dict(policies or DEFAULT_POLICIES)
+        policies["default"] = Policy(limit=requests_per_minute, period=policies["default"].period)
+        self.limiter = SlidingWindowLimiter(policies, rules, sync_every, sync_interval)
+
+    @staticmethod
+    def identity(request: Request) -> str:
+        authorization = request.headers.get("authorization", "")
+        if authorization[:7].lower() == "bearer ":
+            user_id = user_id_from_token(authorization[7:].strip())
+            if user_id:
+                return f"user:{user_id}"
+        return f"ip:{request.client.host if request.client else 'unknown'}"
 
     async def dispatch(self, request: Request, call_next):
-        # Get client IP
-        client_ip = request.client.host if request.client else "unknown"
+        matched = self.limiter.match(request.method, request.url.path)
+        if matched is not None:
+            policy, cost = matched
+            allowed, retry_after = await self.limiter.hit(policy, self.identity(request), cost)
+            if not allowed:
+                return JSONResponse(
+                    status_code=429,
+                    content={"error": "Rate limit exceeded. Try again later."},
+                    headers={"Retry-After": str(retry_after)}
+                )
 
-        # Create rate limit key
-        rate_limit_key = f"rate_limit:{client_ip}:{int(time.time() // 60)}"
+        # Proceed with request
+        response = await call_next(request)
+        return response
 
-        # Check current requests count
-        current_count = redis_client.get(rate_limit_key) or 0
+def _directives(value: str) -> Dict[str, Optional[str]]:
+    """Cache-Control header -> {directive: argument or None}"""
+    directives = {}
+    for part in value.split(","):
+        name, _, arg = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip('"') or None
+    return directives
 
-        if current_count >= self.requests_per_minute:
-            return JSONResponse(
-                status_code=429,
-                content={"error": "Rate limit exceeded. Try again later."}
-            )
 
-        # Increment counter
-        redis_client.incr(rate_limit_key)
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    weak = lambda tag: tag.strip()[2:] if tag.strip().startswith("W/") else tag.strip()
+    return weak(etag) in {weak(tag) for tag in if_none_match.split(",")}
 
-        # Set expiration for the key (1 minute)
-        redis_client.expire(rate_limit_key, 60)
 
-        # Proceed with request
-        response = await call_next(request)
-        return response
+class CacheMiddleware:
+    """
+    Shared response cache for GET requests, as plain ASGI middleware.
 
-class CacheMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, cache_ttl: int = 300):  # 5 minutes default
-        super().__init__(app)
+    The response body is captured as it streams to the client and stored
+    as raw bytes with the headers needed to replay it (content type and
+    encoding, ETag, Cache-Control). Hits are replayed as stored, with no
+    re-serialization; a request whose If-None-Match matches gets a 304.
+
+    Responses are keyed by URL and by the request's `vary_headers`
+    (Authorization and Cookie by default), so one user's HR data is never
+    served to another. Only 200 responses without Set-Cookie are stored,
+    and not when they say Cache-Control: no-store/no-cache/private or
+    Vary on a header outside `vary_headers`; their max-age / s-maxage
+    replaces `cache_ttl`. A request with Cache-Control: no-cache skips the
+    lookup, one with no-store bypasses the cache.
+
+    Storage is opt-in: a response is stored only when it says
+    Cache-Control: public, max-age or s-maxage, or when its path starts
+    with one of `cache_paths`. Many GETs serve data that changes without a
+    request passing through here (payroll run progress, rows written by the
+    performance write buffer), so they must not be cached by default.
+
+    Entries are tagged with their route scope: the first path segment, or
+    the first two under /api (/hr, /api/payroll). A successful non-GET
+    request invalidates the entries of its own scope only.
+    """
+
+    TAG = "cache"
+    REPLAYED_HEADERS = ("content-type", "content-encoding", "content-language", "cache-control", "vary", "etag")
+
+    def __init__(self, app, cache_ttl: int = 300, vary_headers: Sequence[str] = ("authorization", "cookie"),
+                 max_body_bytes: int = 1024 * 1024, cache_paths: Sequence[str] = ()):
+        self.app = app
         self.cache_ttl = cache_ttl
+        self.cache_paths = tuple(cache_paths)
+        self.vary_headers = tuple(h.lower() for h in vary_headers)
+        self.max_body_bytes = max_body_bytes
 
-    async def dispatch(self, request: Request, call_next):
-        # Only cache GET requests
-        if request.method != "GET":
-            return await call_next(request)
-
-        # Create cache key from URL and query params
-        query_params = str(request.query_params)
-        cache_key = f"cache:{request.url.path}?{query_params}"
-
-        # Check cache
-        cached_response = redis_client.get(cache_key)
-        if cached_response:
-            return JSONResponse(
-                status_code=200,
-                content=cached_response
-            )
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if scope["method"] not in ("GET", "HEAD"):
+            await self._call_unsafe(scope, receive, send)
+            return
 
-        # Proceed with request
-        response = await call_next(request)
+        headers = Headers(scope=scope)
+        request_directives = _directives(headers.get("cache-control", ""))
+        if "no-store" in request_directives:
+            await self.app(scope, receive, send)
+            return
 
-        # Cache the response if it's successful
-        if response.status_code == 200:
-            try:
-                response_body = response.body
-                if response_body:
-                    data = response_body.decode('utf-8')
-                    json_data = json.loads(data)
-                    redis_client.set(cache_key, json_data, ex=self.cache_ttl)
-            except:
-                pass  # Skip caching if response is not JSON
+        cache_key = self._key(scope, headers)
+        tags = self._tags(scope["path"])
+        if "no-cache" in request_directives:
+            entry, storage_key = MISS, await cache.akey(tags, cache_key)
+        else:
+            # Check cache: local tier first, Redis on a local miss
+            entry, storage_key = cache.get_local(tags, cache_key), None
+            if entry is MISS:
+                entry, storage_key = await cache.aget(tags, cache_key)
+        if entry is not MISS:
+            await self._replay(entry, scope["method"], headers, send)
+            return
 
-        return response
+        if scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        # the storage key is resolved before the app runs, so a response
+        # computed across an invalidation lands under the old generation
+        await self._call_and_capture(scope, receive, send, storage_key)
+
+    @classmethod
+    def _tags(cls, path: str) -> Tuple[str, str]:
+        segments = path.strip("/").split("/")
+        depth = 2 if segments[0] == "api" else 1
+        return cls.TAG, f"{cls.TAG}:/" + "/".join(segments[:depth])
+
+    def _key(self, scope, headers: Headers) -> str:
+        key = f"{self.TAG}:{scope['path']}?{scope['query_string'].decode('latin-1')}"
+        varying = [headers.get(name, "") for name in self.vary_headers]
+        if any(varying):
+            key += "#" + hashlib.blake2b("\0".join(varying).encode(), digest_size=16).hexdigest()
+        return key
+
+    async def _replay(self, entry: dict, method: str, request_headers: Headers, send):
+        body = base64.b64decode(entry["body"])
+        headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in entry["headers"]]
+        etag = next((v for k, v in entry["headers"] if k == "etag"), None)
+        if etag and _etag_matches(request_headers.get("if-none-match", ""), etag):
+            headers = [h for h in headers if h[0] in (b"etag", b"cache-control", b"vary")]
+            await send({"type": "http.response.start", "status": 304, "headers": headers + [(b"x-cache", b"HIT")]})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        headers += [(b"content-length", str(len(body)).encode()), (b"x-cache", b"HIT")]
+        await send({"type": "http.response.start", "status": entry["status"], "headers": headers})
+        await send({"type": "http.response.body", "body": body if method == "GET" else b""})
+
+    def _storable_ttl(self, start: dict, path: str) -> Optional[int]:
+        """Seconds to keep the response started by `start`, or None if it must not be stored."""
+        if start["status"] != 200:
+            return None
+        headers = Headers(raw=start["headers"])
+        if "set-cookie" in headers:
+            return None
+        vary = {v.strip().lower() for v in headers.get("vary", "").split(",") if v.strip()}
+        if not vary <= set(self.vary_headers):
+            return None
+        directives = _directives(headers.get("cache-control", ""))
+        if {"no-store", "no-cache", "private"} & directives.keys():
+            return None
+        max_age = directives.get("s-maxage") or directives.get("max-age")
+        if max_age is not None:
+            return int(max_age) if max_age.isdigit() and int(max_age) > 0 else None
+        if "public" in directives or path.startswith(self.cache_paths):
+            return self.cache_ttl
+        return None
+
+    async def _call_and_capture(self, scope, receive, send, storage_key: Optional[str]):
+        # http.response.start is held back until the first body chunk: when that
+        # chunk is the whole body (the usual JSON case) the ETag goes out with it
+        held = None
+        started = None
+        ttl = None
+        chunks: List[bytes] = []
+        size = 0
+        complete = False
+
+        async def send_and_capture(message):
+            nonlocal held, started, ttl, size, complete
+            if message["type"] == "http.response.start":
+                held = message
+                ttl = self._storable_ttl(message, scope["path"])
+                return
+            if held is not None:
+                start, held = held, None
+                if message["type"] == "http.response.body" and ttl is not None \
+                        and not message.get("more_body", False) and "etag" not in Headers(raw=start["headers"]):
+                    etag = '"%s"' % hashlib.blake2b(message.get("body", b""), digest_size=16).hexdigest()
+                    start = {**start, "headers": list(start["headers"]) + [(b"etag", etag.encode())]}
+                started = start
+                await send(start)
+            if message["type"] == "http.response.body" and ttl is not None:
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                if size > self.max_body_bytes:
+                    ttl = None
+                    chunks.clear()
+                else:
+                    chunks.append(chunk)
+                    complete = not message.get("more_body", False)
+            await send(message)
+
+        await self.app(scope, receive, send_and_capture)
+        if ttl is None or not complete or storage_key is None:
+            return
+        body = b"".join(chunks)
+        response_headers = Headers(raw=started["headers"])
+        etag = response_headers.get("etag") or '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+        kept = [(name, response_headers[name]) for name in self.REPLAYED_HEADERS if name in response_headers]
+        if "etag" not in response_headers:
+            kept.append(("etag", etag))
+        entry = {"status": started["status"], "headers": kept, "body": base64.b64encode(body).decode("ascii")}
+        await cache.aset(storage_key, entry, ttl)
+
+    async def _call_unsafe(self, scope, receive, send):
+        status = None
+
+        async def send_and_watch(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        await self.app(scope, receive, send_and_watch)
+        if status is not None and status < 400:
+            # a write may change any cached GET of its scope; one INCR makes them unreachable
+            await cache.ainvalidate(self._tags(scope["path"])[1])
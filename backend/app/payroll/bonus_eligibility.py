@@ -0,0 +1,141 @@
+# app/payroll/bonus_eligibility.py
+"""
+Bonus eligibility service.
+
+Decides which `employee_bonuses` rows apply to a payroll period, with the
+rules of services.filter_active_bonuses:
+
+  ONE_TIME (or no type)  effective_from inside the period and not paid
+  RECURRING_MONTHLY      effective_from <= period_end, effective_to >= period_start
+  RECURRING_YEARLY       as monthly, and effective_from in the period's month
+
+The date-window and `is_paid` predicates are pushed into the query and
+bonuses are fetched for many employees at once, so old paid one-time rows
+and expired recurring rows never leave the database. The Python filter stays
+authoritative (it also does the yearly month match). Results are kept in a
+per-period in-memory index that bulk payroll runs and /compute previews
+share. Every run starts a fresh index of its period; creating a bonus
+invalidates its employee, and everything else expires after
+BONUS_INDEX_TTL seconds.
+
+Index: scripts/sql/alter_employee_bonuses.sql
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from app.supabase_utils import fetch_in
+
+_logger = logging.getLogger(__name__)
+
+BONUS_INDEX_TTL = int(os.getenv("PAYROLL_BONUS_INDEX_TTL", "300"))
+MAX_INDEXED_PERIODS = 12
+
+
+def period_filter(period_start: date, period_end: date) -> str:
+    """PostgREST `or` expression selecting the bonuses that may apply to the period."""
+    s, e = period_start.isoformat(), period_end.isoformat()
+    one_time = f'effective_from.gte.{s},effective_from.lte.{e},is_paid.not.is.true'
+    recurring = f'or(effective_from.is.null,effective_from.lte.{e}),or(effective_to.is.null,effective_to.gte.{s})'
+    return (f'and(bonus_type.is.null,{one_time}),'
+            f'and(bonus_type.in.("",ONE_TIME),{one_time}),'
+            f'and(bonus_type.in.(RECURRING_MONTHLY,RECURRING_YEARLY),{recurring})')
+
+
+def fetch_active_bonuses(employee_ids: List[Any], period_start: date, period_end: date) -> Dict[Any, List[Dict[str, Any]]]:
+    """Eligible bonuses of the employees for the period, batched and filtered in the query."""
+    # imported here: services depends on this module
+    from app.payroll.services import filter_active_bonuses
+    try:
+        rows = fetch_in('employee_bonuses', 'employee_id', employee_ids,
+                        filters=[(None, 'or', period_filter(period_start, period_end))])
+    except Exception as ex:
+        # e.g. a schema without is_paid: fetch unfiltered, the Python filter still applies
+        _logger.warning("Bonus predicate pushdown failed, fetching unfiltered: %s", ex)
+        rows = fetch_in('employee_bonuses', 'employee_id', employee_ids)
+    out: Dict[Any, List[Dict[str, Any]]] = {emp_id: [] for emp_id in employee_ids}
+    for b in filter_active_bonuses(rows, period_start, period_end):
+        out.setdefault(b['employee_id'], []).append(b)
+    return out
+
+
+class BonusIndex:
+    """Eligible bonuses of one period by employee; employees are loaded on first use."""
+
+    def __init__(self, period_start: date, period_end: date):
+        self.period_start = period_start
+        self.period_end = period_end
+        self.created_at = time.time()
+        self._by_employee: Dict[Any, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._by_employee)
+
+    def for_employees(self, employee_ids: List[Any]) -> Dict[Any, List[Dict[str, Any]]]:
+        with self._lock:
+            missing = [e for e in dict.fromkeys(employee_ids) if e not in self._by_employee]
+        if missing:
+            loaded = fetch_active_bonuses(missing, self.period_start, self.period_end)
+            with self._lock:
+                self._by_employee.update(loaded)
+        with self._lock:
+            return {e: list(self._by_employee.get(e, [])) for e in employee_ids}
+
+    def get(self, employee_id: Any) -> List[Dict[str, Any]]:
+        return self.for_employees([employee_id])[employee_id]
+
+    def discard(self, employee_id: Any):
+        with self._lock:
+            self._by_employee.pop(employee_id, None)
+
+
+_lock = threading.Lock()
+_indexes: "OrderedDict[tuple, BonusIndex]" = OrderedDict()
+
+
+def get_index(period_start: date, period_end: date, refresh: bool = False) -> BonusIndex:
+    """Shared index of the period, rebuilt after BONUS_INDEX_TTL seconds or when `refresh` is set."""
+    key = (period_start, period_end)
+    with _lock:
+        idx = _indexes.get(key)
+        if refresh or idx is None or time.time() - idx.created_at >= BONUS_INDEX_TTL:
+            idx = BonusIndex(period_start, period_end)
+            _indexes[key] = idx
+        _indexes.move_to_end(key)
+        while len(_indexes) > MAX_INDEXED_PERIODS:
+            _indexes.popitem(last=False)
+        return idx
+
+
+def active_bonuses(employee_id: Any, period_start: date, period_end: date) -> List[Dict[str, Any]]:
+    return get_index(period_start, period_end).get(employee_id)
+
+
+def active_bonuses_for(employee_ids: List[Any], period_start: date, period_end: date) -> Dict[Any, List[Dict[str, Any]]]:
+    return get_index(period_start, period_end).for_employees(employee_ids)
+
+
+def invalidate(employee_id: Optional[Any] = None):
+    """Forget one employee's bonuses in every period index, or drop all indexes."""
+    with _lock:
+        if employee_id is None:
+            _indexes.clear()
+            return
+        indexes = list(_indexes.values())
+    for idx in indexes:
+        idx.discard(employee_id)
+
+
+def index_info() -> Dict[str, Any]:
+    with _lock:
+        return {
+            'ttl': BONUS_INDEX_TTL,
+            'periods': [{'period_start': str(s), 'period_end': str(e), 'employees': len(idx),
+                         'age_seconds': round(time.time() - idx.created_at, 1)}
+                        for (s, e), idx in _indexes.items()],
+        }
@@ -0,0 +1,265 @@
+# app/payroll/executor.py
+"""
+Sharded, resumable payroll run executor.
+
+A run is one parent row in `payroll_runs`; active employees are split into
+contiguous id ranges and every range gets its own child row
+(`parent_run_id`, `shard_index`, `employee_id_from`/`employee_id_to`).
+Shards are processed on a local process pool or as Celery tasks, each
+checkpointing `processed_count`, `failed_count` and `last_employee_id` after
+every chunk. A crashed run is resumed by re-dispatching only the shards that
+are not COMPLETED; each restarts after its `last_employee_id`. Incremental
+runs skip employees whose draft payslip fingerprint is unchanged.
+
+Schema: scripts/sql/alter_payroll_runs.sql
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from app.supabase_client import supabase
+from app.payroll import services
+from app.payroll.services import _extract_data, _parse_datetime
+from app.supabase_utils import fetch_paged
+
+_logger = logging.getLogger(__name__)
+
+SHARD_SIZE = 1000
+MAX_SHARD_ERRORS = 100
+# an IN_PROGRESS shard without a checkpoint for this long is considered dead
+STALE_SHARD_SECONDS = 300
+EXECUTORS = ('process', 'celery', 'inline')
+
+
+def _now() -> datetime:
+    return datetime.utcnow().replace(tzinfo=timezone.utc)
+
+
+def _get_run(run_id: int) -> Dict[str, Any]:
+    run = _extract_data(supabase.table('payroll_runs').select('*').eq('id', run_id).single().execute())
+    if not run:
+        raise RuntimeError('Payroll run not found')
+    return run
+
+
+def _get_shards(run_id: int) -> List[Dict[str, Any]]:
+    return _extract_data(
+        supabase.table('payroll_runs').select('*').eq('parent_run_id', run_id).order('shard_index').execute()
+    ) or []
+
+
+def _update_run(run_id: int, values: Dict[str, Any]):
+    supabase.table('payroll_runs').update(values).eq('id', run_id).execute()
+
+
+# -------------------------
+# Starting / resuming runs
+# -------------------------
+def start_payroll_run(payroll_period_id: int, run_by: Optional[str] = None, executor: str = 'process',
+                      shard_size: int = SHARD_SIZE, workers: Optional[int] = None,
+                      incremental: bool = True) -> Dict[str, Any]:
+    """
+    Create a sharded run for the period and dispatch its shards.
+    Returns the parent run row; progress is reported by run_progress().
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(f"executor must be one of {EXECUTORS}")
+    ids = [e['id'] for e in fetch_paged(
+        lambda: supabase.table('employees').select('id').eq('is_active', True).order('id')
+    )]
+    shards = [ids[i:i + shard_size] for i in range(0, len(ids), shard_size)]
+
+    run_res = supabase.table('payroll_runs').insert({
+        'payroll_period_id': payroll_period_id,
+        'run_by': run_by,
+        'status': 'IN_PROGRESS',
+        'started_at': _now().isoformat(),
+        'executor': executor,
+        'incremental': incremental,
+        'total_count': len(ids),
+        'shard_count': len(shards),
+    }).execute()
+    run = (_extract_data(run_res) or [None])[0]
+    if not run:
+        raise RuntimeError('Failed to create payroll run')
+
+    if shards:
+        supabase.table('payroll_runs').insert([{
+            'payroll_period_id': payroll_period_id,
+            'parent_run_id': run['id'],
+            'shard_index': i,
+            'employee_id_from': part[0],
+            'employee_id_to': part[-1],
+            'total_count': len(part),
+            'processed_count': 0,
+            'failed_count': 0,
+            'skipped_count': 0,
+            'incremental': incremental,
+            'status': 'PENDING',
+        } for i, part in enumerate(shards)]).execute()
+        _dispatch(run['id'], [s['id'] for s in _get_shards(run['id'])], executor, workers)
+    else:
+        _finalize_run(run['id'])
+    return _get_run(run['id'])
+
+
+def resume_payroll_run(run_id: int, executor: Optional[str] = None, workers: Optional[int] = None,
+                       stale_after: int = STALE_SHARD_SECONDS) -> Dict[str, Any]:
+    """
+    Re-dispatch the unfinished shards of a run. Shards still checkpointing
+    (IN_PROGRESS with a heartbeat younger than `stale_after` seconds) are left alone.
+    """
+    run = _get_run(run_id)
+    executor = executor or run.get('executor') or 'process'
+    if executor not in EXECUTORS:
+        raise ValueError(f"executor must be one of {EXECUTORS}")
+    now = _now()
+    pending = []
+    for s in _get_shards(run_id):
+        if s.get('status') == 'COMPLETED':
+            continue
+        hb = _parse_datetime(s.get('heartbeat_at'))
+        if s.get('status') == 'IN_PROGRESS' and hb and (now - hb).total_seconds() < stale_after:
+            continue
+        pending.append(s['id'])
+    if pending:
+        _update_run(run_id, {'status': 'IN_PROGRESS', 'completed_at': None, 'executor': executor})
+        _dispatch(run_id, pending, executor, workers)
+    else:
+        _finalize_run(run_id)
+    return {'run': _get_run(run_id), 'resumed_shards': len(pending)}
+
+
+def _dispatch(run_id: int, shard_ids: List[int], executor: str, workers: Optional[int]):
+    if executor == 'celery':
+        # imported lazily: only the celery executor needs the broker configured
+        from app.payroll.tasks import process_payroll_shard
+        for sid in shard_ids:
+            process_payroll_shard.delay(sid)
+    elif executor == 'inline':
+        for sid in shard_ids:
+            process_shard(sid)
+    else:
+        t = threading.Thread(target=_run_process_pool, args=(run_id, shard_ids, workers),
+                             name=f'payroll-run-{run_id}', daemon=True)
+        t.start()
+
+
+def _run_process_pool(run_id: int, shard_ids: List[int], workers: Optional[int]):
+    workers = workers or os.cpu_count() or 1
+    # spawn: every worker builds its own Supabase client instead of sharing forked sockets
+    ctx = multiprocessing.get_context('spawn')
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(shard_ids)), mp_context=ctx) as pool:
+            for sid, fut in [(sid, pool.submit(process_shard, sid)) for sid in shard_ids]:
+                try:
+                    fut.result()
+                except Exception as ex:
+                    _logger.exception("Payroll shard %s failed: %s", sid, ex)
+                    _update_run(sid, {'status': 'FAILED', 'heartbeat_at': _now().isoformat()})
+    finally:
+        _finalize_run(run_id)
+
+
+# -------------------------
+# Shard processing
+# -------------------------
+def process_shard(shard_id: int, chunk_size: int = services.PAYROLL_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    Process one shard, checkpointing after every chunk. Safe to call again
+    after a crash: it continues after the shard's `last_employee_id`.
+    """
+    shard = _get_run(shard_id)
+    if shard.get('status') == 'COMPLETED':
+        return shard
+    now_iso = _now().isoformat()
+    _update_run(shard_id, {'status': 'IN_PROGRESS', 'started_at': shard.get('started_at') or now_iso, 'heartbeat_at': now_iso})
+
+    def _query():
+        q = supabase.table('employees').select('id,work_state').eq('is_active', True)\
+            .gte('id', shard['employee_id_from']).lte('id', shard['employee_id_to'])
+        if shard.get('last_employee_id'):
+            q = q.gt('id', shard['last_employee_id'])
+        return q.order('id')
+
+    emps = fetch_paged(_query)
+    ctx = services.load_payroll_context(shard['payroll_period_id'], 'new',
+                                        incremental=shard.get('incremental') is not False)
+    processed = shard.get('processed_count') or 0
+    failed = shard.get('failed_count') or 0
+    skipped = shard.get('skipped_count') or 0
+    errors = list(shard.get('errors') or [])
+
+    for i in range(0, len(emps), chunk_size):
+        part = emps[i:i + chunk_size]
+        res = services.run_payroll_chunk(part, ctx)
+        processed += res['total']
+        failed += res['failed']
+        skipped += res['skipped']
+        errors = (errors + res['errors'])[:MAX_SHARD_ERRORS]
+        _update_run(shard_id, {
+            'processed_count': processed,
+            'failed_count': failed,
+            'skipped_count': skipped,
+            'last_employee_id': part[-1]['id'],
+            'errors': errors,
+            'heartbeat_at': _now().isoformat(),
+        })
+
+    _update_run(shard_id, {'status': 'COMPLETED', 'completed_at': _now().isoformat(), 'heartbeat_at': _now().isoformat()})
+    if shard.get('parent_run_id'):
+        _finalize_run(shard['parent_run_id'])
+    return _get_run(shard_id)
+
+
+def _finalize_run(run_id: int):
+    """Mark the parent run COMPLETED (or FAILED) once no shard is pending or running."""
+    shards = _get_shards(run_id)
+    if any(s.get('status') in ('PENDING', 'IN_PROGRESS') for s in shards):
+        return
+    status = 'FAILED' if any(s.get('status') == 'FAILED' for s in shards) else 'COMPLETED'
+    _update_run(run_id, {
+        'status': status,
+        'processed_count': sum(s.get('processed_count') or 0 for s in shards),
+        'failed_count': sum(s.get('failed_count') or 0 for s in shards),
+        'skipped_count': sum(s.get('skipped_count') or 0 for s in shards),
+        'completed_at': _now().isoformat(),
+    })
+
+
+# -------------------------
+# Progress reporting
+# -------------------------
+def run_progress(run: Dict[str, Any]) -> Dict[str, Any]:
+    """Live counters, throughput (employees/sec) and ETA for a sharded run row."""
+    shards = _get_shards(run['id'])
+    total = run.get('total_count') or sum(s.get('total_count') or 0 for s in shards)
+    processed = sum(s.get('processed_count') or 0 for s in shards)
+    failed = sum(s.get('failed_count') or 0 for s in shards)
+    skipped = sum(s.get('skipped_count') or 0 for s in shards)
+    started = _parse_datetime(run.get('started_at'))
+    ended = _parse_datetime(run.get('completed_at')) if run.get('status') != 'IN_PROGRESS' else None
+    elapsed = ((ended or _now()) - started).total_seconds() if started else None
+    throughput = (processed / elapsed) if elapsed and elapsed > 0 else None
+    remaining = max(total - processed, 0)
+    eta = (remaining / throughput) if throughput and run.get('status') == 'IN_PROGRESS' else (0.0 if not remaining else None)
+
+    by_status: Dict[str, int] = {}
+    for s in shards:
+        by_status[s.get('status') or 'PENDING'] = by_status.get(s.get('status') or 'PENDING', 0) + 1
+    return {
+        'total': total,
+        'processed': processed,
+        'failed': failed,
+        'skipped': skipped,
+        'remaining': remaining,
+        'percent': round(100.0 * processed / total, 2) if total else 100.0,
+        'elapsed_seconds': round(elapsed, 3) if elapsed is not None else None,
+        'throughput_per_sec': round(throughput, 2) if throughput is not None else None,
+        'eta_seconds': round(eta, 1) if eta is not None else None,
+        'shards': by_status,
+    }
@@ -0,0 +1,71 @@
+# app/payroll/money.py
+"""
+Fixed-point money helpers: amounts as integer paise.
+
+The Decimal payroll path rounds in three ways, and each has an exact integer
+counterpart here:
+
+  _to_decimal(x)             half-up to 0.01          -> paise_half_up
+  Decimal.quantize(0.01)     half-even (context)      -> paise_half_even / rhe_div
+  amount * pct / 100         exact, then quantize     -> ratio + rhe_div
+
+PAYROLL_MONEY_MODE=paise makes services.build_payslip use the integer
+implementation; payslips are identical to the Decimal ones
+(scripts/check_money_paise.py).
+"""
+import os
+from functools import reduce
+from math import gcd
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Tuple
+
+MONEY_MODES = ('decimal', 'paise')
+MONEY_MODE = os.getenv("PAYROLL_MONEY_MODE", "decimal").lower()
+
+_CENT = Decimal('0.01')
+# Decimal.quantize(0.01) fails (InvalidOperation) from 28 digits of paise on
+QUANTIZE_LIMIT = 10 ** 28
+
+
+def rhe_div(num: int, den: int) -> int:
+    """num / den rounded half-even to an integer (den > 0)."""
+    q, r = divmod(num, den)
+    twice = 2 * r
+    if twice > den or (twice == den and q & 1):
+        return q + 1
+    return q
+
+
+def ratio(pct: Decimal) -> Tuple[int, int]:
+    """(num, den) such that amount * pct / 100 == amount * num / den."""
+    n, d = pct.as_integer_ratio()
+    return n, 100 * d
+
+
+def common_den(dens) -> int:
+    """Least common multiple of ratio() denominators (100 for none)."""
+    return reduce(lambda a, b: a * b // gcd(a, b), dens, 100)
+
+
+def paise_half_even(d: Decimal) -> int:
+    """Paise of d.quantize(Decimal('0.01')) under the default (half-even) context."""
+    n, den = d.as_integer_ratio()
+    return rhe_div(100 * n, den)
+
+
+def paise_half_up(x) -> int:
+    """Paise of services._to_decimal(x)."""
+    if x is None:
+        return 0
+    return int(Decimal(str(x)).quantize(_CENT, rounding=ROUND_HALF_UP).scaleb(2))
+
+
+def div_paise(d: Decimal, n: int) -> int:
+    """Paise of (d / n).quantize(Decimal('0.01'))."""
+    num, den = d.as_integer_ratio()
+    return rhe_div(100 * num, den * n)
+
+
+def to_decimal(paise: int) -> Decimal:
+    """The quantized Decimal amount of `paise`."""
+    return Decimal(paise).scaleb(-2)
@@ -0,0 +1,276 @@
+# app/payroll/refdata.py
+"""
+In-process cache for payroll reference data: the `salary_components`
+catalog, `tax_regimes` + `tax_slabs` and `professional_tax_rules`.
+
+These tables change a couple of times a year, so they are loaded together
+into an immutable, versioned snapshot that lives for REFDATA_TTL seconds or
+until invalidate() is called (POST /api/payroll/refdata/invalidate).
+invalidate() also bumps the shared generation of the "payroll_refdata"
+cache tag (app/cache.py); every worker compares it with the generation its
+snapshot was loaded under (re-read at most every CACHE_GEN_POLL seconds)
+and reloads when it has moved. Slabs
+are kept as pre-sorted Decimal arrays with prefix sums so the tax for an
+income is a bisect plus one partial slab; PT rules are indexed by state and
+salary band.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, List, Optional
+
+from app.cache import cache
+from app.payroll.money import common_den, ratio
+
+_logger = logging.getLogger(__name__)
+
+REFDATA_TTL = int(os.getenv("PAYROLL_REFDATA_TTL", "3600"))
+REFDATA_TAG = "payroll_refdata"
+
+_CENT = Decimal('0.01')
+_ZERO = Decimal('0.00')
+_HUNDRED = Decimal('100')
+
+
+def rows_digest(rows: List[Dict[str, Any]]) -> str:
+    """Stable content hash of table rows (used in payslip input fingerprints)."""
+    return hashlib.sha1(json.dumps(rows, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _to_decimal(x) -> Decimal:
+    # same rounding as services._to_decimal
+    if x is None:
+        return Decimal("0.00")
+    return (Decimal(str(x))).quantize(_CENT, rounding=ROUND_HALF_UP)
+
+
+class TaxSlabTable:
+    """
+    Slabs of one regime, sorted by `from_amount`. tax_for() gives exactly the
+    result of services.compute_annual_tax_from_slabs on the same rows; when
+    slabs overlap it falls back to the plain loop.
+    """
+
+    def __init__(self, slabs: List[Dict[str, Any]]):
+        self.slabs = sorted(slabs, key=lambda s: Decimal(str(s.get('from_amount', 0))))
+        self.digest = rows_digest(self.slabs)
+        self.froms = [_to_decimal(s.get('from_amount', 0)) for s in self.slabs]
+        self.tos = [_to_decimal(s['to_amount']) if s.get('to_amount') is not None else None for s in self.slabs]
+        self.rates = [Decimal(str(s.get('rate_percent', 0))) for s in self.slabs]
+        self.disjoint = all(
+            self.tos[i] is not None and self.tos[i] <= self.froms[i + 1] for i in range(len(self.slabs) - 1)
+        )
+        # prefix[i]: tax of slabs 0..i taken in full, summed in the same order as the loop
+        self.prefix: List[Decimal] = []
+        total = _ZERO
+        for i in range(len(self.slabs)):
+            if self.tos[i] is not None and self.tos[i] > self.froms[i]:
+                total += ((self.tos[i] - self.froms[i]) * self.rates[i]) / _HUNDRED
+            self.prefix.append(total)
+
+        # integer paise: tax = tax_numerator(x) / tax_den, exactly
+        ratios = [ratio(r) for r in self.rates]
+        self.tax_den = common_den(d for _, d in ratios)
+        self.rate_nums = [n * (self.tax_den // d) for n, d in ratios]
+        self.froms_paise = [int(f.scaleb(2)) for f in self.froms]
+        self.tos_paise = [int(t.scaleb(2)) if t is not None else None for t in self.tos]
+        self.prefix_num: List[int] = []
+        acc = 0
+        for i in range(len(self.slabs)):
+            if self.tos_paise[i] is not None and self.tos_paise[i] > self.froms_paise[i]:
+                acc += (self.tos_paise[i] - self.froms_paise[i]) * self.rate_nums[i]
+            self.prefix_num.append(acc)
+
+    def __len__(self):
+        return len(self.slabs)
+
+    def _slab_tax(self, i: int, taxable_income: Decimal) -> Decimal:
+        frm, to = self.froms[i], self.tos[i]
+        if taxable_income <= frm:
+            return _ZERO
+        amount = taxable_income - frm if to is None else min(taxable_income, to) - frm
+        if amount <= 0:
+            return _ZERO
+        return (amount * self.rates[i]) / _HUNDRED
+
+    def tax_for(self, taxable_income: Decimal) -> Decimal:
+        if not self.disjoint:
+            tax = _ZERO
+            for i in range(len(self.slabs)):
+                s = self._slab_tax(i, taxable_income)
+                if s:
+                    tax += s
+            return tax.quantize(_CENT)
+        k = bisect_left(self.froms, taxable_income)  # slabs 0..k-1 start below the income
+        if k == 0:
+            return _ZERO.quantize(_CENT)
+        tax = self.prefix[k - 2] if k >= 2 else _ZERO
+        partial = self._slab_tax(k - 1, taxable_income)
+        if partial:
+            tax += partial
+        return tax.quantize(_CENT)
+
+    def _slab_num(self, i: int, x: int) -> int:
+        frm, to = self.froms_paise[i], self.tos_paise[i]
+        amount = x - frm if to is None else min(x, to) - frm
+        return amount * self.rate_nums[i] if amount > 0 else 0
+
+    def tax_numerator(self, taxable_paise: int) -> int:
+        """tax_for() on paise, unrounded: the exact tax in paise is this / tax_den."""
+        if not self.disjoint:
+            return sum(self._slab_num(i, taxable_paise) for i in range(len(self.slabs)))
+        k = bisect_left(self.froms_paise, taxable_paise)
+        if k == 0:
+            return 0
+        return (self.prefix_num[k - 2] if k >= 2 else 0) + self._slab_num(k - 1, taxable_paise)
+
+
+class ProfessionalTaxBands:
+    """
+    PT rules of one state. lookup() returns the amount of the first rule whose
+    [min, max] band contains the monthly salary, like the original loop;
+    non-overlapping bands are found by bisect.
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.rules = list(rules)
+        self.digest = rows_digest(self.rules)
+        bands = [(_to_decimal(p.get('min_monthly_salary') or 0),
+                  _to_decimal(p.get('max_monthly_salary') or 999999999),
+                  _to_decimal(p.get('monthly_amount') or 0)) for p in self.rules]
+        self.ordered = bands
+        self.sorted = sorted(bands, key=lambda b: b[0])
+        self.mins = [b[0] for b in self.sorted]
+        self.disjoint = all(self.sorted[i][1] < self.sorted[i + 1][0] for i in range(len(self.sorted) - 1))
+        self.ordered_paise = [(int(lo.scaleb(2)), int(hi.scaleb(2)), amt) for lo, hi, amt in bands]
+
+    def __len__(self):
+        return len(self.rules)
+
+    def lookup(self, monthly_salary: Decimal) -> Decimal:
+        if not self.disjoint:
+            for lo, hi, amt in self.ordered:
+                if lo <= monthly_salary <= hi:
+                    return amt
+            return _ZERO
+        i = bisect_right(self.mins, monthly_salary) - 1
+        if i >= 0 and monthly_salary <= self.sorted[i][1]:
+            return self.sorted[i][2]
+        return _ZERO
+
+    def lookup_paise(self, monthly_paise: int) -> Decimal:
+        """lookup() for a monthly salary in paise (returns the Decimal amount)."""
+        for lo, hi, amt in self.ordered_paise:
+            if lo <= monthly_paise <= hi:
+                return amt
+        return _ZERO
+
+
+class ReferenceData:
+    """Immutable snapshot of the payroll reference tables."""
+
+    def __init__(self, version: int, catalog, regimes, slabs, pt_rules, generation: int = 0):
+        self.version = version
+        self.generation = generation
+        self.loaded_at = time.time()
+        self.catalog: List[Dict[str, Any]] = catalog
+        regime_ids = {r['name']: r['id'] for r in regimes}
+        slabs_by_regime: Dict[Any, List[Dict[str, Any]]] = {}
+        for s in slabs:
+            slabs_by_regime.setdefault(s.get('tax_regime_id'), []).append(s)
+        self.tax_tables: Dict[str, TaxSlabTable] = {
+            name: TaxSlabTable(slabs_by_regime.get(rid, [])) for name, rid in regime_ids.items()
+        }
+        by_state: Dict[Any, List[Dict[str, Any]]] = {}
+        for p in pt_rules:
+            by_state.setdefault(p.get('state_code'), []).append(p)
+        self.pt_bands: Dict[Any, ProfessionalTaxBands] = {st: ProfessionalTaxBands(r) for st, r in by_state.items()}
+        self.counts = {'salary_components': len(catalog), 'tax_regimes': len(regimes),
+                       'tax_slabs': len(slabs), 'professional_tax_rules': len(pt_rules)}
+
+    def tax_table(self, regime: str) -> Optional[TaxSlabTable]:
+        """Slab table of a regime by name; None if the regime does not exist."""
+        # first regime with the name wins, as in load_tax_slabs_for_regime
+        return self.tax_tables.get(regime)
+
+    def pt_for_state(self, state) -> Optional[ProfessionalTaxBands]:
+        return self.pt_bands.get(state) if state else None
+
+    def info(self) -> Dict[str, Any]:
+        return {'version': self.version, 'generation': self.generation, 'loaded_at': self.loaded_at,
+                'age_seconds': round(time.time() - self.loaded_at, 1), 'ttl': REFDATA_TTL, 'counts': self.counts}
+
+
+_lock = threading.Lock()
+_snapshot: Optional[ReferenceData] = None
+_version = 0
+
+
+def _load(version: int, generation: int) -> ReferenceData:
+    # imported here: services depends on this module
+    from app.payroll.services import fetch_all
+    regimes = fetch_all('tax_regimes')
+    # keep the first row per name, matching the linear search it replaces
+    seen, uniq = set(), []
+    for r in regimes:
+        if r['name'] not in seen:
+            seen.add(r['name'])
+            uniq.append(r)
+    return ReferenceData(
+        version,
+        fetch_all('salary_components'),
+        uniq,
+        fetch_all('tax_slabs'),
+        fetch_all('professional_tax_rules'),
+        generation,
+    )
+
+
+def _current(snap: Optional[ReferenceData], generation: int) -> bool:
+    return snap is not None and snap.generation == generation and time.time() - snap.loaded_at < REFDATA_TTL
+
+
+def get_reference_data() -> ReferenceData:
+    """
+    Current snapshot, reloaded from Supabase when missing, invalidated (in
+    any worker) or older than REFDATA_TTL.
+    """
+    global _snapshot, _version
+    generation = cache.generations((REFDATA_TAG,))[0]
+    snap = _snapshot
+    if _current(snap, generation):
+        return snap
+    with _lock:
+        snap = _snapshot
+        if _current(snap, generation):
+            return snap
+        _version += 1
+        _snapshot = _load(_version, generation)
+        _logger.info("Payroll reference data loaded (version %s): %s", _version, _snapshot.counts)
+        return _snapshot
+
+
+def invalidate(reason: Optional[str] = None) -> int:
+    """
+    Drop the cached snapshot here and, through the shared generation, in
+    every other worker; the next read reloads it. Returns the new version.
+    """
+    global _snapshot, _version
+    cache.invalidate(REFDATA_TAG)
+    with _lock:
+        _snapshot = None
+        _version += 1
+        _logger.info("Payroll reference data invalidated (%s)", reason or "explicit")
+        return _version
+
+
+def cache_info() -> Dict[str, Any]:
+    snap = _snapshot
+    if snap is None:
+        return {'version': _version, 'loaded': False, 'ttl': REFDATA_TTL}
+    return dict(snap.info(), loaded=True)
@@ -13,11 +13,14 @@ from app.payroll.schemas import (
     ComputeRequest,
     BonusCreate,
     PersistRequest,
+    PersistBulkRequest,
     RunRequest,
+    ResumeRunRequest,
+    SimulationRequest,
     PayslipResponse,
     RunResultResponse,
 )
-from app.payroll import services
+from app.payroll import services, executor, refdata, simulator, bonus_eligibility
 from app.supabase_client import supabase
 
 router = APIRouter(prefix="/api/payroll", tags=["payroll"])
@@ -128,10 +131,36 @@ def persist_payslip_endpoint(req: PersistRequest = Body(...)):
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/persist/bulk", dependencies=[Depends(admin_only)])
+def persist_payslips_bulk_endpoint(req: PersistBulkRequest = Body(...)):
+    try:
+        results = services.persist_payslips_bulk(req.payslips, chunk_size=req.chunk_size or services.PAYROLL_CHUNK_SIZE)
+        failed = [r for r in results if not r["success"]]
+        return {"success": not failed, "total": len(results), "succeeded": len(results) - len(failed), "failed": len(failed), "results": results}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.post("/run", response_model=RunResultResponse, dependencies=[Depends(admin_only)])
 def run_payroll_endpoint(req: RunRequest = Body(...)):
     try:
-        result = services.run_payroll_for_period(req.payroll_period_id, run_by=req.run_by)
+        if req.executor:
+            run = executor.start_payroll_run(
+                req.payroll_period_id,
+                run_by=req.run_by,
+                executor=req.executor,
+                shard_size=req.shard_size or executor.SHARD_SIZE,
+                workers=req.workers,
+                incremental=req.incremental is not False,
+            )
+            return {"success": True, "result": {"run_id": run["id"], "status": run.get("status"), "total": run.get("total_count"), "shards": run.get("shard_count")}}
+        result = services.run_payroll_for_period(
+            req.payroll_period_id,
+            run_by=req.run_by,
+            bulk=req.bulk if req.bulk is not None else True,
+            chunk_size=req.chunk_size or services.PAYROLL_CHUNK_SIZE,
+            incremental=req.incremental is not False,
+        )
         return {"success": True, "result": result}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -143,13 +172,59 @@ def get_run(run_id: int = Path(..., description="Payroll run id")):
         res = supabase.table("payroll_runs").select("*").eq("id", run_id).single().execute()
         if not res or getattr(res, "status_code", None) != 200 or not getattr(res, "data", None):
             raise HTTPException(status_code=404, detail="Payroll run not found")
-        return {"success": True, "run": res.data}
+        run = res.data
+        if run.get("shard_count") is not None and not run.get("parent_run_id"):
+            return {"success": True, "run": run, "progress": executor.run_progress(run)}
+        return {"success": True, "run": run}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/runs/{run_id}/resume", response_model=RunResultResponse, dependencies=[Depends(admin_only)])
+def resume_run(run_id: int = Path(..., description="Payroll run id"), req: ResumeRunRequest = Body(ResumeRunRequest())):
+    try:
+        result = executor.resume_payroll_run(run_id, executor=req.executor, workers=req.workers)
+        return {"success": True, "result": result}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/simulate", dependencies=[Depends(admin_only)])
+def simulate_payroll(req: SimulationRequest = Body(...)):
+    try:
+        result = simulator.simulate(
+            regime=req.regime or "new",
+            baseline_regime=req.baseline_regime or "new",
+            component_changes=[c.dict() for c in req.components] if req.components else None,
+            slabs=req.slabs,
+            bands=req.bands,
+        )
+        return {"success": True, "result": result}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# -------------------------
+# Reference-data cache (tax slabs, PT rules, component catalog)
+# -------------------------
+@router.get("/refdata")
+def refdata_info():
+    return {"success": True, "refdata": refdata.cache_info()}
+
+
+@router.post("/refdata/invalidate", dependencies=[Depends(admin_only)])
+def refdata_invalidate(reload: Optional[bool] = Query(True, description="Reload immediately instead of on next use")):
+    try:
+        refdata.invalidate("api")
+        if reload:
+            refdata.get_reference_data()
+        return {"success": True, "refdata": refdata.cache_info()}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/periods")
 def list_periods():
     try:
@@ -207,6 +282,7 @@ def create_bonus(b: BonusCreate = Body(...)):
             # success
             if getattr(res, "status_code", None) in (200, 201):
                 data = getattr(res, "data", None) or []
+                bonus_eligibility.invalidate(b.employee_id)
                 return {"success": True, "bonus": data[0] if isinstance(data, list) and data else data}
             # table not found?
             if _is_table_not_found(res):
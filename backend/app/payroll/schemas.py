@@ -44,12 +44,59 @@ class PersistRequest(BaseModel):
     payslip: Optional[Dict[str, Any]] = Field(None, description="Full payslip dict (if you already computed it client-side)")
 
 
+class PersistBulkRequest(BaseModel):
+    """
+    Persist many already-computed payslips in chunked upserts.
+    """
+    payslips: List[Dict[str, Any]] = Field(..., description="Payslip dicts as returned by /compute")
+    chunk_size: Optional[int] = Field(500, ge=1, le=5000, description="Rows per upsert request")
+
+
 class RunRequest(BaseModel):
     """
     Run payroll for an entire payroll period (bulk).
     """
     payroll_period_id: int = Field(..., description="Payroll period id (bigint)")
     run_by: Optional[str] = Field(None, description="Identifier/email of the user running payroll (for audit)")
+    bulk: Optional[bool] = Field(True, description="Prefetch shared data and compute/upsert in chunks instead of per employee")
+    chunk_size: Optional[int] = Field(500, ge=1, le=5000, description="Employees per compute/upsert chunk in bulk mode")
+    incremental: Optional[bool] = Field(True, description="Skip employees whose draft payslip inputs are unchanged since the last run")
+    executor: Optional[str] = Field(None, description="'process' or 'celery' to run sharded in the background; omit to run synchronously")
+    shard_size: Optional[int] = Field(1000, ge=1, description="Employees per shard when an executor is used")
+    workers: Optional[int] = Field(None, ge=1, description="Process pool size for the 'process' executor (default: CPU count)")
+
+
+class ResumeRunRequest(BaseModel):
+    """
+    Resume the unfinished shards of a sharded payroll run.
+    """
+    executor: Optional[str] = Field(None, description="'process' or 'celery' (default: the run's original executor)")
+    workers: Optional[int] = Field(None, ge=1)
+
+
+class ComponentChange(BaseModel):
+    """
+    Change to one catalog component for a simulation (matched by code; unknown codes are added).
+    """
+    code: str = Field(..., description="Component code, eg. BASIC")
+    calc_method: Optional[str] = Field(None, description="FIXED | PERCENT_OF | FORMULA")
+    calc_value: Optional[str] = Field(None, description="Amount, percent or formula")
+    base_component_code: Optional[str] = Field(None, description="Base component for PERCENT_OF")
+    type: Optional[str] = Field(None, description="EARNING | DEDUCTION | EMPLOYER_CONTRIBUTION")
+    is_taxable: Optional[bool] = None
+    name: Optional[str] = None
+    ordering: Optional[int] = None
+
+
+class SimulationRequest(BaseModel):
+    """
+    What-if simulation over all active employees: candidate structure and tax regime vs. the current ones.
+    """
+    regime: Optional[str] = Field('new', description="Candidate tax regime name")
+    baseline_regime: Optional[str] = Field('new', description="Tax regime of the baseline")
+    components: Optional[List[ComponentChange]] = Field(None, description="Candidate changes to the salary component catalog")
+    slabs: Optional[List[Dict[str, Any]]] = Field(None, description="Explicit candidate tax slabs {from_amount, to_amount, rate_percent}; overrides regime")
+    bands: Optional[List[float]] = Field(None, description="Monthly CTC band edges (rupees) for the distribution report")
 
 
 # --- Response models / helpers ---
@@ -2,15 +2,25 @@
 from decimal import Decimal, getcontext, ROUND_HALF_UP
 from typing import Dict, Any, Optional, List
 from datetime import datetime, date, timezone
+import hashlib
 import json
 import logging
 
 from app.supabase_client import supabase
-from app.payroll.utils import safe_eval
+from app.supabase_utils import fetch_in, fetch_paged
+from app.payroll.structure import SalaryPlan, get_plan
+from app.payroll import refdata, bonus_eligibility, money
+from app.payroll.refdata import TaxSlabTable, ProfessionalTaxBands, rows_digest
 
 getcontext().prec = 28
 _logger = logging.getLogger(__name__)
 
+# Bulk run tuning: employees computed/upserted per chunk
+# (paging and `in_` batch sizes: app/supabase_utils.py)
+PAYROLL_CHUNK_SIZE = 500
+# bump when the payslip computation changes so incremental runs recompute everyone
+FINGERPRINT_VERSION = 1
+
 # -------------------------
 # Helper utilities
 # -------------------------
@@ -48,8 +58,7 @@ def _to_decimal(x) -> Decimal:
         return Decimal("0.00")
     return (Decimal(str(x))).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
-def fetch_all(table: str, filters: Optional[List[tuple]] = None):
-    q = supabase.table(table).select("*")
+def _apply_filters(q, filters: Optional[List[tuple]]):
     if filters:
         for (col, op, val) in filters:
             if op == 'eq':
@@ -60,19 +69,47 @@ def fetch_all(table: str, filters: Optional[List[tuple]] = None):
                 q = q.gte(col, val)
             elif op == 'lte':
                 q = q.lte(col, val)
+            elif op == 'or':
+                q = q.or_(val)
+    return q
+
+def fetch_all(table: str, filters: Optional[List[tuple]] = None):
+    q = _apply_filters(supabase.table(table).select("*"), filters)
     res = q.execute()
     data = _extract_data(res)
     if not data:
         return []
     return data
 
+def _parse_datetime(v) -> Optional[datetime]:
+    if not v:
+        return None
+    if isinstance(v, datetime):
+        dt = v
+    else:
+        dt = datetime.fromisoformat(str(v).replace('Z', '+00:00'))
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+def _parse_date(v) -> Optional[date]:
+    if not v:
+        return None
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+    return datetime.strptime(str(v)[:10], '%Y-%m-%d').date()
+
 # -------------------------
 # Load catalog and overrides
 # -------------------------
 def load_employee_structure(employee_id: Any):
-    catalog = fetch_all('salary_components')
-    catalog_map = {c['code']: c for c in catalog}
+    catalog = refdata.get_reference_data().catalog
     overrides = fetch_all('employee_salary_components', [('employee_id','eq', employee_id)])
+    return build_comp_map(catalog, overrides)
+
+def build_comp_map(catalog: List[Dict[str, Any]], overrides: List[Dict[str, Any]]):
+    """Merge the `salary_components` catalog with one employee's overrides."""
+    catalog_map = {c['code']: c for c in catalog}
     override_by_compid = {o['component_id']: o for o in overrides}
 
     comp_map = {}
@@ -108,21 +145,26 @@ def get_employee_annual_ctc(employee_id: Any) -> Decimal:
                 return _to_decimal(g.data.get('annual_ctc'))
     return Decimal('0.00')
 
+def annual_ctc_from_assignment(assign: Optional[Dict[str, Any]], grade: Optional[Dict[str, Any]]) -> Decimal:
+    """Same resolution as `get_employee_annual_ctc`, on already-fetched rows."""
+    if not assign:
+        return Decimal('0.00')
+    if assign.get('custom_annual_ctc'):
+        return _to_decimal(assign['custom_annual_ctc'])
+    if assign.get('grade_id') and grade:
+        return _to_decimal(grade.get('annual_ctc'))
+    return Decimal('0.00')
+
 def get_active_bonuses_for_period(employee_id: Any, period_start: date, period_end: date):
-    resp = supabase.table('employee_bonuses').select('*').eq('employee_id', employee_id).execute()
-    if not resp or getattr(resp, 'status_code', None) != 200:
-        return []
-    bonuses = _extract_data(resp) or []
+    """Bonuses that apply to the period, served from the shared per-period eligibility index."""
+    return bonus_eligibility.active_bonuses(employee_id, period_start, period_end)
+
+def filter_active_bonuses(bonuses: List[Dict[str, Any]], period_start: date, period_end: date):
+    """Keep the bonuses that apply to the period (rules in app.payroll.bonus_eligibility)."""
     result = []
     for b in bonuses:
-        ef = b.get('effective_from')
-        et = b.get('effective_to')
-        ef_date = None
-        et_date = None
-        if ef:
-            ef_date = ef if isinstance(ef, date) else datetime.strptime(str(ef)[:10], '%Y-%m-%d').date()
-        if et:
-            et_date = et if isinstance(et, date) else datetime.strptime(str(et)[:10], '%Y-%m-%d').date()
+        ef_date = _parse_date(b.get('effective_from'))
+        et_date = _parse_date(b.get('effective_to'))
         typ = (b.get('bonus_type') or 'ONE_TIME')
         include = False
         if typ == 'ONE_TIME':
@@ -149,19 +191,17 @@ def get_active_bonuses_for_period(employee_id: Any, period_start: date, period_e
 # Tax helpers (data-driven)
 # -------------------------
 def load_tax_slabs_for_regime(regime_name: str):
-    regimes = fetch_all('tax_regimes')
-    sel = None
-    for r in regimes:
-        if r['name'] == regime_name:
-            sel = r
-            break
-    if not sel:
-        return []
-    slabs = fetch_all('tax_slabs', [('tax_regime_id','eq', sel['id'])])
-    slabs_sorted = sorted(slabs, key=lambda s: Decimal(str(s.get('from_amount', 0))))
-    return slabs_sorted
+    """Slab rows of the regime sorted by from_amount (served from the reference-data cache)."""
+    table = refdata.get_reference_data().tax_table(regime_name)
+    return list(table.slabs) if table else []
 
-def compute_annual_tax_from_slabs(taxable_income: Decimal, slabs: List[Dict[str, Any]]):
+def compute_annual_tax_from_slabs(taxable_income: Decimal, slabs):
+    """
+    Annual tax for `taxable_income`. `slabs` is either a list of slab rows or
+    a pre-compiled refdata.TaxSlabTable (bisect fast path, same result).
+    """
+    if isinstance(slabs, TaxSlabTable):
+        return slabs.tax_for(taxable_income)
     tax = Decimal('0.00')
     for s in slabs:
         frm = _to_decimal(s.get('from_amount', 0))
@@ -198,64 +238,47 @@ def compute_payslip(employee_id: Any, payroll_period_id: int, attendance: Option
     period_end = period['period_end'] if isinstance(period['period_end'], date) else datetime.strptime(str(period['period_end'])[:10], '%Y-%m-%d').date()
 
     annual_ctc = get_employee_annual_ctc(employee_id)
-    monthly_ctc = (annual_ctc / Decimal('12')).quantize(Decimal('0.01'))
-
-    comp_map = load_employee_structure(employee_id)
-    comp_map['MONTHLY_CTC'] = {
-        'code': 'MONTHLY_CTC', 'name': 'Monthly CTC', 'type': 'EARNING', 'is_taxable': True,
-        'calc_method': 'FIXED', 'calc_value': str(monthly_ctc), 'amount': monthly_ctc, 'ordering': 0
-    }
+    plan = get_plan(load_employee_structure(employee_id))
+    bonuses = get_active_bonuses_for_period(employee_id, period_start, period_end)
+    ref = refdata.get_reference_data()
+    slabs = ref.tax_table(regime) or []
+    pt_rules = ref.pt_for_state(employee.get('work_state')) or []
+
+    return build_payslip(employee_id, payroll_period_id, annual_ctc, plan, bonuses, slabs, pt_rules, attendance)
+
+def professional_tax_for(pt_rules, monthly_ctc: Decimal) -> Decimal:
+    """PT amount from a list of the state's rules or a refdata.ProfessionalTaxBands index."""
+    if isinstance(pt_rules, ProfessionalTaxBands):
+        return pt_rules.lookup(monthly_ctc)
+    for p in pt_rules:
+        min_s = _to_decimal(p.get('min_monthly_salary') or 0)
+        max_s = _to_decimal(p.get('max_monthly_salary') or 999999999)
+        if monthly_ctc >= min_s and monthly_ctc <= max_s:
+            return _to_decimal(p.get('monthly_amount') or 0)
+    return Decimal('0.00')
 
-    computed_cache: Dict[str, Decimal] = {}
-
-    def compute_component(code: str, seen=None) -> Decimal:
-        if seen is None:
-            seen = set()
-        if code in computed_cache:
-            return computed_cache[code]
-        if code not in comp_map:
-            return Decimal('0.00')
-        if code in seen:
-            raise RuntimeError('circular reference ' + code)
-        seen.add(code)
-        c = comp_map[code]
-        method = (c.get('calc_method') or '').upper()
-        val = str(c.get('calc_value') or '')
-        if method == 'FIXED':
-            amt = Decimal(val or '0')
-        elif method == 'PERCENT_OF':
-            base = c.get('base_component_code') or 'MONTHLY_CTC'
-            base_amt = compute_component(base, seen)
-            pct = Decimal(val or '0')
-            amt = (base_amt * pct) / Decimal('100')
-        elif method == 'FORMULA':
-            expr = val
-            # Replace tokens carefully so longer tokens match first
-            for token in sorted(comp_map.keys(), key=lambda x: -len(x)):
-                if token in expr:
-                    token_val = compute_component(token, seen)
-                    expr = expr.replace(token, str(token_val))
-            amt = safe_eval(expr)
-        else:
-            try:
-                amt = Decimal(val or '0')
-            except Exception:
-                amt = Decimal('0')
-        computed_cache[code] = amt.quantize(Decimal('0.01'))
-        return computed_cache[code]
+def build_payslip(employee_id: Any, payroll_period_id: int, annual_ctc: Decimal, plan: SalaryPlan,
+                  bonuses: List[Dict[str, Any]], slabs: List[Dict[str, Any]], pt_rules: List[Dict[str, Any]],
+                  attendance: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """
+    Pure payslip computation on pre-loaded inputs (no database access):
+    `plan` is the compiled salary structure (see app.payroll.structure),
+    `bonuses` already filtered to the period, `pt_rules` those of the employee's state.
+    """
+    if money.MONEY_MODE == 'paise':
+        return build_payslip_paise(employee_id, payroll_period_id, annual_ctc, plan, bonuses, slabs, pt_rules, attendance)
+    if attendance is None:
+        attendance = {}
+    monthly_ctc = (annual_ctc / Decimal('12')).quantize(Decimal('0.01'))
 
-    for code in list(comp_map.keys()):
-        try:
-            compute_component(code)
-        except Exception:
-            computed_cache[code] = Decimal('0.00')
+    computed_cache = plan.evaluate(monthly_ctc)
+    comp_map = dict(plan.components)
 
     # Include active bonuses
-    bonuses = get_active_bonuses_for_period(employee_id, period_start, period_end)
     for b in bonuses:
         if b.get('is_percentage'):
             basecode = b.get('percent_of_component') or 'BASIC'
-            base_amt = computed_cache.get(basecode) or compute_component(basecode)
+            base_amt = computed_cache.get(basecode) or Decimal('0.00')
             bonus_amt = (base_amt * Decimal(str(b.get('amount') or 0))) / Decimal('100')
         else:
             bonus_amt = Decimal(str(b.get('amount') or 0))
@@ -292,21 +315,10 @@ def compute_payslip(employee_id: Any, payroll_period_id: int, attendance: Option
             employer_contrib += amt
 
     annual_taxable = (taxable_income * Decimal('12')).quantize(Decimal('0.01'))
-    slabs = load_tax_slabs_for_regime(regime)
     annual_tax = compute_annual_tax_from_slabs(annual_taxable, slabs) if slabs else Decimal('0.00')
     monthly_income_tax = (annual_tax / Decimal('12')).quantize(Decimal('0.01'))
 
-    prof_tax = Decimal('0.00')
-    state = employee.get('work_state')
-    if state:
-        ptrs = supabase.table('professional_tax_rules').select('*').eq('state_code', state).execute()
-        if ptrs and getattr(ptrs, 'status_code', None) == 200 and getattr(ptrs, 'data', None):
-            for p in ptrs.data:
-                min_s = _to_decimal(p.get('min_monthly_salary') or 0)
-                max_s = _to_decimal(p.get('max_monthly_salary') or 999999999)
-                if monthly_ctc >= min_s and monthly_ctc <= max_s:
-                    prof_tax = _to_decimal(p.get('monthly_amount') or 0)
-                    break
+    prof_tax = professional_tax_for(pt_rules, monthly_ctc)
 
     total_deductions = (total_deductions + monthly_income_tax + prof_tax).quantize(Decimal('0.01'))
     net = (gross - total_deductions).quantize(Decimal('0.01'))
@@ -333,17 +345,116 @@ def compute_payslip(employee_id: Any, payroll_period_id: int, attendance: Option
 
     return payslip
 
+def build_payslip_paise(employee_id: Any, payroll_period_id: int, annual_ctc: Decimal, plan: SalaryPlan,
+                        bonuses: List[Dict[str, Any]], slabs: List[Dict[str, Any]], pt_rules: List[Dict[str, Any]],
+                        attendance: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """
+    build_payslip on integer paise (PAYROLL_MONEY_MODE=paise). Rounds exactly
+    where the Decimal code rounds, so the payslip is identical; prorated
+    earnings are still multiplied in Decimal.
+    """
+    if attendance is None:
+        attendance = {}
+    monthly_ctc = money.div_paise(annual_ctc, 12)
+
+    computed = plan.evaluate_paise(monthly_ctc)
+    comp_map = plan.components
+    bonus_codes = []
+
+    for b in bonuses:
+        if b.get('is_percentage'):
+            basecode = b.get('percent_of_component') or 'BASIC'
+            num, den = money.ratio(Decimal(str(b.get('amount') or 0)))
+            bonus_amt = money.rhe_div((computed.get(basecode) or 0) * num, den)
+        else:
+            bonus_amt = money.paise_half_even(Decimal(str(b.get('amount') or 0)))
+        code = f"BONUS_{b['id']}"
+        if comp_map is plan.components:
+            comp_map = dict(plan.components)
+        comp_map[code] = {
+            'code': code, 'name': b.get('code') or code, 'type': 'EARNING', 'is_taxable': True,
+            'calc_method': 'FIXED', 'calc_value': str(money.to_decimal(bonus_amt)), 'amount': money.to_decimal(bonus_amt), 'ordering': 5
+        }
+        if code not in bonus_codes:
+            bonus_codes.append(code)
+        computed[code] = bonus_amt
+
+    wd = attendance.get('working_days', 0)
+    pd = attendance.get('present_days', wd)
+    proration = None
+    if wd and wd > 0 and Decimal(str(pd)) != Decimal(str(wd)):
+        proration = (Decimal(str(pd)) / Decimal(str(wd)))
+
+    # a bonus code shadowing a catalog component changes its type; walk the map then
+    if any(code in plan.components for code in bonus_codes):
+        earnings = [(c, bool(m.get('is_taxable', True))) for c, m in comp_map.items() if m.get('type') == 'EARNING']
+        deductions = [c for c, m in comp_map.items() if m.get('type') == 'DEDUCTION']
+        employer = [c for c, m in comp_map.items() if m.get('type') == 'EMPLOYER_CONTRIBUTION']
+    else:
+        earnings = plan.earnings + [(code, True) for code in bonus_codes]
+        deductions, employer = plan.deductions, plan.employer_contributions
+
+    gross = taxable_income = 0
+    for code, taxable in earnings:
+        amt = computed.get(code, 0)
+        if proration is not None:
+            amt = money.paise_half_even(money.to_decimal(amt) * proration)
+        gross += amt
+        if taxable:
+            taxable_income += amt
+    total_deductions = sum(computed.get(code, 0) for code in deductions)
+    employer_contrib = sum(computed.get(code, 0) for code in employer)
+
+    monthly_income_tax, tax_negative = 0, False
+    if slabs:
+        table = slabs if isinstance(slabs, TaxSlabTable) else TaxSlabTable(slabs)
+        num = table.tax_numerator(taxable_income * 12)
+        annual_tax = money.rhe_div(num, table.tax_den)
+        monthly_income_tax = money.rhe_div(annual_tax, 12)
+        tax_negative = annual_tax < 0 or num < 0
+
+    if isinstance(pt_rules, ProfessionalTaxBands):
+        prof_tax_d = pt_rules.lookup_paise(monthly_ctc)
+    else:
+        prof_tax_d = professional_tax_for(pt_rules, money.to_decimal(monthly_ctc))
+    prof_tax = int(prof_tax_d.scaleb(2))
+
+    total_deductions = total_deductions + monthly_income_tax + prof_tax
+    net = gross - total_deductions
+    total_employer_cost = gross + employer_contrib
+
+    order = plan.breakdown_order() if comp_map is plan.components else \
+        sorted(comp_map.keys(), key=lambda k: comp_map[k].get('ordering', 100))
+    breakdown = {}
+    for code in order:
+        comp = comp_map[code]
+        breakdown[code] = {'amount': computed.get(code, 0) / 100, 'type': comp.get('type'), 'is_taxable': comp.get('is_taxable', True)}
+
+    # a negative tax rounding to zero is -0.00 in Decimal, and float() keeps the sign
+    breakdown['INCOME_TAX'] = {'amount': -0.0 if tax_negative and not monthly_income_tax else monthly_income_tax / 100, 'type': 'DEDUCTION'}
+    breakdown['PROFESSIONAL_TAX'] = {'amount': float(prof_tax_d), 'type': 'DEDUCTION'}
+
+    payslip = {
+        'employee_id': employee_id,
+        'payroll_period_id': payroll_period_id,
+        'gross_salary': gross / 100,
+        'total_deductions': total_deductions / 100,
+        'net_salary': net / 100,
+        'total_employer_cost': total_employer_cost / 100,
+        'breakdown': breakdown,
+        'computed_at': datetime.utcnow().replace(tzinfo=timezone.utc).isoformat()
+    }
+
+    return payslip
+
 # -------------------------
 # Persist payslip -> your existing `payroll` table
 # -------------------------
-def persist_payslip(payslip: dict) -> dict:
+def payroll_row(payslip: dict, month: Optional[Any] = None) -> dict:
     """
-    Persist to the existing `payroll` table.
-    Expects `payslip` format returned by compute_payslip.
-    Uses upsert if available, otherwise fallback to insert/update.
+    Build the `payroll` table row for a payslip returned by compute_payslip.
+    `month` (payroll_periods.period_start) is only set when given.
     """
-    emp_id = payslip.get('employee_id')
-    payroll_period_id = payslip.get('payroll_period_id')
     gross = _to_decimal(payslip.get('gross_salary', 0))
     total_deductions = _to_decimal(payslip.get('total_deductions', 0))
     net = _to_decimal(payslip.get('net_salary', 0))
@@ -365,8 +476,8 @@ def persist_payslip(payslip: dict) -> dict:
     now_iso = datetime.utcnow().replace(tzinfo=timezone.utc).isoformat()
 
     data = {
-        'employee_id': emp_id,
-        'payroll_period_id': payroll_period_id,
+        'employee_id': payslip.get('employee_id'),
+        'payroll_period_id': payslip.get('payroll_period_id'),
         # keep `month` untouched unless you choose to populate it from payroll_periods
         'base_salary': float(base_salary),
         'allowances': float(allowances),
@@ -379,8 +490,23 @@ def persist_payslip(payslip: dict) -> dict:
         'payment_status': 'PENDING',
         'created_at': now_iso,
         'updated_at': now_iso,
-        'status': 'DRAFT'
+        'status': 'DRAFT',
+        # None clears a stale fingerprint when a payslip is persisted outside a run
+        'input_fingerprint': payslip.get('input_fingerprint'),
     }
+    if month:
+        data['month'] = month
+    return data
+
+def persist_payslip(payslip: dict) -> dict:
+    """
+    Persist to the existing `payroll` table.
+    Expects `payslip` format returned by compute_payslip.
+    Uses upsert if available, otherwise fallback to insert/update.
+    """
+    emp_id = payslip.get('employee_id')
+    payroll_period_id = payslip.get('payroll_period_id')
+    data = payroll_row(payslip)
 
     # If payroll_period_id present, attempt to fill month from payroll_periods.period_start (optional)
     if payroll_period_id:
@@ -429,10 +555,207 @@ def persist_payslip(payslip: dict) -> dict:
         return out[0]
     return out or {}
 
+def _upsert_payroll_rows(rows: List[dict]) -> List[dict]:
+    res = supabase.table('payroll').upsert(rows, on_conflict='employee_id,payroll_period_id').execute()
+    if not res or getattr(res, 'status_code', 200) not in (200, 201):
+        raise RuntimeError(f'Failed to persist payslips: status={getattr(res, "status_code", None)} data={getattr(res, "data", str(res))}')
+    out = _extract_data(res)
+    return out if isinstance(out, list) else []
+
+def _upsert_isolating_failures(rows: List[dict], results: Dict[tuple, dict]):
+    """
+    Upsert `rows` in one request; if the statement fails, split the batch in
+    halves until the failing rows are isolated (log2 extra round-trips).
+    """
+    try:
+        stored = _upsert_payroll_rows(rows)
+    except Exception as exc:
+        if len(rows) == 1:
+            r = rows[0]
+            results[(r['employee_id'], r['payroll_period_id'])] = {'success': False, 'error': str(exc)}
+            return
+        mid = len(rows) // 2
+        _upsert_isolating_failures(rows[:mid], results)
+        _upsert_isolating_failures(rows[mid:], results)
+        return
+    ids = {(r.get('employee_id'), r.get('payroll_period_id')): r.get('id') for r in stored}
+    for r in rows:
+        key = (r['employee_id'], r['payroll_period_id'])
+        results[key] = {'success': True, 'id': ids.get(key)}
+
+def persist_payslips_bulk(payslips: List[dict], chunk_size: int = PAYROLL_CHUNK_SIZE,
+                          months: Optional[Dict[Any, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Persist many payslips to `payroll`, upserting `chunk_size` rows per request
+    on (employee_id, payroll_period_id). `month` is resolved once per period
+    (pass `months` {payroll_period_id: period_start} to skip the lookup).
+
+    Returns one result per input payslip, in order:
+    {'employee_id', 'payroll_period_id', 'success', 'id' | 'error'}.
+    A failing row does not abort the rest of the batch.
+    """
+    if months is None:
+        period_ids = {ps.get('payroll_period_id') for ps in payslips if ps.get('payroll_period_id')}
+        months = {p['id']: p.get('period_start') for p in fetch_in('payroll_periods', 'id', period_ids, 'id,period_start')}
+
+    results: Dict[tuple, dict] = {}
+    rows: Dict[tuple, dict] = {}
+    for ps in payslips:
+        key = (ps.get('employee_id'), ps.get('payroll_period_id'))
+        if key[0] is None or key[1] is None:
+            results[key] = {'success': False, 'error': "payslip must include 'employee_id' and 'payroll_period_id'"}
+            continue
+        # one row per key per statement; the last payslip wins, as with sequential upserts
+        rows.pop(key, None)
+        rows[key] = payroll_row(ps, months.get(key[1]))
+
+    batch = list(rows.values())
+    for i in range(0, len(batch), chunk_size):
+        _upsert_isolating_failures(batch[i:i + chunk_size], results)
+
+    return [dict(results[(ps.get('employee_id'), ps.get('payroll_period_id'))],
+                 employee_id=ps.get('employee_id'), payroll_period_id=ps.get('payroll_period_id'))
+            for ps in payslips]
+
 # -------------------------
 # Run payroll for a period (bulk)
 # -------------------------
-def run_payroll_for_period(payroll_period_id: int, run_by: Optional[str] = None) -> Dict[str, Any]:
+def load_payroll_context(payroll_period_id: int, regime: str = 'new', incremental: bool = False) -> Dict[str, Any]:
+    """
+    Prefetch the data shared by every employee of a run: the period plus the
+    component catalog, tax slabs and professional-tax rules (reference-data cache).
+    With `incremental`, run_payroll_chunk skips employees whose draft payslip
+    was computed from identical inputs.
+    """
+    period = _extract_data(supabase.table('payroll_periods').select('*').eq('id', payroll_period_id).single().execute())
+    if not period:
+        raise RuntimeError('Payroll period not found')
+    ref = refdata.get_reference_data()
+    period_start, period_end = _parse_date(period['period_start']), _parse_date(period['period_end'])
+    # a run always reads current bonus rows; previews then reuse what it loaded
+    bonus_eligibility.get_index(period_start, period_end, refresh=True)
+    return {
+        'payroll_period_id': payroll_period_id,
+        'period_start': period_start,
+        'period_end': period_end,
+        'month': period.get('period_start'),
+        'regime': regime,
+        'incremental': incremental,
+        'catalog': ref.catalog,
+        'slabs': ref.tax_table(regime) or [],
+        'pt_rules_by_state': ref.pt_bands,
+    }
+
+def load_employee_inputs(employee_ids: List[Any], period_start: date, period_end: date) -> Dict[str, Dict[Any, Any]]:
+    """
+    Batch-load per-employee payroll inputs with `in_`-filtered queries:
+    latest CTC assignment, its grade, component overrides and the bonuses
+    active in the period (eligibility index).
+    """
+    latest_assign: Dict[Any, Dict[str, Any]] = {}
+    for a in fetch_in('employee_salary_assignments', 'employee_id', employee_ids):
+        cur = latest_assign.get(a['employee_id'])
+        if cur is None or str(a.get('effective_from') or '') > str(cur.get('effective_from') or ''):
+            latest_assign[a['employee_id']] = a
+    grade_ids = [a['grade_id'] for a in latest_assign.values() if a.get('grade_id') and not a.get('custom_annual_ctc')]
+    grades = {g['id']: g for g in fetch_in('employee_grades', 'id', grade_ids)}
+
+    overrides: Dict[Any, List[Dict[str, Any]]] = {}
+    for o in fetch_in('employee_salary_components', 'employee_id', employee_ids):
+        overrides.setdefault(o['employee_id'], []).append(o)
+    bonuses = bonus_eligibility.active_bonuses_for(employee_ids, period_start, period_end)
+    return {'assignments': latest_assign, 'grades': grades, 'overrides': overrides, 'bonuses': bonuses}
+
+def payslip_fingerprint(ctx: Dict[str, Any], inputs: Dict[str, Any], attendance: Optional[Dict[str, int]] = None) -> str:
+    """
+    Hash of everything a payslip is computed from: engine version, period,
+    regime and slabs, salary structure (catalog + overrides), CTC assignment,
+    active bonuses, PT rules and attendance. Equal fingerprints mean an
+    identical payslip, so incremental runs can skip the employee.
+    """
+    slabs, pt_rules = ctx['slabs'], inputs['pt_rules']
+    assign = inputs['assignment'] or {}
+    parts = {
+        'v': FINGERPRINT_VERSION,
+        'period': [str(ctx['period_start']), str(ctx['period_end']), ctx.get('month')],
+        'regime': ctx['regime'],
+        'slabs': slabs.digest if isinstance(slabs, TaxSlabTable) else rows_digest(slabs),
+        'structure': inputs['plan'].structure_hash,
+        'assignment': [assign.get('id'), str(assign.get('effective_from')), str(inputs['annual_ctc'])],
+        'bonuses': sorted(inputs['bonuses'], key=lambda b: str(b.get('id'))),
+        'pt': pt_rules.digest if isinstance(pt_rules, ProfessionalTaxBands) else rows_digest(pt_rules),
+        'attendance': attendance or {},
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+def resolve_employee_inputs(employee: Dict[str, Any], ctx: Dict[str, Any], inputs: Dict[str, Dict[Any, Any]]) -> Dict[str, Any]:
+    """Pick one employee's payslip inputs out of the chunk-level batch loaded by load_employee_inputs."""
+    emp_id = employee['id']
+    assign = inputs['assignments'].get(emp_id)
+    grade = inputs['grades'].get(assign.get('grade_id')) if assign else None
+    state = employee.get('work_state')
+    return {
+        'assignment': assign,
+        'annual_ctc': annual_ctc_from_assignment(assign, grade),
+        'plan': get_plan(build_comp_map(ctx['catalog'], inputs['overrides'].get(emp_id, []))),
+        'bonuses': inputs['bonuses'].get(emp_id, []),
+        'pt_rules': (ctx['pt_rules_by_state'].get(state) if state else None) or [],
+    }
+
+def compute_payslip_from_context(employee: Dict[str, Any], ctx: Dict[str, Any], inputs: Dict[str, Dict[Any, Any]],
+                                 attendance: Optional[Dict[str, int]] = None, resolved: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """In-memory equivalent of compute_payslip using prefetched context and inputs."""
+    r = resolved or resolve_employee_inputs(employee, ctx, inputs)
+    return build_payslip(employee['id'], ctx['payroll_period_id'], r['annual_ctc'], r['plan'], r['bonuses'],
+                         ctx['slabs'], r['pt_rules'], attendance)
+
+def _existing_fingerprints(payroll_period_id: int, employee_ids: List[Any]) -> Dict[Any, str]:
+    rows = fetch_in('payroll', 'employee_id', employee_ids, 'employee_id,input_fingerprint,status',
+                    filters=[('payroll_period_id', 'eq', payroll_period_id)])
+    return {r['employee_id']: r.get('input_fingerprint') for r in rows if r.get('status') == 'DRAFT'}
+
+def run_payroll_chunk(employees: List[Dict[str, Any]], ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compute and persist payslips for one chunk of employees: a handful of
+    batched reads, in-memory computation and a single chunked upsert.
+    In incremental mode, employees whose DRAFT payslip fingerprint still
+    matches their inputs are counted as `skipped` and not rewritten.
+    """
+    results = {'total': len(employees), 'succeeded': 0, 'failed': 0, 'skipped': 0, 'errors': []}
+    ids = [e['id'] for e in employees]
+    inputs = load_employee_inputs(ids, ctx['period_start'], ctx['period_end'])
+    existing = _existing_fingerprints(ctx['payroll_period_id'], ids) if ctx.get('incremental') else {}
+    payslips = []
+    for e in employees:
+        try:
+            resolved = resolve_employee_inputs(e, ctx, inputs)
+            fp = payslip_fingerprint(ctx, resolved)
+            if existing.get(e['id']) == fp:
+                results['skipped'] += 1
+                continue
+            payslip = compute_payslip_from_context(e, ctx, inputs, resolved=resolved)
+            payslip['input_fingerprint'] = fp
+            payslips.append(payslip)
+        except Exception as ex:
+            _logger.exception("Failed to compute for employee %s: %s", e.get('id'), ex)
+            results['failed'] += 1
+            results['errors'].append({'employee_id': e.get('id'), 'error': str(ex)})
+    if not payslips:
+        return results
+
+    persisted = persist_payslips_bulk(payslips, chunk_size=len(payslips),
+                                      months={ctx['payroll_period_id']: ctx['month']})
+    for r in persisted:
+        if r['success']:
+            results['succeeded'] += 1
+        else:
+            results['failed'] += 1
+            results['errors'].append({'employee_id': r['employee_id'], 'error': r['error']})
+    return results
+
+def run_payroll_for_period(payroll_period_id: int, run_by: Optional[str] = None,
+                           bulk: bool = True, chunk_size: int = PAYROLL_CHUNK_SIZE,
+                           incremental: bool = True) -> Dict[str, Any]:
     started_at = datetime.utcnow().replace(tzinfo=timezone.utc).isoformat()
     run_insert = {
         'payroll_period_id': payroll_period_id,
@@ -445,18 +768,30 @@ def run_payroll_for_period(payroll_period_id: int, run_by: Optional[str] = None)
         raise RuntimeError('Failed to create payroll run')
     run = _extract_data(run_res)[0]
 
-    emps = fetch_all('employees', [('is_active','eq', True)])
-    results = {'total': len(emps), 'succeeded': 0, 'failed': 0, 'errors': []}
-    for e in emps:
-        try:
-            payslip = compute_payslip(e['id'], payroll_period_id, {}, 'new')
-            persist_payslip(payslip)
-            results['succeeded'] += 1
-        except Exception as ex:
-            _logger.exception("Failed to compute/persist for employee %s: %s", e.get('id'), ex)
-            results['failed'] += 1
-            results['errors'].append({'employee_id': e.get('id'), 'error': str(ex)})
+    if bulk:
+        emps = fetch_paged(lambda: supabase.table('employees').select('id,work_state').eq('is_active', True).order('id'))
+        results = {'total': len(emps), 'succeeded': 0, 'failed': 0, 'skipped': 0, 'errors': []}
+        ctx = load_payroll_context(payroll_period_id, 'new', incremental=incremental)
+        for i in range(0, len(emps), chunk_size):
+            part = run_payroll_chunk(emps[i:i + chunk_size], ctx)
+            results['succeeded'] += part['succeeded']
+            results['failed'] += part['failed']
+            results['skipped'] += part['skipped']
+            results['errors'].extend(part['errors'])
+    else:
+        emps = fetch_all('employees', [('is_active','eq', True)])
+        results = {'total': len(emps), 'succeeded': 0, 'failed': 0, 'errors': []}
+        for e in emps:
+            try:
+                payslip = compute_payslip(e['id'], payroll_period_id, {}, 'new')
+                persist_payslip(payslip)
+                results['succeeded'] += 1
+            except Exception as ex:
+                _logger.exception("Failed to compute/persist for employee %s: %s", e.get('id'), ex)
+                results['failed'] += 1
+                results['errors'].append({'employee_id': e.get('id'), 'error': str(ex)})
 
     completed_at = datetime.utcnow().replace(tzinfo=timezone.utc).isoformat()
     supabase.table('payroll_runs').update({'status': 'COMPLETED', 'completed_at': completed_at}).eq('id', run['id']).execute()
+    results['run_id'] = run['id']
     return results
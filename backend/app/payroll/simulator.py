@@ -0,0 +1,336 @@
+# app/payroll/simulator.py
+"""
+What-if payroll simulator.
+
+Answers questions like "what if BASIC is 45% of CTC" or "what does the old
+regime cost us" for the whole workforce at once. The active employees' CTCs
+are loaded into columnar NumPy arrays of integer paise and every salary
+structure is evaluated column-wise (one pass per distinct structure), so a
+scenario costs a few array operations instead of one compute_payslip call per
+employee.
+
+The arithmetic reproduces build_payslip exactly for a regular month (no
+bonuses, no proration): PERCENT_OF and all Decimal quantize() calls round
+half-even, `_to_decimal` inputs round half-up, and the annual tax follows
+compute_annual_tax_from_slabs term by term, with slab rates scaled to a
+common integer denominator. Structures that contain FORMULA components are
+evaluated with SalaryPlan.evaluate_paise once per distinct monthly CTC.
+scripts/check_payroll_simulator.py checks the parity on random inputs.
+"""
+import logging
+import time
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.supabase_client import supabase
+from app.payroll import refdata
+from app.payroll.money import common_den, ratio
+from app.payroll.refdata import TaxSlabTable, ProfessionalTaxBands
+from app.payroll.services import annual_ctc_from_assignment, build_comp_map
+from app.payroll.structure import MONTHLY_CTC, SalaryPlan, get_plan
+from app.supabase_utils import fetch_paged
+
+_logger = logging.getLogger(__name__)
+
+# monthly CTC band edges (rupees) for the distribution report; the last band is open
+DEFAULT_BANDS = (0, 25000, 50000, 100000, 200000, 500000)
+# products above this are computed on Python ints instead of int64
+_INT64_SAFE = 2 ** 62
+
+_TOTALS = ('gross', 'deductions', 'income_tax', 'professional_tax', 'total_deductions',
+           'net', 'employer_contribution', 'employer_cost')
+
+
+def _paise(d: Decimal) -> int:
+    """Exact paise of an amount already quantized to 0.01."""
+    return int(d.scaleb(2))
+
+
+def _rhe_div(num: np.ndarray, den: int) -> np.ndarray:
+    """num / den rounded half-even to an integer (den > 0), like Decimal.quantize."""
+    q, r = np.divmod(num, den)
+    twice = r * 2
+    up = (twice > den) | ((twice == den) & (q % 2 != 0))
+    return q + up
+
+
+def _mul_div(values: np.ndarray, num: int, den: int) -> np.ndarray:
+    """values * num / den rounded half-even, falling back to Python ints on overflow."""
+    if values.size and int(np.abs(values).max()) * abs(num) >= _INT64_SAFE:
+        return _rhe_div(values.astype(object) * num, den).astype(np.int64)
+    return _rhe_div(values * num, den)
+
+
+# -------------------------
+# Workforce
+# -------------------------
+class Workforce:
+    """
+    Columnar snapshot of the active employees: CTCs in paise, work states and
+    salary-override groups (employees with identical overrides share a plan).
+    """
+
+    def __init__(self, employees: List[Dict[str, Any]], assignments: List[Dict[str, Any]],
+                 grades: List[Dict[str, Any]], overrides: List[Dict[str, Any]]):
+        self.ids = [e['id'] for e in employees]
+        latest: Dict[Any, Dict[str, Any]] = {}
+        for a in assignments:
+            cur = latest.get(a['employee_id'])
+            if cur is None or str(a.get('effective_from') or '') > str(cur.get('effective_from') or ''):
+                latest[a['employee_id']] = a
+        grade_by_id = {g['id']: g for g in grades}
+        ov_by_emp: Dict[Any, List[Dict[str, Any]]] = {}
+        for o in overrides:
+            ov_by_emp.setdefault(o['employee_id'], []).append(o)
+
+        annual = []
+        state_idx: Dict[Any, int] = {}
+        group_idx: Dict[tuple, int] = {}
+        self.states: List[Any] = []
+        self.override_groups: List[List[Dict[str, Any]]] = []
+        states, groups = [], []
+        for e in employees:
+            assign = latest.get(e['id'])
+            grade = grade_by_id.get(assign.get('grade_id')) if assign else None
+            annual.append(_paise(annual_ctc_from_assignment(assign, grade)))
+            st = e.get('work_state')
+            if st not in state_idx:
+                state_idx[st] = len(self.states)
+                self.states.append(st)
+            states.append(state_idx[st])
+            ovs = ov_by_emp.get(e['id'], [])
+            key = tuple(sorted((str(o.get('component_id')), str(o.get('value_override')), str(o.get('method_override')))
+                               for o in ovs))
+            if key not in group_idx:
+                group_idx[key] = len(self.override_groups)
+                self.override_groups.append(ovs)
+            groups.append(group_idx[key])
+
+        self.annual_ctc = np.array(annual, dtype=np.int64)
+        # build_payslip: (annual_ctc / 12).quantize(0.01)
+        self.monthly_ctc = _rhe_div(self.annual_ctc, 12)
+        self.state = np.array(states, dtype=np.int32)
+        self.group = np.array(groups, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def load_workforce() -> Workforce:
+    """Active employees with their latest CTC assignment, grade and component overrides."""
+    employees = fetch_paged(lambda: supabase.table('employees').select('id,work_state').eq('is_active', True).order('id'))
+    active = {e['id'] for e in employees}
+    assignments = [a for a in fetch_paged(
+        lambda: supabase.table('employee_salary_assignments')
+        .select('id,employee_id,custom_annual_ctc,grade_id,effective_from').order('id')
+    ) if a['employee_id'] in active]
+    grades = fetch_paged(lambda: supabase.table('employee_grades').select('id,annual_ctc').order('id'))
+    overrides = [o for o in fetch_paged(
+        lambda: supabase.table('employee_salary_components')
+        .select('id,employee_id,component_id,value_override,method_override').order('id')
+    ) if o['employee_id'] in active]
+    return Workforce(employees, assignments, grades, overrides)
+
+
+# -------------------------
+# Scenario evaluation
+# -------------------------
+def apply_component_changes(catalog: List[Dict[str, Any]], changes: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Candidate catalog: `changes` rows are matched to catalog components by
+    `code` and patch their fields; unknown codes are added as new components.
+    Employee overrides still apply on top (they reference component ids).
+    """
+    if not changes:
+        return catalog
+    by_code = {c['code']: i for i, c in enumerate(catalog)}
+    out = [dict(c) for c in catalog]
+    for ch in changes:
+        code = ch.get('code')
+        if not code:
+            raise ValueError("component change requires 'code'")
+        fields = {k: v for k, v in ch.items() if v is not None}
+        if code in by_code:
+            out[by_code[code]].update(fields)
+        else:
+            out.append(dict({'id': f'sim:{code}', 'name': code, 'type': 'EARNING', 'is_taxable': True,
+                             'ordering': 100}, **fields))
+    return out
+
+
+def evaluate_plan(plan: SalaryPlan, monthly_ctc: np.ndarray) -> Dict[str, np.ndarray]:
+    """Paise amount of every component of `plan` for each monthly CTC (paise)."""
+    if plan.has_formula:
+        uniq, inv = np.unique(monthly_ctc, return_inverse=True)
+        cols = {code: np.zeros(len(uniq), dtype=np.int64) for code in plan.slots}
+        for j, m in enumerate(uniq):
+            for code, amt in plan.evaluate_paise(int(m)).items():
+                cols[code][j] = amt
+        return {code: col[inv] for code, col in cols.items()}
+
+    vals: Dict[str, np.ndarray] = {MONTHLY_CTC: monthly_ctc}
+    zeros = np.zeros(len(monthly_ctc), dtype=np.int64)
+    for code, op in plan.ops:
+        kind = op[0]
+        if kind == 'fixed':
+            vals[code] = np.full(len(monthly_ctc), _paise(op[1]), dtype=np.int64)
+        elif kind == 'percent':
+            num, den = ratio(op[2])
+            vals[code] = _mul_div(vals.get(op[1], zeros), num, den)
+        else:
+            vals[code] = zeros
+    for code in plan.slots:
+        vals.setdefault(code, zeros)
+    return vals
+
+
+def annual_tax(taxable: np.ndarray, table: Optional[TaxSlabTable]) -> np.ndarray:
+    """Vectorised compute_annual_tax_from_slabs on annual taxable incomes in paise."""
+    if table is None or not len(table):
+        return np.zeros(len(taxable), dtype=np.int64)
+    ratios = [ratio(r) for r in table.rates]
+    den = common_den(d for _, d in ratios)
+    nums = [n * (den // d) for n, d in ratios]
+    big = taxable.size and int(np.abs(taxable).max()) * sum(abs(n) for n in nums) >= _INT64_SAFE
+    x = taxable.astype(object) if big else taxable
+    acc = np.zeros(len(taxable), dtype=object if big else np.int64)
+    for frm, to, num in zip(table.froms, table.tos, nums):
+        upper = x if to is None else np.minimum(x, _paise(to))
+        amount = np.maximum(upper - _paise(frm), 0)
+        acc = acc + amount * num
+    return _rhe_div(acc, den).astype(np.int64)
+
+
+def professional_tax(workforce: Workforce, pt_bands: Dict[Any, ProfessionalTaxBands]) -> np.ndarray:
+    """Vectorised professional_tax_for: first matching band of the employee's state."""
+    out = np.zeros(len(workforce), dtype=np.int64)
+    for si, st in enumerate(workforce.states):
+        bands = pt_bands.get(st) if st else None
+        if not bands:
+            continue
+        mask = workforce.state == si
+        m = workforce.monthly_ctc[mask]
+        amt = np.zeros(len(m), dtype=np.int64)
+        # reversed, so the first rule in table order wins where bands overlap
+        for lo, hi, val in reversed(bands.ordered):
+            amt = np.where((m >= _paise(lo)) & (m <= _paise(hi)), _paise(val), amt)
+        out[mask] = amt
+    return out
+
+
+def run_scenario(workforce: Workforce, catalog: List[Dict[str, Any]], table: Optional[TaxSlabTable],
+                 pt_bands: Dict[Any, ProfessionalTaxBands]) -> Dict[str, np.ndarray]:
+    """Per-employee monthly amounts (paise) for one catalog + tax regime."""
+    n = len(workforce)
+    gross = np.zeros(n, dtype=np.int64)
+    taxable = np.zeros(n, dtype=np.int64)
+    deductions = np.zeros(n, dtype=np.int64)
+    employer = np.zeros(n, dtype=np.int64)
+    for gi, overrides in enumerate(workforce.override_groups):
+        mask = workforce.group == gi
+        if not mask.any():
+            continue
+        plan = get_plan(build_comp_map(catalog, overrides))
+        vals = evaluate_plan(plan, workforce.monthly_ctc[mask])
+        g = np.zeros(int(mask.sum()), dtype=np.int64)
+        t, d, er = g.copy(), g.copy(), g.copy()
+        for code, comp in plan.components.items():
+            typ = comp.get('type')
+            if typ == 'EARNING':
+                g += vals[code]
+                if comp.get('is_taxable', True):
+                    t += vals[code]
+            elif typ == 'DEDUCTION':
+                d += vals[code]
+            elif typ == 'EMPLOYER_CONTRIBUTION':
+                er += vals[code]
+        gross[mask], taxable[mask], deductions[mask], employer[mask] = g, t, d, er
+
+    income_tax = _rhe_div(annual_tax(taxable * 12, table), 12)
+    prof_tax = professional_tax(workforce, pt_bands)
+    total_deductions = deductions + income_tax + prof_tax
+    return {
+        'gross': gross,
+        'deductions': deductions,
+        'income_tax': income_tax,
+        'professional_tax': prof_tax,
+        'total_deductions': total_deductions,
+        'net': gross - total_deductions,
+        'employer_contribution': employer,
+        'employer_cost': gross + employer,
+    }
+
+
+def _totals(res: Dict[str, np.ndarray]) -> Dict[str, float]:
+    return {k: int(res[k].sum()) / 100 for k in _TOTALS}
+
+
+def _band_report(workforce: Workforce, base: Dict[str, np.ndarray], cand: Dict[str, np.ndarray],
+                 edges: Sequence[float]) -> List[Dict[str, Any]]:
+    edges_p = [int(round(e * 100)) for e in edges]
+    band = np.searchsorted(np.array(edges_p, dtype=np.int64), workforce.monthly_ctc, side='right') - 1
+    d_cost = cand['employer_cost'] - base['employer_cost']
+    d_net = cand['net'] - base['net']
+    d_tax = cand['income_tax'] - base['income_tax']
+    out = []
+    for i, lo in enumerate(edges):
+        hi = edges[i + 1] if i + 1 < len(edges) else None
+        mask = band == i
+        cnt = int(mask.sum())
+        row = {'min_monthly_ctc': lo, 'max_monthly_ctc': hi, 'employees': cnt}
+        if cnt:
+            net_pct = np.percentile(d_net[mask], [10, 50, 90]) / 100
+            row.update({
+                'baseline_employer_cost': int(base['employer_cost'][mask].sum()) / 100,
+                'candidate_employer_cost': int(cand['employer_cost'][mask].sum()) / 100,
+                'delta_employer_cost': int(d_cost[mask].sum()) / 100,
+                'delta_income_tax': int(d_tax[mask].sum()) / 100,
+                'delta_net_mean': round(float(d_net[mask].mean()) / 100, 2),
+                'delta_net_p10': round(float(net_pct[0]), 2),
+                'delta_net_p50': round(float(net_pct[1]), 2),
+                'delta_net_p90': round(float(net_pct[2]), 2),
+                'net_increased': int((d_net[mask] > 0).sum()),
+                'net_decreased': int((d_net[mask] < 0).sum()),
+            })
+        out.append(row)
+    return out
+
+
+def simulate(regime: str = 'new', baseline_regime: str = 'new', component_changes: Optional[List[Dict[str, Any]]] = None,
+             slabs: Optional[List[Dict[str, Any]]] = None, bands: Optional[Sequence[float]] = None,
+             workforce: Optional[Workforce] = None) -> Dict[str, Any]:
+    """
+    Compare a candidate (catalog changes + regime, or explicit `slabs`) with
+    the current structure under `baseline_regime`, for a regular month.
+    Returns monthly totals, their deltas and a per-CTC-band distribution.
+    """
+    started = time.perf_counter()
+    ref = refdata.get_reference_data()
+    if slabs is None and regime not in ref.tax_tables:
+        raise ValueError(f"Unknown tax regime '{regime}'")
+    if baseline_regime not in ref.tax_tables:
+        raise ValueError(f"Unknown tax regime '{baseline_regime}'")
+    wf = workforce if workforce is not None else load_workforce()
+    loaded = time.perf_counter()
+
+    base = run_scenario(wf, ref.catalog, ref.tax_table(baseline_regime), ref.pt_bands)
+    cand_table = TaxSlabTable(slabs) if slabs is not None else ref.tax_table(regime)
+    cand = run_scenario(wf, apply_component_changes(ref.catalog, component_changes), cand_table, ref.pt_bands)
+
+    base_t, cand_t = _totals(base), _totals(cand)
+    edges = sorted(bands) if bands else DEFAULT_BANDS
+    result = {
+        'employees': len(wf),
+        'baseline': base_t,
+        'candidate': cand_t,
+        'delta': {k: round(cand_t[k] - base_t[k], 2) for k in _TOTALS},
+        'annual_delta_employer_cost': round((cand_t['employer_cost'] - base_t['employer_cost']) * 12, 2),
+        'bands': _band_report(wf, base, cand, edges),
+        'refdata_version': ref.version,
+        'load_seconds': round(loaded - started, 3),
+        'compute_seconds': round(time.perf_counter() - loaded, 3),
+    }
+    _logger.info("Payroll simulation over %s employees in %.3fs", len(wf), time.perf_counter() - started)
+    return result
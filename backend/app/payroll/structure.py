@@ -0,0 +1,250 @@
+# app/payroll/structure.py
+"""
+Salary-structure compiler.
+
+A structure is the `salary_components` catalog merged with one employee's
+overrides (see services.build_comp_map). Compiling it resolves component
+dependencies once, detects cycles, pre-parses FORMULA expressions and yields
+a SalaryPlan: a topologically ordered list of steps that evaluates every
+component from the monthly CTC. Plans are cached per distinct structure, so
+all employees sharing a grade/catalog reuse a single plan.
+"""
+import hashlib
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.payroll.money import QUANTIZE_LIMIT, paise_half_even, ratio
+from app.payroll.utils import compile_formula
+
+_logger = logging.getLogger(__name__)
+
+_CENT = Decimal('0.01')
+_ZERO = Decimal('0.00')
+MONTHLY_CTC = 'MONTHLY_CTC'
+PLAN_CACHE_SIZE = 256
+
+# component fields that influence evaluation or the payslip layout
+_KEY_FIELDS = ('name', 'type', 'is_taxable', 'calc_method', 'calc_value', 'base_component_code', 'ordering')
+
+
+class SalaryPlan:
+    """
+    Compiled evaluation plan for one salary structure.
+
+    `components` holds the component metadata in catalog order (plus the
+    synthetic MONTHLY_CTC entry); `evaluate()` returns the quantized amount of
+    every component. Components that cannot be evaluated (bad values,
+    unsupported formulas, cycles, runtime errors) evaluate to 0.00, and
+    dependents see that 0.00.
+
+    `ops` describes the same steps declaratively for vectorised evaluation
+    (app/payroll/simulator.py): ('fixed', amount), ('percent', base_code, pct),
+    ('formula', slot_indexes, fn) or ('zero', None), keyed by code in
+    evaluation order. `evaluate_paise()` runs them on integer paise.
+    """
+
+    def __init__(self, components: Dict[str, Dict[str, Any]], steps: List[Tuple[str, Callable]],
+                 slots: Dict[str, int], broken: Dict[str, str], structure_hash: str,
+                 ops: Optional[List[Tuple[str, tuple]]] = None):
+        self.components = components
+        self.steps = steps
+        self.slots = slots
+        self.broken = broken
+        self.structure_hash = structure_hash
+        self.ops = ops or []
+        self.has_formula = any(op[0] == 'formula' for _, op in self.ops)
+        self._paise_steps = []
+        for code, op in self.ops:
+            if op[0] == 'fixed':
+                step = ('fixed', paise_half_even(op[1]))
+            elif op[0] == 'percent':
+                step = ('percent', slots[op[1]]) + ratio(op[2])
+            elif op[0] == 'formula':
+                step = op
+            else:
+                step = ('fixed', 0)
+            self._paise_steps.append((slots[code],) + step)
+        # payslip layout, in component order (see services.build_payslip_paise)
+        self.earnings = [(c, bool(m.get('is_taxable', True))) for c, m in components.items() if m.get('type') == 'EARNING']
+        self.deductions = [c for c, m in components.items() if m.get('type') == 'DEDUCTION']
+        self.employer_contributions = [c for c, m in components.items() if m.get('type') == 'EMPLOYER_CONTRIBUTION']
+        self._breakdown_order: Optional[List[str]] = None
+
+    def breakdown_order(self) -> List[str]:
+        """Component codes sorted by `ordering`, as the payslip breakdown lists them."""
+        if self._breakdown_order is None:
+            self._breakdown_order = sorted(self.components, key=lambda k: self.components[k].get('ordering', 100))
+        return self._breakdown_order
+
+    def evaluate(self, monthly_ctc: Decimal) -> Dict[str, Decimal]:
+        vals: List[Decimal] = [_ZERO] * len(self.slots)
+        vals[self.slots[MONTHLY_CTC]] = monthly_ctc.quantize(_CENT)
+        for code, fn in self.steps:
+            try:
+                vals[self.slots[code]] = fn(vals).quantize(_CENT)
+            except Exception:
+                vals[self.slots[code]] = _ZERO
+        return {code: vals[idx] for code, idx in self.slots.items()}
+
+    def evaluate_paise(self, monthly_ctc: int) -> Dict[str, int]:
+        """evaluate() on integer paise; FORMULA steps still run on Decimal."""
+        vals: List[int] = [0] * len(self.slots)
+        vals[self.slots[MONTHLY_CTC]] = monthly_ctc
+        for step in self._paise_steps:
+            slot, kind = step[0], step[1]
+            if kind == 'fixed':
+                v = step[2]
+            elif kind == 'percent':
+                q, r = divmod(vals[step[2]] * step[3], step[4])
+                v = q + 1 if 2 * r > step[4] or (2 * r == step[4] and q & 1) else q
+            else:
+                try:
+                    # compiled formulas return amounts already quantized to 0.01
+                    v = int(step[3]([Decimal(vals[i]).scaleb(-2) for i in step[2]]).scaleb(2))
+                except Exception:
+                    v = 0
+            vals[slot] = v if -QUANTIZE_LIMIT < v < QUANTIZE_LIMIT else 0
+        return {code: vals[idx] for code, idx in self.slots.items()}
+
+
+def structure_key(comp_map: Dict[str, Dict[str, Any]]) -> tuple:
+    """Hashable identity of a structure: every evaluation-relevant field, in order."""
+    return tuple((code,) + tuple(c.get(f) for f in _KEY_FIELDS) for code, c in comp_map.items())
+
+
+def _token_pattern(codes: Sequence[str]) -> Optional["re.Pattern"]:
+    if not codes:
+        return None
+    # whole-token matches only, longest first: BASIC never matches inside BASIC_DA
+    alts = '|'.join(re.escape(c) for c in sorted(codes, key=lambda x: -len(x)))
+    return re.compile(r'(?<![A-Za-z0-9_])(?:' + alts + r')(?![A-Za-z0-9_])')
+
+
+def compile_structure(comp_map: Dict[str, Dict[str, Any]], key: Optional[tuple] = None) -> SalaryPlan:
+    """Compile a comp_map (as built by services.build_comp_map) into a SalaryPlan."""
+    components: Dict[str, Dict[str, Any]] = {code: dict(c) for code, c in comp_map.items()}
+    components[MONTHLY_CTC] = {
+        'code': MONTHLY_CTC, 'name': 'Monthly CTC', 'type': 'EARNING', 'is_taxable': True,
+        'calc_method': 'FIXED', 'calc_value': '', 'amount': _ZERO, 'ordering': 0
+    }
+    codes = list(components.keys())
+    slots = {code: i for i, code in enumerate(codes)}
+    pattern = _token_pattern(codes)
+
+    deps: Dict[str, List[str]] = {}
+    fns: Dict[str, Callable] = {}
+    kinds: Dict[str, tuple] = {}
+    broken: Dict[str, str] = {}
+
+    for code in codes:
+        if code == MONTHLY_CTC:
+            continue
+        c = components[code]
+        method = (c.get('calc_method') or '').upper()
+        val = str(c.get('calc_value') or '')
+        try:
+            if method == 'PERCENT_OF':
+                base = c.get('base_component_code') or MONTHLY_CTC
+                pct = Decimal(val or '0')
+                if base in slots:
+                    deps[code] = [base]
+                    bidx = slots[base]
+                    fns[code] = lambda vals, bidx=bidx, pct=pct: (vals[bidx] * pct) / Decimal('100')
+                    kinds[code] = ('percent', base, pct)
+                else:
+                    deps[code] = []
+                    fns[code] = lambda vals: _ZERO
+                    kinds[code] = ('zero', None)
+            elif method == 'FORMULA':
+                names: Dict[str, int] = {}
+                used: List[str] = []
+
+                def _sub(m):
+                    tok = m.group(0)
+                    if tok not in names:
+                        names[tok] = len(used)
+                        used.append(tok)
+                    return f'__v{names[tok]}'
+
+                expr = pattern.sub(_sub, val) if pattern else val
+                idx = [slots[t] for t in used]
+                formula = compile_formula(expr, {f'__v{i}': i for i in range(len(used))})
+                deps[code] = used
+                fns[code] = lambda vals, idx=idx, formula=formula: formula([vals[i] for i in idx])
+                kinds[code] = ('formula', idx, formula)
+            else:
+                # FIXED and unknown methods: the value itself
+                amt = Decimal(val or '0')
+                deps[code] = []
+                fns[code] = lambda vals, amt=amt: amt
+                kinds[code] = ('fixed', amt.quantize(_CENT))
+        except Exception as ex:
+            broken[code] = str(ex)
+            deps[code] = []
+            fns[code] = lambda vals: _ZERO
+
+    # topological order (DFS); members of a cycle are marked broken once, here
+    order: List[str] = []
+    state: Dict[str, int] = {}
+
+    def _visit(code: str, stack: List[str]):
+        st = state.get(code)
+        if st == 2:
+            return
+        if st == 1:
+            cycle = stack[stack.index(code):]
+            for member in cycle:
+                broken.setdefault(member, 'circular reference ' + member)
+            return
+        state[code] = 1
+        stack.append(code)
+        for d in deps.get(code, []):
+            if d != MONTHLY_CTC:
+                _visit(d, stack)
+        stack.pop()
+        state[code] = 2
+        order.append(code)
+
+    for code in codes:
+        if code != MONTHLY_CTC:
+            _visit(code, [])
+
+    steps = [(code, (lambda vals: _ZERO) if code in broken else fns[code]) for code in order]
+    ops = [(code, ('zero', None) if code in broken else kinds.get(code, ('zero', None))) for code in order]
+    if broken:
+        _logger.warning("Salary structure has components that evaluate to 0: %s", broken)
+
+    if key is None:
+        key = structure_key(comp_map)
+    structure_hash = hashlib.sha1(json.dumps(key, default=str).encode()).hexdigest()
+    return SalaryPlan(components, steps, slots, broken, structure_hash, ops)
+
+
+_plan_cache: "OrderedDict[tuple, SalaryPlan]" = OrderedDict()
+_plan_lock = threading.Lock()
+
+
+def get_plan(comp_map: Dict[str, Dict[str, Any]]) -> SalaryPlan:
+    """Return the cached SalaryPlan for this structure, compiling it on first use."""
+    key = structure_key(comp_map)
+    with _plan_lock:
+        plan = _plan_cache.get(key)
+        if plan is not None:
+            _plan_cache.move_to_end(key)
+            return plan
+    plan = compile_structure(comp_map, key)
+    with _plan_lock:
+        _plan_cache[key] = plan
+        while len(_plan_cache) > PLAN_CACHE_SIZE:
+            _plan_cache.popitem(last=False)
+    return plan
+
+
+def clear_plan_cache():
+    with _plan_lock:
+        _plan_cache.clear()
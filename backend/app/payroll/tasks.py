@@ -0,0 +1,12 @@
+# app/payroll/tasks.py
+"""Celery tasks for the payroll run executor (see app/payroll/executor.py)."""
+from ML_models.ai_video_interview.utils.queue_utils import celery_app
+from app.payroll import executor
+
+
+# acks_late + reject_on_worker_lost: a shard whose worker dies is redelivered
+# and picks up after its last checkpoint instead of being lost.
+@celery_app.task(name="app.payroll.tasks.process_payroll_shard", acks_late=True, reject_on_worker_lost=True)
+def process_payroll_shard(shard_id: int):
+    shard = executor.process_shard(shard_id)
+    return {"shard_id": shard_id, "status": shard.get("status"), "processed": shard.get("processed_count")}
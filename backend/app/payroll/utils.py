@@ -1,6 +1,9 @@
 # app/payroll/utils.py
 import ast
 from decimal import Decimal, ROUND_HALF_UP
+from typing import Callable, Dict, Sequence
+
+_CENT = Decimal("0.01")
 
 def safe_eval(expr: str) -> Decimal:
     # same AST-based implementation you used before
@@ -39,3 +42,56 @@ def safe_eval(expr: str) -> Decimal:
         raise ValueError("Unsupported AST node")
     res = _eval(tree)
     return res.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+_ALLOWED_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Add, ast.Sub, ast.Mult,
+                  ast.Div, ast.Pow, ast.Mod, ast.Num, ast.Constant, ast.Load,
+                  ast.UAdd, ast.USub, ast.FloorDiv, ast.Name)
+_BIN_OPS = {
+    ast.Add: lambda a, b: a + b,
+    ast.Sub: lambda a, b: a - b,
+    ast.Mult: lambda a, b: a * b,
+    ast.Div: lambda a, b: a / b,
+    ast.Pow: lambda a, b: a ** b,
+    ast.Mod: lambda a, b: a % b,
+    ast.FloorDiv: lambda a, b: a // b,
+}
+
+def compile_formula(expr: str, variables: Dict[str, int]) -> Callable[[Sequence[Decimal]], Decimal]:
+    """
+    Parse `expr` once into a closure with the same semantics as safe_eval.
+    Names in `expr` must be keys of `variables`, which maps each name to its
+    index in the value sequence passed to the returned function.
+    """
+    tree = ast.parse(expr, mode='eval')
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"Unsupported expression element: {type(node).__name__}")
+
+    def _build(node):
+        if isinstance(node, ast.Expression):
+            return _build(node.body)
+        if isinstance(node, ast.Name):
+            if node.id not in variables:
+                raise ValueError(f"Unknown name in expression: {node.id}")
+            idx = variables[node.id]
+            return lambda vals: vals[idx]
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise ValueError("Only numeric constants allowed")
+            const = Decimal(str(node.value))
+            return lambda vals: const
+        if isinstance(node, ast.BinOp):
+            op = _BIN_OPS.get(type(node.op))
+            if op is None:
+                raise ValueError("Unsupported binary op")
+            left, right = _build(node.left), _build(node.right)
+            return lambda vals: op(left(vals), right(vals))
+        if isinstance(node, ast.UnaryOp):
+            operand = _build(node.operand)
+            if isinstance(node.op, ast.UAdd): return lambda vals: +operand(vals)
+            if isinstance(node.op, ast.USub): return lambda vals: -operand(vals)
+            raise ValueError("Unsupported unary op")
+        raise ValueError("Unsupported AST node")
+
+    fn = _build(tree)
+    return lambda vals: fn(vals).quantize(_CENT, rounding=ROUND_HALF_UP)
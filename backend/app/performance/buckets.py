@@ -0,0 +1,247 @@
+# backend/app/performance/buckets.py
+"""
+Per-employee daily performance buckets (table performance_daily_buckets,
+scripts/sql/create_performance_daily_buckets.sql).
+
+Task events add to the bucket of the day they happen on:
+
+  create_task       tasks_assigned += 1                      (assignee, assigned_at)
+  add_task_update   progress_sum += p, progress_updates += 1 (assignee, now)
+  confirm_task      tasks_completed += 1,                    (assignee, now)
+                    completion_days_total += days since assignment
+                    (only at the task's first positive confirmation)
+
+Attendance is not written through this API, so attendance_present /
+attendance_total (and any drift) come from rebuild_buckets(), which
+recomputes a date range from the source tables.
+
+A window metric is then a sum over at most one row per day:
+window_metrics() (GET /metrics/window) / rolling_metrics().
+"""
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from app.supabase_client import supabase
+from app.performance.utils import extract_data
+from app.supabase_utils import fetch_in, fetch_paged
+
+_logger = logging.getLogger(__name__)
+
+TABLE = "performance_daily_buckets"
+COUNTERS = ("tasks_assigned", "tasks_completed", "completion_days_total", "progress_sum",
+            "progress_updates", "attendance_present", "attendance_total")
+PRESENT_STATUSES = ("PRESENT", "HALF_DAY")
+INSERT_CHUNK_SIZE = 500
+
+
+def _day(v) -> Optional[date]:
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+    try:
+        return date.fromisoformat(str(v)[:10])
+    except Exception:
+        return None
+
+
+def completion_days(assigned_at, confirmed_at) -> Optional[int]:
+    """Whole days between two timestamps, as metrics.compute_metrics counts them."""
+    try:
+        return (datetime.fromisoformat(str(confirmed_at)[:19]) - datetime.fromisoformat(str(assigned_at)[:19])).days
+    except Exception:
+        return None
+
+
+def _bump_upsert(employee_id: Any, day: date, deltas: Dict[str, float]):
+    # read-modify-write; only used when the bump_performance_daily function is missing
+    rows = extract_data(supabase.table(TABLE).select("*").eq("employee_id", employee_id).eq("day", day.isoformat()).execute()) or []
+    row = {k: 0 for k in COUNTERS}
+    if rows:
+        row.update({k: rows[0].get(k) or 0 for k in COUNTERS})
+    for k, v in deltas.items():
+        row[k] += v
+    row.update({"employee_id": employee_id, "day": day.isoformat(), "updated_at": datetime.utcnow().isoformat()})
+    supabase.table(TABLE).upsert(row, on_conflict="employee_id,day").execute()
+
+
+def bump(employee_id: Any, day, raise_errors: bool = False, **deltas):
+    """
+    Add `deltas` (COUNTERS) to one (employee, day) bucket with a single
+    atomic RPC. Failures are logged, not raised (unless `raise_errors`):
+    buckets are derived data and rebuild_buckets() repairs them.
+    """
+    day = _day(day)
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not employee_id or day is None or not deltas:
+        return
+    unknown = set(deltas) - set(COUNTERS)
+    if unknown:
+        raise ValueError(f"unknown bucket counters: {sorted(unknown)}")
+    params = {"p_employee_id": employee_id, "p_day": day.isoformat()}
+    params.update({f"p_{k}": v for k, v in deltas.items()})
+    try:
+        supabase.rpc("bump_performance_daily", params).execute()
+        return
+    except Exception as ex:
+        _logger.warning("bump_performance_daily failed, falling back to upsert: %s", ex)
+    try:
+        _bump_upsert(employee_id, day, deltas)
+    except Exception:
+        if raise_errors:
+            raise
+        _logger.exception("Could not update performance bucket %s/%s", employee_id, day)
+
+
+def rebuild_buckets(start: str, end: str) -> Dict[str, Any]:
+    """
+    Recompute every bucket with day in [start, end] from tasks,
+    task_confirmations, task_updates and attendance, replacing what is there.
+
+    The replace is one transaction (replace_performance_daily_buckets).
+    A bucket bumped after the source reads began keeps its value: the
+    recomputed row may be missing that event, so it is skipped (counted in
+    `skipped`; rebuild again later to repair it).
+    """
+    lo, hi = _day(start), _day(end)
+    if lo is None or hi is None:
+        raise ValueError("start and end must be ISO dates")
+    since = datetime.now(timezone.utc)
+    upper = (hi + timedelta(days=1)).isoformat()  # timestamps on the last day
+    keys = ["employee_id", "day"]
+
+    tasks = pd.DataFrame(fetch_paged(lambda: supabase.table("tasks").select("assigned_to,assigned_at")
+                                     .gte("assigned_at", lo.isoformat()).lt("assigned_at", upper).order("id")),
+                         columns=["assigned_to", "assigned_at"])
+    tasks["day"] = tasks["assigned_at"].map(_day)
+    assigned = tasks.rename(columns={"assigned_to": "employee_id"}).groupby(keys).size().rename("tasks_assigned")
+
+    # a task is completed on the day of its first positive confirmation
+    confs = fetch_paged(lambda: supabase.table("task_confirmations").select("task_id,created_at")
+                        .gte("created_at", lo.isoformat()).lt("created_at", upper).eq("confirmed", True).order("id"))
+    updates = fetch_paged(lambda: supabase.table("task_updates").select("task_id,created_at,progress_percent")
+                          .gte("created_at", lo.isoformat()).lt("created_at", upper).order("id"))
+    owners = pd.DataFrame(fetch_in("tasks", "id", [r["task_id"] for r in confs + updates], "id,assigned_to,assigned_at"),
+                          columns=["id", "assigned_to", "assigned_at"]).rename(columns={"assigned_to": "employee_id"})
+
+    done = (pd.DataFrame(confs, columns=["task_id", "created_at"]).sort_values("created_at", kind="stable")
+            .drop_duplicates("task_id").merge(owners, left_on="task_id", right_on="id"))
+    done["day"] = done["created_at"].map(_day)
+    done["completion_days_total"] = pd.to_numeric(pd.Series(
+        [completion_days(a, c) for a, c in zip(done["assigned_at"], done["created_at"])], index=done.index, dtype=object))
+    completed = done.groupby(keys).agg(tasks_completed=("task_id", "size"),
+                                       completion_days_total=("completion_days_total", "sum"))
+
+    prog = pd.DataFrame(updates, columns=["task_id", "created_at", "progress_percent"]).dropna(subset=["progress_percent"])
+    prog = prog.merge(owners, left_on="task_id", right_on="id")
+    prog["day"] = prog["created_at"].map(_day)
+    progress = prog.groupby(keys).agg(progress_sum=("progress_percent", "sum"),
+                                      progress_updates=("progress_percent", "size"))
+
+    att = pd.DataFrame(fetch_paged(lambda: supabase.table("attendance").select("employee_id,date,status")
+                                   .gte("date", lo.isoformat()).lte("date", hi.isoformat()).order("id")),
+                       columns=["employee_id", "date", "status"])
+    att["day"] = att["date"].map(_day)
+    att["present"] = att["status"].isin(PRESENT_STATUSES).astype(int)
+    attendance = att.groupby(keys).agg(attendance_present=("present", "sum"), attendance_total=("present", "size"))
+
+    frame = pd.concat([assigned, completed, progress, attendance], axis=1).fillna(0).reset_index()
+    frame = frame[frame["employee_id"].notna() & frame["day"].notna()]
+    rows = [
+        dict({k: (int(r[k]) if float(r[k]).is_integer() else float(r[k])) for k in COUNTERS},
+             employee_id=r["employee_id"], day=r["day"].isoformat())
+        for r in frame.reindex(columns=keys + list(COUNTERS), fill_value=0).to_dict("records")
+    ]
+
+    try:
+        skipped = supabase.rpc("replace_performance_daily_buckets", {
+            "p_start": lo.isoformat(), "p_end": hi.isoformat(), "p_rows": rows, "p_since": since.isoformat(),
+        }).execute().data or 0
+    except Exception as ex:
+        _logger.warning("replace_performance_daily_buckets failed, falling back to upserts: %s", ex)
+        skipped = _replace_upsert(lo, hi, rows, since)
+    return {"success": True, "start": lo.isoformat(), "end": hi.isoformat(), "buckets": len(rows), "skipped": skipped}
+
+
+def _updated_since(row: Dict[str, Any], since: datetime) -> bool:
+    try:
+        ts = datetime.fromisoformat(str(row.get("updated_at")).replace("Z", "+00:00"))
+    except ValueError:
+        return False
+    return (ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)) >= since
+
+
+def _replace_upsert(lo: date, hi: date, rows: List[Dict[str, Any]], since: datetime) -> int:
+    """
+    rebuild_buckets() without the SQL function: upsert the recomputed rows,
+    then delete the keys that are gone. Not one transaction, but a failed
+    chunk leaves the old buckets in place rather than none.
+    """
+    existing = fetch_paged(lambda: supabase.table(TABLE).select("employee_id,day,updated_at")
+                           .gte("day", lo.isoformat()).lte("day", hi.isoformat()).order("employee_id").order("day"))
+    fresh = {(r["employee_id"], str(r["day"])) for r in existing if _updated_since(r, since)}
+    now = datetime.utcnow().isoformat()
+    rows = [dict(r, updated_at=now) for r in rows if (r["employee_id"], r["day"]) not in fresh]
+    for i in range(0, len(rows), INSERT_CHUNK_SIZE):
+        supabase.table(TABLE).upsert(rows[i:i + INSERT_CHUNK_SIZE], on_conflict="employee_id,day").execute()
+
+    kept = {(r["employee_id"], r["day"]) for r in rows} | fresh
+    gone: Dict[Any, List[str]] = {}
+    for r in existing:
+        if (r["employee_id"], str(r["day"])) not in kept:
+            gone.setdefault(r["employee_id"], []).append(str(r["day"]))
+    for employee_id, days in gone.items():
+        supabase.table(TABLE).delete().eq("employee_id", employee_id).in_("day", days)\
+            .lt("updated_at", since.isoformat()).execute()
+    return len(fresh)
+
+
+def _metrics_from_totals(employee_id: Any, lo: date, hi: date, t: Dict[str, float]) -> Dict[str, Any]:
+    completed = t["tasks_completed"]
+    return {
+        "employee_id": employee_id,
+        "period_start": lo.isoformat(),
+        "period_end": hi.isoformat(),
+        "tasks_assigned": int(t["tasks_assigned"]),
+        "tasks_completed": int(completed),
+        "avg_task_completion_days": float(t["completion_days_total"] / completed) if completed else 0.0,
+        "avg_progress_percent": float(t["progress_sum"] / t["progress_updates"]) if t["progress_updates"] else 0.0,
+        "attendance_rate": float(round(t["attendance_present"] / t["attendance_total"], 4)) if t["attendance_total"] else 0.0,
+    }
+
+
+def window_metrics(start, end, employee_ids: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
+    """Metrics per employee for [start, end], summed from the daily buckets."""
+    lo, hi = _day(start), _day(end)
+    if lo is None or hi is None:
+        raise ValueError("start and end must be ISO dates")
+    if employee_ids is not None:
+        rows = fetch_in(TABLE, "employee_id", employee_ids, order=("employee_id", "day"),
+                        filters=[("day", "gte", lo.isoformat()), ("day", "lte", hi.isoformat())])
+    else:
+        rows = fetch_paged(lambda: supabase.table(TABLE).select("*").gte("day", lo.isoformat())
+                           .lte("day", hi.isoformat()).order("employee_id").order("day"))
+    totals: Dict[Any, Dict[str, float]] = {}
+    for emp in employee_ids or []:
+        totals[emp] = dict.fromkeys(COUNTERS, 0)
+    for r in rows:
+        t = totals.setdefault(r["employee_id"], dict.fromkeys(COUNTERS, 0))
+        for k in COUNTERS:
+            t[k] += r.get(k) or 0
+    return [_metrics_from_totals(emp, lo, hi, t) for emp, t in totals.items()]
+
+
+def rolling_metrics(employee_id: Any, days: int = 30, today: Optional[date] = None) -> Dict[str, Any]:
+    """Metrics for the last `days` days (today included): one indexed read of <= `days` rows."""
+    hi = today or datetime.utcnow().date()
+    lo = hi - timedelta(days=days - 1)
+    rows = extract_data(supabase.table(TABLE).select("*").eq("employee_id", employee_id)
+                        .gte("day", lo.isoformat()).lte("day", hi.isoformat()).execute()) or []
+    totals = dict.fromkeys(COUNTERS, 0)
+    for r in rows:
+        for k in COUNTERS:
+            totals[k] += r.get(k) or 0
+    return dict(_metrics_from_totals(employee_id, lo, hi, totals), days=days)
@@ -0,0 +1,109 @@
+# backend/app/performance/feature_cache.py
+"""
+Local Parquet cache of performance_metrics for model training.
+
+The cache directory holds part files (part-<n>.parquet) plus a small
+state file with the (last_updated, id) of the newest cached row; the id
+breaks ties, since compute-metrics stamps a whole batch with one
+timestamp. sync() pages through only the rows after that key and appends
+them as one new part; load() reads all parts and keeps the newest copy of
+each row id. A cold cache (or --full-refresh) pages through the
+whole table once.
+
+Parquet needs pyarrow (or fastparquet). Without it sync() still pages
+through the table, but keeps nothing between runs.
+"""
+import glob
+import json
+import logging
+import os
+import shutil
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from app.supabase_client import supabase
+from app.supabase_utils import fetch_paged
+
+_logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv("PERF_FEATURE_CACHE", os.path.join(os.path.dirname(__file__), "..", "models", "feature_cache"))
+STATE_FILE = "state.json"
+TABLE = "performance_metrics"
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        try:
+            import fastparquet  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+
+def _read_state(cache_dir: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(cache_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write_state(cache_dir: str, state: Dict[str, Any]):
+    tmp = os.path.join(cache_dir, STATE_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, os.path.join(cache_dir, STATE_FILE))
+
+
+def _fetch_after(watermark: Optional[str], last_id: Any = None) -> List[Dict[str, Any]]:
+    """Rows ordered by (last_updated, id) after that key (all rows without a watermark)."""
+    def build():
+        q = supabase.table(TABLE).select("*")
+        if watermark:
+            q = q.or_(f'last_updated.gt."{watermark}",and(last_updated.eq."{watermark}",id.gt."{last_id}")')
+        return q.order("last_updated").order("id")
+    return fetch_paged(build)
+
+
+def load(cache_dir: str = CACHE_DIR) -> pd.DataFrame:
+    parts = sorted(glob.glob(os.path.join(cache_dir, "part-*.parquet")))
+    if not parts:
+        return pd.DataFrame()
+    df = pd.concat([pd.read_parquet(p) for p in parts], ignore_index=True)
+    if "id" in df.columns:
+        # parts are appended in time order: the last copy of a row is the newest
+        df = df.drop_duplicates("id", keep="last").reset_index(drop=True)
+    return df
+
+
+def sync(cache_dir: str = CACHE_DIR, full_refresh: bool = False) -> Dict[str, Any]:
+    """
+    Bring the cache up to date and return {"frame", "new_rows", "parts", "cached"}.
+    """
+    if not parquet_available():
+        _logger.warning("pyarrow/fastparquet not installed; performance_metrics not cached")
+        frame = pd.DataFrame(_fetch_after(None))
+        return {"frame": frame, "new_rows": len(frame), "parts": 0, "cached": False}
+
+    if full_refresh and os.path.isdir(cache_dir):
+        shutil.rmtree(cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    state = _read_state(cache_dir)
+    rows = _fetch_after(state.get("watermark"), state.get("last_id"))
+    if rows:
+        new = pd.DataFrame(rows)
+        n = state.get("parts", 0)
+        tmp = os.path.join(cache_dir, f".part-{n:06d}.parquet")
+        new.to_parquet(tmp, index=False)
+        os.replace(tmp, os.path.join(cache_dir, f"part-{n:06d}.parquet"))
+        # rows come in key order; rows without last_updated sort last and are only read by a full sync
+        newest = next((r for r in reversed(rows) if r.get("last_updated")), None)
+        state = dict(state, parts=n + 1)
+        if newest is not None:
+            state.update(watermark=newest["last_updated"], last_id=newest.get("id"))
+        _write_state(cache_dir, state)
+    return {"frame": load(cache_dir), "new_rows": len(rows), "parts": state.get("parts", 0), "cached": True}
@@ -0,0 +1,120 @@
+# backend/app/performance/metrics.py
+"""
+Set-based performance metrics for a period.
+
+Each source is read once for the whole period with paged range queries,
+grouped by employee in pandas, and the metric rows are inserted in chunks:
+
+  employees            every id
+  tasks                assigned_at in [start, end]            -> tasks_assigned
+  task_confirmations   confirmed, created_at in [start, end]  -> tasks_completed
+                       first one of each period task          -> completion days
+  attendance           date in [start, end]                   -> attendance_rate
+
+The numbers are those of the former per-employee loop, except that
+tasks_completed only counts confirmations of the employee's own tasks (it
+used to count every confirmation in the period, for every employee).
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.supabase_client import supabase
+from app.supabase_utils import fetch_in, fetch_paged
+
+INSERT_CHUNK_SIZE = 500
+PRESENT_STATUSES = ("PRESENT", "HALF_DAY")
+
+
+def _parse_ts(v) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(v[:19])
+    except Exception:
+        return None
+
+
+def _timestamps(s: pd.Series) -> pd.Series:
+    return pd.to_datetime(s.map(_parse_ts))
+
+
+def load_period(start: str, end: str) -> Dict[str, pd.DataFrame]:
+    """Everything compute_metrics() needs for [start, end], in a handful of queries."""
+    employees = fetch_paged(lambda: supabase.table("employees").select("id").order("id"))
+    tasks = fetch_paged(lambda: supabase.table("tasks").select("id,assigned_to,assigned_at")
+                        .gte("assigned_at", start).lte("assigned_at", end).order("id"))
+    confirmed = fetch_paged(lambda: supabase.table("task_confirmations").select("task_id,created_at")
+                            .gte("created_at", start).lte("created_at", end).eq("confirmed", True).order("id"))
+    # owners of tasks confirmed in the period but assigned before it
+    known = {t["id"] for t in tasks}
+    earlier = fetch_in("tasks", "id", [c["task_id"] for c in confirmed if c["task_id"] not in known], "id,assigned_to")
+    confirmations = fetch_in("task_confirmations", "task_id", list(known), "task_id,created_at")
+    attendance = fetch_paged(lambda: supabase.table("attendance").select("employee_id,status")
+                             .gte("date", start).lte("date", end).order("id"))
+    return {
+        "employees": pd.DataFrame(employees, columns=["id"]),
+        "tasks": pd.DataFrame(tasks, columns=["id", "assigned_to", "assigned_at"]),
+        "owners": pd.DataFrame(tasks + earlier, columns=["id", "assigned_to"]).drop_duplicates("id"),
+        "confirmed": pd.DataFrame(confirmed, columns=["task_id", "created_at"]),
+        "confirmations": pd.DataFrame(confirmations, columns=["task_id", "created_at"]),
+        "attendance": pd.DataFrame(attendance, columns=["employee_id", "status"]),
+    }
+
+
+def compute_metrics(frames: Dict[str, pd.DataFrame], start: str, end: str) -> List[Dict[str, Any]]:
+    """One performance_metrics row per employee, from load_period() frames."""
+    tasks = frames["tasks"]
+    assigned = tasks.groupby("assigned_to").size()
+
+    done = frames["confirmed"].drop_duplicates("task_id").merge(frames["owners"], left_on="task_id", right_on="id")
+    completed = done.groupby("assigned_to").size()
+
+    # whole days from assignment to the task's first confirmation; unparsable timestamps are skipped
+    first = frames["confirmations"].sort_values("created_at", kind="stable").drop_duplicates("task_id")
+    spans = tasks.merge(first, left_on="id", right_on="task_id")
+    days = (_timestamps(spans["created_at"]) - _timestamps(spans["assigned_at"])).dt.days
+    total_days = days.groupby(spans["assigned_to"]).sum()
+
+    att = frames["attendance"]
+    att_total = att.groupby("employee_id").size()
+    att_present = att[att["status"].isin(PRESENT_STATUSES)].groupby("employee_id").size()
+
+    ids = frames["employees"]["id"]
+    n_assigned = ids.map(assigned).fillna(0).astype(np.int64).to_numpy()
+    n_completed = ids.map(completed).fillna(0).astype(np.int64).to_numpy()
+    days_sum = ids.map(total_days).fillna(0).to_numpy(dtype=float)
+    n_att = ids.map(att_total).fillna(0).to_numpy(dtype=float)
+    n_present = ids.map(att_present).fillna(0).to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avg_days = np.where(n_completed > 0, days_sum / n_completed, 0.0)
+        rate = np.where(n_att > 0, n_present / n_att, 0.0)
+
+    now = datetime.utcnow().isoformat()
+    return [
+        {
+            "employee_id": emp_id,
+            "period_start": start,
+            "period_end": end,
+            "tasks_assigned": a,
+            "tasks_completed": c,
+            "avg_task_completion_days": float(d),
+            "avg_progress_percent": 0.0,
+            "attendance_rate": float(round(r, 4)),
+            "last_updated": now,
+        }
+        for emp_id, a, c, d, r in zip(ids.tolist(), n_assigned.tolist(), n_completed.tolist(),
+                                      avg_days.tolist(), rate.tolist())
+    ]
+
+
+def insert_metrics(rows: List[Dict[str, Any]], chunk_size: int = INSERT_CHUNK_SIZE):
+    for i in range(0, len(rows), chunk_size):
+        supabase.table("performance_metrics").insert(rows[i:i + chunk_size]).execute()
+
+
+def compute_for_period(start: str, end: str, persist: bool = True) -> List[Dict[str, Any]]:
+    rows = compute_metrics(load_period(start, end), start, end)
+    if persist:
+        insert_metrics(rows)
+    return rows
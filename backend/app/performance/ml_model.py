@@ -1,66 +1,172 @@
 # backend/app/performance/ml_model.py
+import copy
 import os
 import json
+import time
 import joblib
 from datetime import datetime
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestClassifier, IsolationForest
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, roc_auc_score
 
+from app.performance import model_store
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# legacy fixed-path artifacts; new trainings publish to the versioned model_store
 BASE_DIR = os.path.join(os.path.dirname(__file__), "..", "models")
 MODEL_PATH = os.path.join(BASE_DIR, "perf_model.pkl")
 SCALER_PATH = os.path.join(BASE_DIR, "perf_scaler.pkl")
 META_PATH = os.path.join(BASE_DIR, "perf_meta.json")
 os.makedirs(BASE_DIR, exist_ok=True)
 
-def train_supervised(df: pd.DataFrame, label_col: str = "label", model_params: dict = None):
+FEATURE_COLUMNS = ["tasks_assigned", "tasks_completed", "avg_task_completion_days", "attendance_rate"]
+TRAIN_N_JOBS = int(os.getenv("PERF_TRAIN_N_JOBS", "-1"))
+WARM_START_TREES = 50
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _warm_model(previous: Optional[Dict[str, Any]], cls, n_features: int, add_trees: int, n_jobs: int):
+    """
+    A copy of the previous bundle's forest set up to grow `add_trees` more
+    trees (warm_start), or None when it can't be continued (other model
+    type, no scaler, different features). The bundle may be the one being
+    served (model_registry.get()), so its model is never modified.
+    """
+    if not previous or previous.get("scaler") is None:
+        return None
+    model = previous["model"]
+    if not isinstance(model, cls) or getattr(model, "n_features_in_", None) != n_features:
+        return None
+    model = copy.deepcopy(model)
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + add_trees, n_jobs=n_jobs)
+    return model
+
+
+def _training_report(started: float, fit_seconds: float, rows: int, model, n_jobs: int, warm_started: bool) -> Dict[str, Any]:
+    return {
+        "rows": rows,
+        "n_estimators": len(model.estimators_),
+        "warm_start": warm_started,
+        "n_jobs": n_jobs,
+        "fit_seconds": round(fit_seconds, 3),
+        "total_seconds": round(time.perf_counter() - started, 3),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def train_supervised(df: pd.DataFrame, label_col: str = "label", model_params: dict = None,
+                     n_jobs: int = TRAIN_N_JOBS, warm_start_from: Optional[Dict[str, Any]] = None,
+                     add_trees: int = WARM_START_TREES):
+    """
+    Fit (on all cores by default) and publish the supervised risk model.
+    With `warm_start_from` (a loaded bundle of the same kind) its forest
+    keeps its trees and scaler and grows `add_trees` more on `df`.
+    """
+    started = time.perf_counter()
     if model_params is None:
         model_params = {"n_estimators": 200, "random_state": 42, "max_depth": 6}
     X = df.drop(columns=[label_col])
     y = df[label_col].astype(int)
-    scaler = StandardScaler()
-    Xs = scaler.fit_transform(X)
+    model = _warm_model(warm_start_from, RandomForestClassifier, X.shape[1], add_trees, n_jobs)
+    warm = model is not None
+    if warm:
+        scaler = warm_start_from["scaler"]
+        Xs = scaler.transform(X)
+    else:
+        scaler = StandardScaler()
+        Xs = scaler.fit_transform(X)
+        model = RandomForestClassifier(**dict(model_params, n_jobs=n_jobs))
     X_train, X_test, y_train, y_test = train_test_split(Xs, y, test_size=0.2, random_state=42, stratify=y)
-    model = RandomForestClassifier(**model_params)
+    t0 = time.perf_counter()
     model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - t0
     preds = model.predict(X_test)
     proba = model.predict_proba(X_test)[:, 1] if hasattr(model, "predict_proba") else None
     report = classification_report(y_test, preds, output_dict=True)
     roc = roc_auc_score(y_test, proba) if proba is not None and len(set(y_test)) > 1 else None
-    joblib.dump(model, MODEL_PATH)
-    joblib.dump(scaler, SCALER_PATH)
-    meta = {"trained_at": datetime.utcnow().isoformat(), "metrics": {"report": report, "roc_auc": roc}}
-    with open(META_PATH, "w") as f:
-        json.dump(meta, f, default=str)
+    training = _training_report(started, fit_seconds, len(df), model, n_jobs, warm)
+    meta = {"trained_at": datetime.utcnow().isoformat(), "metrics": {"report": report, "roc_auc": roc, "training": training}}
+    meta.update(model_store.publish(model, scaler, meta))
     return meta
 
-def train_unsupervised(df: pd.DataFrame):
-    scaler = StandardScaler()
-    Xs = scaler.fit_transform(df)
-    iso = IsolationForest(n_estimators=200, contamination=0.05, random_state=42)
+def train_unsupervised(df: pd.DataFrame, n_jobs: int = TRAIN_N_JOBS, warm_start_from: Optional[Dict[str, Any]] = None,
+                       add_trees: int = WARM_START_TREES):
+    started = time.perf_counter()
+    iso = _warm_model(warm_start_from, IsolationForest, df.shape[1], add_trees, n_jobs)
+    warm = iso is not None
+    if warm:
+        scaler = warm_start_from["scaler"]
+        Xs = scaler.transform(df)
+    else:
+        scaler = StandardScaler()
+        Xs = scaler.fit_transform(df)
+        iso = IsolationForest(n_estimators=200, contamination=0.05, random_state=42, n_jobs=n_jobs)
+    t0 = time.perf_counter()
     iso.fit(Xs)
-    joblib.dump(iso, MODEL_PATH)
-    joblib.dump(scaler, SCALER_PATH)
-    meta = {"trained_at": datetime.utcnow().isoformat(), "method": "isolation_forest"}
-    with open(META_PATH, "w") as f:
-        json.dump(meta, f, default=str)
+    fit_seconds = time.perf_counter() - t0
+    training = _training_report(started, fit_seconds, len(df), iso, n_jobs, warm)
+    meta = {"trained_at": datetime.utcnow().isoformat(), "method": "isolation_forest", "metrics": {"training": training}}
+    meta.update(model_store.publish(iso, scaler, meta))
     return meta
 
-def load_model():
-    if not os.path.exists(MODEL_PATH):
+def resolve_model_path(ref: Optional[str] = None) -> str:
+    """
+    Where the model `ref` lives: a legacy pickle path as is, else a store
+    version directory (ref = version or version directory, matched by name
+    so paths written on another machine still resolve). None means the
+    latest/pinned version, then the legacy MODEL_PATH. A ref that matches
+    nothing raises FileNotFoundError: serving another model under its
+    ml_models row would credit the wrong model with the predictions.
+    """
+    if not ref:
+        return model_store.resolve(None) or MODEL_PATH
+    if os.path.isfile(ref):
+        return ref
+    path = model_store.resolve(ref)
+    if path is None:
+        raise FileNotFoundError(f"Model {ref} not found in the model store ({model_store.STORE_DIR}).")
+    return path
+
+
+def load_model(model_path: Optional[str] = None):
+    """
+    Load a model bundle from a store version (see resolve_model_path), or a
+    legacy pickle with the scaler and meta files looked up next to it.
+    """
+    model_path = resolve_model_path(model_path)
+    if os.path.isdir(model_path):
+        return model_store.load(model_path)
+    if not os.path.exists(model_path):
         raise FileNotFoundError("No model found. Train first.")
-    model = joblib.load(MODEL_PATH)
-    scaler = joblib.load(SCALER_PATH) if os.path.exists(SCALER_PATH) else None
+    base = os.path.dirname(model_path)
+    scaler_path = os.path.join(base, os.path.basename(SCALER_PATH))
+    meta_path = os.path.join(base, os.path.basename(META_PATH))
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path) if os.path.exists(scaler_path) else None
     meta = {}
-    if os.path.exists(META_PATH):
-        with open(META_PATH, "r") as f:
+    if os.path.exists(meta_path):
+        with open(meta_path, "r") as f:
             meta = json.load(f)
     return {"model": model, "scaler": scaler, "meta": meta}
 
+
+def _risk_label(score: float) -> str:
+    return "AT_RISK" if score > 0.6 else ("WARNING" if score > 0.4 else "OK")
+
 def predict_risk(model_bundle: Dict[str, Any], features: Dict[str, Any]) -> Tuple[float, str]:
     model = model_bundle["model"]
     scaler = model_bundle.get("scaler")
@@ -84,3 +190,27 @@ def predict_risk(model_bundle: Dict[str, Any], features: Dict[str, Any]) -> Tupl
     score = float(pred)
     label = "AT_RISK" if pred == 1 else "OK"
     return score, label
+
+
+def predict_risk_batch(model_bundle: Dict[str, Any], X: np.ndarray) -> Tuple[List[float], List[str]]:
+    """
+    predict_risk for every row of X (columns in FEATURE_COLUMNS order) with
+    one scaler/model call; scores and labels equal the one-row results.
+    """
+    model = model_bundle["model"]
+    scaler = model_bundle.get("scaler")
+    if len(X) == 0:
+        return [], []
+    if scaler is not None:
+        Xs = scaler.transform(pd.DataFrame(X, columns=FEATURE_COLUMNS))
+    else:
+        Xs = X
+    if hasattr(model, "predict_proba"):
+        scores = model.predict_proba(Xs)[:, 1].tolist()
+        return scores, [_risk_label(s) for s in scores]
+    if hasattr(model, "decision_function"):
+        import math
+        scores = [1 / (1 + math.exp(-v)) for v in model.decision_function(Xs).tolist()]
+        return scores, [_risk_label(s) for s in scores]
+    preds = model.predict(Xs)
+    return [float(p) for p in preds], ["AT_RISK" if p == 1 else "OK" for p in preds]
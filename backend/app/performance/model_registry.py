@@ -0,0 +1,126 @@
+# backend/app/performance/model_registry.py
+"""
+Process-wide registry of loaded performance-model bundles.
+
+Bundles are keyed by ml_models.id (None for a model file no row points
+at) and loaded once per process. get() re-reads the latest ml_models row
+at most every PERF_MODEL_REGISTRY_TTL seconds and stats the model file on
+every call, so a newly registered model or a retrained file on disk is
+swapped in without a restart. Requests already holding the previous
+bundle finish with it. Store versions (app/performance/model_store.py)
+are immutable and memory-mapped on load.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.supabase_client import supabase
+from app.performance import ml_model, model_store
+from app.performance.utils import extract_data
+
+_logger = logging.getLogger(__name__)
+
+REGISTRY_TTL = float(os.getenv("PERF_MODEL_REGISTRY_TTL", "30"))
+MAX_LOADED_MODELS = 4
+
+
+class ModelRegistry:
+    def __init__(self, ttl: float = REGISTRY_TTL, max_loaded: int = MAX_LOADED_MODELS):
+        self.ttl = ttl
+        self.max_loaded = max_loaded
+        self._lock = threading.RLock()
+        self._bundles: "OrderedDict[Any, Dict[str, Any]]" = OrderedDict()
+        self._latest: Optional[Dict[str, Any]] = None
+        self._checked_at = 0.0
+
+    def _fetch_row(self, model_id: Any = None) -> Optional[Dict[str, Any]]:
+        q = supabase.table("ml_models").select("id,model_path,created_at")
+        if model_id is not None:
+            q = q.eq("id", model_id)
+        elif model_store.PINNED_VERSION:
+            # PERF_MODEL_VERSION pins the served version; find the row registered for it
+            pinned = model_store.resolve(model_store.PINNED_VERSION)
+            q = q.eq("model_path", os.path.abspath(pinned) if pinned else model_store.PINNED_VERSION)
+        else:
+            q = q.order("created_at", desc=True)
+        data = extract_data(q.limit(1).execute())
+        if isinstance(data, list):
+            return data[0] if data else None
+        return data or None
+
+    def latest_row(self, refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """The newest (or pinned) ml_models row, re-read at most every `ttl` seconds."""
+        with self._lock:
+            if refresh or time.monotonic() - self._checked_at >= self.ttl:
+                try:
+                    self._latest = self._fetch_row()
+                except Exception as ex:
+                    # keep serving the model we know about
+                    _logger.warning("ml_models lookup failed: %s", ex)
+                self._checked_at = time.monotonic()
+            return self._latest
+
+    @staticmethod
+    def _model_path(row: Optional[Dict[str, Any]]) -> str:
+        # a store version directory (or a legacy pickle); see ml_model.resolve_model_path.
+        # FileNotFoundError when the row's version is not here, rather than another model under its id
+        ref = (row or {}).get("model_path") or model_store.PINNED_VERSION
+        return ml_model.resolve_model_path(ref)
+
+    def get(self, model_id: Any = None) -> Dict[str, Any]:
+        """
+        The loaded bundle for `model_id` (default: the latest registered
+        model), as returned by ml_model.load_model() plus "id", "path",
+        "mtime" and "loaded_at". Raises FileNotFoundError when no model file
+        exists or the row's model_path cannot be resolved.
+        """
+        with self._lock:
+            if model_id is None:
+                row = self.latest_row()
+            else:
+                cached = self._bundles.get(model_id)
+                row = cached["row"] if cached else self._fetch_row(model_id)
+                if row is None:
+                    raise KeyError(f"ml_models row {model_id} not found")
+            key = (row or {}).get("id")
+            path = self._model_path(row)
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                raise FileNotFoundError("No model found. Train first.")
+
+            bundle = self._bundles.get(key)
+            if bundle is None or bundle["path"] != path or bundle["mtime"] != mtime:
+                bundle = dict(ml_model.load_model(path), id=key, row=row, path=path, mtime=mtime,
+                              loaded_at=datetime.utcnow().isoformat())
+                self._bundles[key] = bundle
+                _logger.info("Performance model %s loaded from %s", key, path)
+            self._bundles.move_to_end(key)
+            while len(self._bundles) > self.max_loaded:
+                self._bundles.popitem(last=False)
+            return bundle
+
+    def invalidate(self):
+        """Forget loaded bundles and the cached ml_models row."""
+        with self._lock:
+            self._bundles.clear()
+            self._latest = None
+            self._checked_at = 0.0
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "latest": self._latest,
+                "loaded": [{"id": k, "path": b["path"], "loaded_at": b["loaded_at"]} for k, b in self._bundles.items()],
+            }
+
+
+registry = ModelRegistry()
+
+
+def get_model(model_id: Any = None) -> Dict[str, Any]:
+    return registry.get(model_id)
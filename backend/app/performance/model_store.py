@@ -0,0 +1,130 @@
+# backend/app/performance/model_store.py
+"""
+Versioned, content-addressed store for performance-model artifacts.
+
+    <STORE_DIR>/
+      <version>/model.joblib      uncompressed, so joblib.load(mmap_mode='r') works
+      <version>/scaler.joblib
+      <version>/meta.json
+      LATEST                      name of the newest published version
+
+A version is the sha256 prefix of its model and scaler files, so retraining
+to an identical model re-uses the directory. publish() writes into a
+private temporary directory and renames it into place, then swaps LATEST
+with os.replace(); readers never see a half-written version and concurrent
+trainings can't overwrite each other. ml_models.model_path stores the
+version directory; resolve() maps None / "latest" / a version / a path to
+a directory, honouring PERF_MODEL_VERSION as a pin.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from typing import Any, Dict, Optional
+
+import joblib
+
+STORE_DIR = os.getenv("PERF_MODEL_STORE", os.path.join(os.path.dirname(__file__), "..", "models", "store"))
+PINNED_VERSION = os.getenv("PERF_MODEL_VERSION") or None
+MMAP_MODE = os.getenv("PERF_MODEL_MMAP", "r") or None
+
+MODEL_FILE = "model.joblib"
+SCALER_FILE = "scaler.joblib"
+META_FILE = "meta.json"
+LATEST_FILE = "LATEST"
+VERSION_LENGTH = 16
+
+
+def _sha256(paths) -> str:
+    h = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()
+
+
+def version_dir(version: str) -> str:
+    return os.path.join(STORE_DIR, version)
+
+
+def is_version_dir(path: Optional[str]) -> bool:
+    return bool(path) and os.path.isfile(os.path.join(path, MODEL_FILE))
+
+
+def _set_latest(version: str):
+    tmp = os.path.join(STORE_DIR, f".{LATEST_FILE}.{uuid.uuid4().hex}")
+    with open(tmp, "w") as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(STORE_DIR, LATEST_FILE))
+
+
+def latest_version() -> Optional[str]:
+    try:
+        with open(os.path.join(STORE_DIR, LATEST_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def publish(model, scaler, meta: Dict[str, Any], make_latest: bool = True) -> Dict[str, Any]:
+    """
+    Store a trained model (and optional scaler) as a new version; returns
+    {"version", "model_path"} with model_path the version directory.
+    """
+    os.makedirs(STORE_DIR, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=".publish-", dir=STORE_DIR)
+    try:
+        files = [os.path.join(tmp, MODEL_FILE)]
+        joblib.dump(model, files[0])
+        if scaler is not None:
+            files.append(os.path.join(tmp, SCALER_FILE))
+            joblib.dump(scaler, files[1])
+        version = _sha256(files)[:VERSION_LENGTH]
+        with open(os.path.join(tmp, META_FILE), "w") as f:
+            json.dump(dict(meta, version=version), f, default=str)
+        target = version_dir(version)
+        try:
+            os.rename(tmp, target)
+        except OSError:
+            # same content already published (possibly by a concurrent training)
+            if not is_version_dir(target):
+                raise
+            shutil.rmtree(tmp, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    if make_latest:
+        _set_latest(version)
+    return {"version": version, "model_path": os.path.abspath(target)}
+
+
+def resolve(ref: Optional[str] = None) -> Optional[str]:
+    """
+    Version directory for `ref`: None/"latest" (the pinned version if
+    PERF_MODEL_VERSION is set, else LATEST), a version name, or a version
+    directory path. None when nothing matches.
+    """
+    if ref in (None, "", "latest"):
+        ref = PINNED_VERSION or latest_version()
+        if ref is None:
+            return None
+    if is_version_dir(ref):
+        return ref
+    path = version_dir(os.path.basename(os.path.normpath(ref)))
+    return path if is_version_dir(path) else None
+
+
+def load(path: str, mmap_mode: Optional[str] = MMAP_MODE) -> Dict[str, Any]:
+    """Load a version directory into a model bundle ({"model", "scaler", "meta"})."""
+    model = joblib.load(os.path.join(path, MODEL_FILE), mmap_mode=mmap_mode)
+    scaler_path = os.path.join(path, SCALER_FILE)
+    scaler = joblib.load(scaler_path, mmap_mode=mmap_mode) if os.path.exists(scaler_path) else None
+    meta: Dict[str, Any] = {}
+    meta_path = os.path.join(path, META_FILE)
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+    return {"model": model, "scaler": scaler, "meta": meta}
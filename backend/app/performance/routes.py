@@ -1,47 +1,105 @@
-# backend/app/leave/routes.py
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from uuid import UUID
+# backend/app/performance/routes.py
+from typing import Optional
 
-from app.db import get_db
-from app.leave import services
-from app.leave.schemas import LeaveApplyIn
+from fastapi import APIRouter, HTTPException, Query
 
-router = APIRouter(prefix="/api/leave", tags=["leave"])
+from app.performance import buckets, services
+from app.performance.schemas import (
+    TaskCreate,
+    TaskUpdate,
+    TaskConfirm,
+    ComputeMetricsRequest,
+    PredictRequest,
+    PredictBatchRequest,
+)
 
+router = APIRouter(prefix="/api/performance", tags=["performance"])
 
-@router.post("/apply", status_code=status.HTTP_201_CREATED)
-def apply_leave(payload: LeaveApplyIn, db: Session = Depends(get_db)):
-    """
-    Employee applies for leave. Returns a JSON with message and leave_id.
-    """
-    result = services.apply_leave(db, payload)
-    return result
 
+@router.post("/task")
+def create_task(payload: TaskCreate):
+    return services.create_task(payload)
 
-@router.post("/approve", status_code=status.HTTP_200_OK)
-def approve_leave(leave_id: UUID, admin_id: UUID, db: Session = Depends(get_db)):
-    """
-    Admin approves leave. Provide leave_id and admin_id in request body or query.
-    Example body: { "leave_id": "...", "admin_id": "..." }
-    """
-    return services.approve_leave(db, leave_id, admin_id)
 
+@router.get("/task/{employee_id}")
+def list_tasks(
+    employee_id: str,
+    limit: int = Query(services.TASK_PAGE_SIZE, ge=1, le=services.MAX_TASK_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    fields: Optional[str] = Query(None, description="comma-separated task columns, e.g. id,title,status"),
+    include_progress: bool = True,
+):
+    """Newest tasks first, keyset-paginated; each task carries its latest progress."""
+    try:
+        return services.list_tasks_for_employee(
+            employee_id, limit, cursor,
+            [f.strip() for f in fields.split(",") if f.strip()] if fields else None,
+            include_progress,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/reject", status_code=status.HTTP_200_OK)
-def reject_leave(leave_id: UUID, admin_id: UUID, db: Session = Depends(get_db)):
-    """
-    Admin rejects leave.
-    """
-    return services.reject_leave(db, leave_id, admin_id)
 
+@router.post("/task/{task_id}/update")
+def add_task_update(task_id: str, payload: TaskUpdate):
+    try:
+        return services.add_task_update(task_id, payload)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/employee/{employee_id}")
-def get_employee_leaves(employee_id: UUID, db: Session = Depends(get_db)):
-    return services.get_employee_leaves(db, employee_id)
 
+@router.post("/task/{task_id}/confirm")
+def confirm_task(task_id: str, payload: TaskConfirm):
+    try:
+        return services.confirm_task(task_id, payload)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/pending")
-def get_pending_leaves(db: Session = Depends(get_db)):
-    return services.get_pending_leaves(db)
+
+@router.post("/compute-metrics")
+def compute_metrics(req: ComputeMetricsRequest):
+    return services.compute_metrics_for_period(req.start, req.end)
+
+
+@router.post("/predict")
+def predict(req: PredictRequest):
+    return services.predict_risk_for_employee(req.employee_id, req.start, req.end)
+
+
+@router.post("/predict-batch")
+def predict_batch(req: PredictBatchRequest):
+    """Score a whole period's performance_metrics in one model call."""
+    return services.predict_risk_batch_for_period(req.start, req.end, req.employee_ids, req.persist)
+
+
+@router.get("/metrics/window")
+def window_metrics(
+    start: str,
+    end: str,
+    employee_ids: Optional[str] = Query(None, description="comma-separated employee ids (default: all)"),
+):
+    """Metrics per employee for [start, end], summed from the daily buckets."""
+    try:
+        return buckets.window_metrics(start, end, [e.strip() for e in employee_ids.split(",") if e.strip()]
+                                      if employee_ids else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/metrics/{employee_id}/rolling")
+def rolling_metrics(employee_id: str, days: int = Query(30, ge=1, le=366)):
+    """Metrics of the last `days` days from the daily buckets, e.g. ?days=90."""
+    return buckets.rolling_metrics(employee_id, days)
+
+
+@router.post("/metrics/rebuild-buckets")
+def rebuild_buckets(req: ComputeMetricsRequest):
+    """Recompute the daily buckets of [start, end] (attendance counts, repairs)."""
+    try:
+        return buckets.rebuild_buckets(req.start, req.end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,6 +1,6 @@
 # backend/app/performance/schemas.py
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import date
 
 class TaskCreate(BaseModel):
@@ -30,3 +30,9 @@ class PredictRequest(BaseModel):
     employee_id: str
     start: str
     end: str
+
+class PredictBatchRequest(BaseModel):
+    start: str
+    end: str
+    employee_ids: Optional[List[str]] = None  # default: every employee with metrics
+    persist: bool = True
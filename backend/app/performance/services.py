@@ -1,10 +1,25 @@
 # backend/app/performance/services.py
 from datetime import datetime, date
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from app.supabase_client import supabase
 from app.performance.utils import extract_data
-from app.performance.ml_model import load_model, predict_risk
+from app.supabase_utils import fetch_in, fetch_paged
+from app.performance.ml_model import predict_risk, predict_risk_batch, FEATURE_COLUMNS
+from app.performance import buckets, metrics, model_registry, write_buffer
+import base64
+import json
+import logging
 import math
+import uuid
+import numpy as np
+
+_logger = logging.getLogger(__name__)
+
+PREDICTION_INSERT_CHUNK_SIZE = 500
+TASK_PAGE_SIZE = 50
+MAX_TASK_PAGE_SIZE = 200
+TASK_FIELDS = ("id", "title", "description", "assigned_to", "assigned_by", "due_date", "priority",
+               "status", "assigned_at", "created_at", "updated_at", "completed_at")
 
 def _serialize_dates(obj: Dict[str, Any]) -> Dict[str, Any]:
     from datetime import datetime as _dt, date as _date
@@ -19,6 +34,43 @@ def _serialize_dates(obj: Dict[str, Any]) -> Dict[str, Any]:
     return {k: conv(v) for k, v in obj.items()}
 
 
+def _check_task_write(task_id: str, obj: Dict[str, Any], actor_field: str):
+    """
+    Local checks of a task update/confirmation, before it is written or
+    queued: ValueError for a malformed payload, LookupError for a task id
+    that cannot exist. No database round-trip; a row naming an unknown task
+    is rejected by the insert (404), or dead-lettered by the write buffer.
+    """
+    try:
+        uuid.UUID(str(task_id))
+    except ValueError:
+        raise LookupError(f"task {task_id} not found")
+    try:
+        uuid.UUID(str(obj.get(actor_field)))
+    except ValueError:
+        raise ValueError(f"{actor_field} must be a uuid")
+    progress = obj.get("progress_percent")
+    if progress is not None and not 0 <= progress <= 100:
+        raise ValueError("progress_percent must be between 0 and 100")
+
+
+def _insert_task_row(table: str, task_id: str, row: Dict[str, Any]):
+    """Insert a task_updates/task_confirmations row; a foreign key violation means the task is unknown."""
+    try:
+        return extract_data(supabase.table(table).insert(row).execute())
+    except Exception as e:
+        if str(getattr(e, "code", "")) == "23503":
+            raise LookupError(f"task {task_id} not found")
+        if write_buffer.is_data_error(e):
+            raise ValueError(str(e))
+        raise
+
+
+def _has_positive_confirmation(task_id: str) -> bool:
+    res = supabase.table("task_confirmations").select("id").eq("task_id", task_id).eq("confirmed", True).limit(1).execute()
+    return bool(extract_data(res))
+
+
 def create_task(payload: Dict[str, Any]):
     """Insert a new task and return the created record"""
     obj = payload.copy() if isinstance(payload, dict) else payload.dict()
@@ -35,21 +87,116 @@ def create_task(payload: Dict[str, Any]):
     else:
         task = data
 
+    # daily bucket of the assignee (app/performance/buckets.py)
+    buckets.bump(obj.get("assigned_to"), obj["assigned_at"], tasks_assigned=1)
     return {"success": True, "task": task}
 
+def _encode_cursor(row: Dict[str, Any]) -> str:
+    raw = json.dumps([row.get("created_at"), row.get("id")], default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, task_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("invalid cursor")
+    if not created_at or task_id is None:
+        raise ValueError("invalid cursor")
+    return created_at, task_id
+
+
+# latest progress is embedded in the page query (task_updates -> tasks foreign key);
+# switched off, with a separate query per page instead, if PostgREST can't embed it
+_EMBED_PROGRESS = True
+PROGRESS_EMBED = "task_updates(progress_percent,created_at)"
+
+
+def _latest_progress(task_ids: List[Any]) -> Dict[Any, Dict[str, Any]]:
+    """Newest non-null progress_percent of each task (fallback for the embedded select)."""
+    latest: Dict[Any, Dict[str, Any]] = {}
+    if not task_ids:
+        return latest
+    rows = fetch_paged(lambda: supabase.table("task_updates").select("task_id,progress_percent,created_at")
+                       .in_("task_id", task_ids).order("created_at", desc=True).order("id"))
+    for u in rows:
+        if u.get("progress_percent") is not None and u["task_id"] not in latest:
+            latest[u["task_id"]] = u
+    return latest
+
+
+def _task_page(employee_id: str, columns: str, cursor: Optional[str], limit: int, embed: bool):
+    q = supabase.table("tasks").select(columns + ("," + PROGRESS_EMBED if embed else "")).eq("assigned_to", employee_id)
+    if cursor:
+        created_at, task_id = _decode_cursor(cursor)
+        q = q.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt."{task_id}")')
+    if embed:
+        q = q.not_.is_("task_updates.progress_percent", "null")\
+            .order("created_at", desc=True, foreign_table="task_updates").limit(1, foreign_table="task_updates")
+    # one extra row tells whether there is a next page
+    return extract_data(q.order("created_at", desc=True).order("id", desc=True).limit(limit + 1).execute()) or []
+
+
 # List tasks for employee
-def list_tasks_for_employee(employee_id: str):
-    res = supabase.table("tasks").select("*").eq("assigned_to", employee_id).order("created_at", desc=True).execute()
-    data = extract_data(res) or []
-    return {"tasks": data}
+def list_tasks_for_employee(employee_id: str, limit: int = TASK_PAGE_SIZE, cursor: Optional[str] = None,
+                            fields: Optional[List[str]] = None, include_progress: bool = True):
+    """
+    One page of the employee's tasks, newest first, keyset-paginated on
+    (created_at, id): pass the returned next_cursor back as `cursor` for
+    the following page (None on the last one). `fields` limits the task
+    columns (id and created_at are always included). With
+    `include_progress` each task carries latest_progress_percent and
+    latest_progress_at from its newest task_updates row with a progress value.
+    """
+    limit = max(1, min(int(limit), MAX_TASK_PAGE_SIZE))
+    if fields:
+        unknown = [f for f in fields if f not in TASK_FIELDS]
+        if unknown:
+            raise ValueError(f"unknown task fields: {', '.join(unknown)}")
+        columns = ",".join(dict.fromkeys(["id", "created_at"] + list(fields)))
+    else:
+        columns = ",".join(TASK_FIELDS)
+
+    global _EMBED_PROGRESS
+    embedded = include_progress and _EMBED_PROGRESS
+    if embedded:
+        try:
+            data = _task_page(employee_id, columns, cursor, limit, True)
+        except ValueError:
+            raise
+        except Exception as e:
+            _logger.warning("task_updates embedding unavailable, fetching progress separately: %s", e)
+            _EMBED_PROGRESS = embedded = False
+    if not embedded:
+        data = _task_page(employee_id, columns, cursor, limit, False)
+    tasks, more = data[:limit], len(data) > limit
+
+    if include_progress:
+        latest = {} if embedded else _latest_progress([t["id"] for t in tasks])
+        for t in tasks:
+            if embedded:
+                ups = t.pop("task_updates", None) or []
+                u = ups[0] if ups else None
+            else:
+                u = latest.get(t["id"])
+            t["latest_progress_percent"] = u["progress_percent"] if u else None
+            t["latest_progress_at"] = u["created_at"] if u else None
+
+    return {"tasks": tasks, "next_cursor": _encode_cursor(tasks[-1]) if more else None}
 
 # Add task update
 def add_task_update(task_id: str, payload):
     obj = payload.copy() if isinstance(payload, dict) else payload.dict()
+    _check_task_write(task_id, obj, "updated_by")
     obj["task_id"] = task_id
     obj["created_at"] = datetime.utcnow().isoformat()
-    res = supabase.table("task_updates").insert(obj).execute()
-    data = extract_data(res)
+    if write_buffer.WRITE_BEHIND:
+        # durably queued; written (and counted in the buckets) by the next flush
+        return {"success": True, "queued": True, "update": write_buffer.enqueue("task_updates", obj)}
+    data = _insert_task_row("task_updates", task_id, obj)
+    if obj.get("progress_percent") is not None:
+        task = extract_data(supabase.table("tasks").select("assigned_to").eq("id", task_id).limit(1).execute()) or [{}]
+        buckets.bump(task[0].get("assigned_to"), obj["created_at"], progress_sum=obj["progress_percent"], progress_updates=1)
     return {"success": True, "update": (data[0] if data and isinstance(data, list) else data)}
 
 # Confirm task
@@ -59,6 +206,7 @@ def confirm_task(task_id: str, payload):
     Maps confirmed -> DB status ('completed'|'cancelled') and updates task.
     """
     obj = payload.copy() if isinstance(payload, dict) else payload.dict()
+    _check_task_write(task_id, obj, "confirmed_by")
     # Map to DB canonical statuses (lowercase)
     status = "completed" if obj.get("confirmed") else "cancelled"
 
@@ -70,67 +218,40 @@ def confirm_task(task_id: str, payload):
         "comment": obj.get("comment"),
         "created_at": datetime.utcnow().isoformat()
     }
+    if write_buffer.WRITE_BEHIND:
+        # the flush inserts the confirmation and sets the task status in bulk
+        conf = write_buffer.enqueue("task_confirmations", _serialize_dates(conf))
+        return {"success": True, "status": status, "queued": True, "confirmation": conf}
+    first_completion = status == "completed" and not _has_positive_confirmation(task_id)
     # insert confirmation
-    res_conf = supabase.table("task_confirmations").insert(_serialize_dates(conf)).execute()
-    # update task row (status + updated_at)
+    data_conf = _insert_task_row("task_confirmations", task_id, _serialize_dates(conf))
+    # update task row (status + updated_at); the updated row carries the assignee
     upd = {"status": status, "updated_at": datetime.utcnow().isoformat()}
     res_upd = supabase.table("tasks").update(_serialize_dates(upd)).eq("id", task_id).execute()
 
-    data_conf = extract_data(res_conf)
     data_upd = extract_data(res_upd)
+    task = (data_upd[0] if data_upd else {}) if isinstance(data_upd, list) else (data_upd or {})
+    # a task counts as completed once, at its first positive confirmation
+    # (as compute_metrics and rebuild_buckets count it), whatever happened in between
+    if first_completion:
+        days = buckets.completion_days(task.get("assigned_at"), conf["created_at"])
+        buckets.bump(task.get("assigned_to"), conf["created_at"], tasks_completed=1, completion_days_total=days or 0)
     return {"success": True, "status": status, "confirmation": (data_conf[0] if isinstance(data_conf, list) and data_conf else data_conf)}
 
-# Compute metrics for period (simple aggregator)
+# Compute metrics for period (set-based, see app/performance/metrics.py)
 def compute_metrics_for_period(start: str, end: str):
-    # get all active employees
-    res = supabase.table("employees").select("id").execute()
-    emps = extract_data(res) or []
-    results = []
-    for e in emps:
-        emp_id = e["id"]
-        # tasks assigned in period
-        tas = extract_data(supabase.table("tasks").select("id,assigned_at").eq("assigned_to", emp_id).gte("assigned_at", start).lte("assigned_at", end).execute()) or []
-        assigned_n = len(tas)
-        # task confirmations (confirmed) in period
-        confs = extract_data(supabase.table("task_confirmations").select("task_id,created_at").gte("created_at", start).lte("created_at", end).eq("confirmed", True).execute()) or []
-        completed_ids = {c["task_id"] for c in confs}
-        completed_n = len(completed_ids)
-        # avg completion days
-        total_days = 0
-        for t in tas:
-            task_row = extract_data(supabase.table("tasks").select("assigned_at").eq("id", t["id"]).execute())
-            conf_row = extract_data(supabase.table("task_confirmations").select("created_at").eq("task_id", t["id"]).execute())
-            if task_row and conf_row:
-                # normalize shapes
-                ta = task_row[0] if isinstance(task_row, list) else task_row
-                cf = conf_row[0] if isinstance(conf_row, list) else conf_row
-                try:
-                    d1 = datetime.fromisoformat(ta["assigned_at"][:19])
-                    d2 = datetime.fromisoformat(cf["created_at"][:19])
-                    total_days += (d2 - d1).days
-                except Exception:
-                    pass
-        avg_completion_days = (total_days / completed_n) if completed_n > 0 else 0
-        # attendance rate
-        att_rows = extract_data(supabase.table("attendance").select("status").eq("employee_id", emp_id).gte("date", start).lte("date", end).execute()) or []
-        present = sum(1 for a in att_rows if a.get("status") in ("PRESENT", "HALF_DAY"))
-        total_days_att = len(att_rows) if att_rows else 0
-        attendance_rate = (present / total_days_att) if total_days_att > 0 else 0.0
-        metric = {
-            "employee_id": emp_id,
-            "period_start": start,
-            "period_end": end,
-            "tasks_assigned": assigned_n,
-            "tasks_completed": completed_n,
-            "avg_task_completion_days": float(avg_completion_days),
-            "avg_progress_percent": 0.0,
-            "attendance_rate": float(round(attendance_rate, 4)),
-            "last_updated": datetime.utcnow().isoformat()
-        }
-        supabase.table("performance_metrics").insert(metric).execute()
-        results.append(metric)
+    results = metrics.compute_for_period(start, end)
     return {"success": True, "results": results}
 
+def _features(metric: Dict[str, Any]) -> Dict[str, Any]:
+    """Model features of a performance_metrics row (ensure numeric types)."""
+    return {
+        "tasks_assigned": int(metric.get("tasks_assigned", 0) or 0),
+        "tasks_completed": int(metric.get("tasks_completed", 0) or 0),
+        "avg_task_completion_days": float(metric.get("avg_task_completion_days", 0.0) or 0.0),
+        "attendance_rate": float(metric.get("attendance_rate", 0.0) or 0.0)
+    }
+
 # Predict risk for employee based on metrics
 def predict_risk_for_employee(employee_id: str, start: str, end: str):
     """
@@ -138,9 +259,6 @@ def predict_risk_for_employee(employee_id: str, start: str, end: str):
     Persists prediction into performance_predictions.model_id using the actual ml_models.id (uuid)
     if available. Returns helpful error messages for debugging.
     """
-    from app.performance.ml_model import load_model, predict_risk
-    from app.performance.utils import extract_data
-
     # 1) fetch computed metrics
     try:
         res = supabase.table("performance_metrics")\
@@ -160,20 +278,15 @@ def predict_risk_for_employee(employee_id: str, start: str, end: str):
     if not metric:
         return {"error": "metrics_parsing_failed", "detail": repr(m)}
 
-    # 2) load model bundle
+    # 2) warm model bundle from the process-wide registry
     try:
-        model_bundle = load_model()
+        model_bundle = model_registry.get_model()
     except Exception as e:
         return {"error": "model_load_failed", "detail": str(e)}
 
     # 3) build features (ensure numeric types)
     try:
-        features = {
-            "tasks_assigned": int(metric.get("tasks_assigned", 0) or 0),
-            "tasks_completed": int(metric.get("tasks_completed", 0) or 0),
-            "avg_task_completion_days": float(metric.get("avg_task_completion_days", 0.0) or 0.0),
-            "attendance_rate": float(metric.get("attendance_rate", 0.0) or 0.0)
-        }
+        features = _features(metric)
     except Exception as e:
         return {"error": "feature_build_failed", "detail": str(e), "metric": metric}
 
@@ -184,19 +297,8 @@ def predict_risk_for_employee(employee_id: str, start: str, end: str):
         import traceback
         return {"error": "prediction_failed", "detail": str(e), "trace": traceback.format_exc(), "features": features}
 
-    # 5) determine model_id (uuid) to persist: prefer latest ml_models.id
-    model_id_to_save = None
-    try:
-        # try to get the most recent ml_models row id (uuid)
-        mm = supabase.table("ml_models").select("id").order("created_at", desc=True).limit(1).execute()
-        mm_data = extract_data(mm)
-        if mm_data:
-            # mm_data may be a list or dict depending on client - normalize
-            rec = mm_data[0] if isinstance(mm_data, list) else mm_data
-            model_id_to_save = rec.get("id")
-    except Exception:
-        # ignore and leave model_id_to_save as None
-        model_id_to_save = None
+    # 5) model_id (uuid) to persist: the ml_models.id of the bundle that scored
+    model_id_to_save = model_bundle.get("id")
 
     # 6) persist prediction (use None for model_id if not available)
     try:
@@ -219,3 +321,70 @@ def predict_risk_for_employee(employee_id: str, start: str, end: str):
         return {"warning": "prediction_saved_failed", "detail": str(e), "score": float(score), "label": label}
 
     return {"employee_id": employee_id, "risk_score": float(score), "risk_label": label, "model_id": model_id_to_save}
+
+
+# Predict risk for every employee of a period in one model call
+def predict_risk_batch_for_period(start: str, end: str, employee_ids: Optional[List[str]] = None, persist: bool = True):
+    """
+    Score the period's performance_metrics (all employees, or `employee_ids`)
+    with a single matrix call on the warm model and bulk-insert
+    performance_predictions. Rows whose features can't be built are
+    reported in "errors" and skipped.
+    """
+    try:
+        model_bundle = model_registry.get_model()
+    except Exception as e:
+        return {"error": "model_load_failed", "detail": str(e)}
+
+    try:
+        filters = [("period_start", "eq", start), ("period_end", "eq", end)]
+        if employee_ids is not None:
+            rows = fetch_in("performance_metrics", "employee_id", employee_ids, filters=filters)
+        else:
+            rows = fetch_paged(lambda: supabase.table("performance_metrics").select("*")
+                               .eq("period_start", start).eq("period_end", end).order("id"))
+    except Exception as e:
+        return {"error": "supabase_fetch_metrics_failed", "detail": str(e)}
+
+    # compute-metrics appends rows; score each employee's newest one
+    latest: Dict[Any, Dict[str, Any]] = {}
+    for r in rows:
+        prev = latest.get(r.get("employee_id"))
+        if prev is None or str(r.get("last_updated") or "") >= str(prev.get("last_updated") or ""):
+            latest[r.get("employee_id")] = r
+
+    ids, matrix, errors = [], [], []
+    for emp_id, metric in latest.items():
+        try:
+            f = _features(metric)
+        except Exception as e:
+            errors.append({"employee_id": emp_id, "error": "feature_build_failed", "detail": str(e)})
+            continue
+        ids.append(emp_id)
+        matrix.append([f[c] for c in FEATURE_COLUMNS])
+
+    try:
+        X = np.asarray(matrix, dtype=float).reshape(len(matrix), len(FEATURE_COLUMNS))
+        scores, labels = predict_risk_batch(model_bundle, X)
+    except Exception as e:
+        return {"error": "prediction_failed", "detail": str(e)}
+
+    model_id = model_bundle.get("id")
+    results = [{"employee_id": e, "risk_score": float(sc), "risk_label": lb} for e, sc, lb in zip(ids, scores, labels)]
+    out = {"success": True, "period_start": start, "period_end": end, "model_id": model_id,
+           "scored": len(results), "results": results, "errors": errors}
+
+    if persist and results:
+        now = datetime.utcnow().isoformat()
+        payloads = [dict(r, period_start=start, period_end=end, created_at=now) for r in results]
+        if model_id is not None:
+            for p in payloads:
+                p["model_id"] = model_id
+        try:
+            for i in range(0, len(payloads), PREDICTION_INSERT_CHUNK_SIZE):
+                supabase.table("performance_predictions").insert(payloads[i:i + PREDICTION_INSERT_CHUNK_SIZE]).execute()
+        except Exception as e:
+            # still return the predictions, but surface the persist error
+            out["warning"] = "prediction_saved_failed"
+            out["detail"] = str(e)
+    return out
@@ -0,0 +1,456 @@
+# backend/app/performance/write_buffer.py
+"""
+Write-behind buffer for task_updates and task_confirmations.
+
+Off by default: set PERF_WRITE_BEHIND=1 to enable it. The API then
+answers {"queued": true} without the database row, and reads that follow
+a write may not see it for up to one flush interval. The journal is on
+local disk, so PERF_WRITE_JOURNAL_DIR must survive a redeploy (a
+persistent volume) and be reused by the same host; a journal left on a
+disk nobody mounts again is never replayed.
+
+enqueue() appends the row to a per-process journal and fsyncs it (group
+commit: concurrent callers share one fsync), then returns; the API
+answers as soon as the write is durable on local disk. Callers only run
+local checks first (services.add_task_update / confirm_task); rows the
+database rejects are isolated and dead-lettered by the flush (below).
+A background thread flushes the buffer every PERF_WRITE_FLUSH_MS ms, or
+as soon as PERF_WRITE_MAX_BATCH rows are waiting:
+
+  - one tasks lookup (fetch_in) for the tasks the batch touches
+  - one insert per table for the whole batch
+  - one tasks update per target status (the last confirmation of a task wins)
+  - one bucket bump per (employee, day) instead of one per event
+
+Rows carry client-generated ids and are written with ON CONFLICT (id) DO
+NOTHING, so replaying a journal after a crash is idempotent; only rows
+that were actually inserted count towards the daily buckets. Their
+bucket increments are journaled right after the insert and applied as
+entries of their own, so a failure later in the flush cannot drop them.
+
+A batch the database rejects with a data error (SQLSTATE class 22 or 23,
+e.g. an unknown task_id or a malformed uuid) is split in halves until
+the offending rows are isolated; those go to dead-letter.jsonl in the
+journal directory and the rest is written. Any other failure (network,
+outage) retries the whole batch with backoff.
+
+Journals live in PERF_WRITE_JOURNAL_DIR as journal-<pid>-<token>.log,
+each flock()ed by its owner, with a .ckpt file holding the last flushed
+sequence number. On start a process adopts every journal it can lock
+(left behind by a crashed or killed worker) and replays its unflushed
+rows. stop() (app shutdown, or atexit) flushes what is left; rows it
+cannot write stay in the journal for the next start.
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, journals of other processes are not adopted
+    fcntl = None
+
+from app.supabase_client import supabase
+from app.performance import buckets
+from app.performance.utils import extract_data
+from app.supabase_utils import IN_FILTER_SIZE, fetch_in
+
+_logger = logging.getLogger(__name__)
+
+WRITE_BEHIND = os.getenv("PERF_WRITE_BEHIND", "0").lower() not in ("0", "false", "no", "")
+JOURNAL_DIR = os.getenv("PERF_WRITE_JOURNAL_DIR", os.path.join(os.path.dirname(__file__), "..", "..", "var", "write_journal"))
+FLUSH_INTERVAL_MS = int(os.getenv("PERF_WRITE_FLUSH_MS", "200"))
+MAX_BATCH = int(os.getenv("PERF_WRITE_MAX_BATCH", "500"))
+MAX_RETRY_DELAY = 30.0
+STOP_TIMEOUT = 30.0
+
+TABLES = ("task_updates", "task_confirmations")
+BUCKET_DELTA = "performance_daily_buckets"  # journal entries holding bucket increments
+DEAD_LETTER_FILE = "dead-letter.jsonl"
+
+
+def new_id() -> str:
+    return str(uuid.uuid4())
+
+
+def _read_entries(path: str, after: int) -> List[Dict[str, Any]]:
+    entries = []
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # torn last line of a crashed writer; it was never acknowledged
+                continue
+            if entry.get("seq", 0) > after:
+                entries.append(entry)
+    return entries
+
+
+def _read_checkpoint(path: str) -> int:
+    try:
+        with open(path + ".ckpt") as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def is_data_error(exc: Exception) -> bool:
+    """True for errors caused by the rows themselves (retrying cannot help)."""
+    code = str(getattr(exc, "code", "") or "")
+    return code[:2] in ("22", "23")
+
+
+def _remove(path: str):
+    for p in (path, path + ".ckpt"):
+        try:
+            os.remove(p)
+        except FileNotFoundError:
+            pass
+
+
+class WriteBuffer:
+    def __init__(self, journal_dir: str = JOURNAL_DIR, flush_interval_ms: int = FLUSH_INTERVAL_MS,
+                 max_batch: int = MAX_BATCH):
+        self.journal_dir = journal_dir
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_batch = max_batch
+        self._lock = threading.Lock()  # pending rows, sequence numbers, journal fd
+        self._wake = threading.Condition(self._lock)
+        self._sync_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: List[Dict[str, Any]] = []
+        self._dead: set = set()  # seqs dead-lettered while their batch is still being retried
+        self._seq = 0
+        self._synced = 0
+        self._fd: Optional[int] = None
+        self._path: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._atexit = False
+
+    # -------------------------
+    # lifecycle
+    # -------------------------
+    def start(self):
+        """Open this process's journal, adopt orphaned ones and start the flusher. Idempotent."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            os.makedirs(self.journal_dir, exist_ok=True)
+            if self._fd is None:
+                self._open_journal()
+            self._stopping = False
+            self._adopt_orphans()
+            self._thread = threading.Thread(target=self._run, name="perf-write-buffer", daemon=True)
+            self._thread.start()
+            if not self._atexit:
+                atexit.register(self.stop)
+                self._atexit = True
+
+    def _open_journal(self):
+        name = f"journal-{os.getpid()}-{uuid.uuid4().hex[:8]}.log"
+        tmp = os.path.join(self.journal_dir, "." + name)
+        fd = os.open(tmp, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o600)
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        # only visible under its final name once locked, so no other process adopts it
+        self._path = os.path.join(self.journal_dir, name)
+        os.rename(tmp, self._path)
+        self._fd = fd
+
+    def _adopt_orphans(self):
+        if fcntl is None:
+            return
+        adopted = 0
+        for path in sorted(glob.glob(os.path.join(self.journal_dir, "journal-*.log"))):
+            if path == self._path:
+                continue
+            try:
+                fd = os.open(path, os.O_RDWR)
+            except FileNotFoundError:
+                continue
+            try:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue  # owned by a live process
+                entries = _read_entries(path, _read_checkpoint(path))
+                for entry in entries:
+                    self._append(entry["table"], entry["row"])
+                if entries:
+                    os.fsync(self._fd)
+                    self._synced = self._seq
+                _remove(path)
+                adopted += len(entries)
+            finally:
+                os.close(fd)
+        if adopted:
+            _logger.warning("Replaying %d buffered task writes from orphaned journals", adopted)
+            self._wake.notify()
+
+    def stop(self, timeout: float = STOP_TIMEOUT) -> int:
+        """
+        Flush everything and stop the flusher; returns the number of rows
+        left unwritten (kept in the journal and replayed on the next start).
+        """
+        with self._lock:
+            thread = self._thread
+            self._stopping = True
+            self._wake.notify()
+        if thread is not None:
+            thread.join(timeout)
+        with self._lock:
+            if thread is not None and thread.is_alive():
+                _logger.error("Write buffer still flushing after %ss; %d rows stay journaled", timeout, len(self._pending))
+                return len(self._pending)
+            self._thread = None
+            left = len(self._pending)
+            if self._fd is not None:
+                os.close(self._fd)  # releases the flock
+                self._fd = None
+                if not left:
+                    _remove(self._path)
+                else:
+                    _logger.error("%d buffered task writes could not be flushed; kept in %s", left, self._path)
+                self._pending = []
+            return left
+
+    # -------------------------
+    # writes
+    # -------------------------
+    def _append(self, table: str, row: Dict[str, Any]) -> int:
+        # caller holds self._lock; O_APPEND writes land in the page cache in seq order
+        self._seq += 1
+        entry = {"seq": self._seq, "table": table, "row": row}
+        os.write(self._fd, (json.dumps(entry, default=str) + "\n").encode())
+        self._pending.append(entry)
+        return self._seq
+
+    def _sync(self, seq: int):
+        with self._sync_lock:
+            if self._synced >= seq:
+                return  # covered by another caller's fsync
+            with self._lock:
+                upto, fd = self._seq, self._fd
+            os.fsync(fd)
+            self._synced = upto
+
+    def enqueue(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Durably queue one row for `table`; returns the row (with its id)."""
+        if table not in TABLES:
+            raise ValueError(f"{table} is not write-behind buffered")
+        row = dict(row)
+        row.setdefault("id", new_id())
+        self.start()
+        with self._lock:
+            seq = self._append(table, row)
+            if len(self._pending) >= self.max_batch:
+                self._wake.notify()
+        self._sync(seq)
+        return row
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    # -------------------------
+    # flushing
+    # -------------------------
+    def _run(self):
+        failures = 0
+        while True:
+            with self._lock:
+                if not self._stopping and len(self._pending) < self.max_batch:
+                    self._wake.wait(self.flush_interval)
+                if self._stopping and not self._pending:
+                    return
+            try:
+                self.flush()
+                failures = 0
+            except Exception:
+                failures += 1
+                delay = min(self.flush_interval * 2 ** failures, MAX_RETRY_DELAY)
+                _logger.exception("Write buffer flush failed (attempt %d); retrying in %.1fs", failures, delay)
+                time.sleep(delay)
+
+    def flush(self) -> int:
+        """Write every pending row now; returns how many were written (or dead-lettered)."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = self._next_batch()
+                if not batch:
+                    return written
+                if batch[0]["table"] == BUCKET_DELTA:
+                    self._apply_delta(batch[0])
+                else:
+                    self._write_isolating_failures(batch)
+                    written += len(batch)
+                    self._dead.difference_update(e["seq"] for e in batch)
+                with self._lock:
+                    del self._pending[:len(batch)]
+                    self._checkpoint(batch[-1]["seq"])
+
+    def _next_batch(self) -> List[Dict[str, Any]]:
+        # caller holds self._lock; a bucket delta is applied (and checkpointed) on its own
+        if self._pending and self._pending[0]["table"] == BUCKET_DELTA:
+            return self._pending[:1]
+        batch = []
+        for entry in self._pending[:self.max_batch]:
+            if entry["table"] == BUCKET_DELTA:
+                break
+            batch.append(entry)
+        return batch
+
+    def _checkpoint(self, seq: int):
+        # caller holds self._lock
+        if not self._pending:
+            os.ftruncate(self._fd, 0)
+        tmp = self._path + ".ckpt.tmp"
+        with open(tmp, "w") as f:
+            f.write(str(seq))
+        os.replace(tmp, self._path + ".ckpt")
+
+    def _write_isolating_failures(self, batch: List[Dict[str, Any]]):
+        """
+        Write `batch`; if the database rejects it, split it in halves until
+        the failing rows are isolated (log2 extra round-trips) and
+        dead-letter them.
+        """
+        batch = [e for e in batch if e["seq"] not in self._dead]
+        if not batch:
+            return
+        try:
+            self._apply(batch)
+        except Exception as exc:
+            if not is_data_error(exc):
+                raise
+            if len(batch) == 1:
+                self._dead_letter(batch[0], exc)
+                return
+            mid = len(batch) // 2
+            self._write_isolating_failures(batch[:mid])
+            self._write_isolating_failures(batch[mid:])
+
+    def _apply(self, batch: List[Dict[str, Any]]):
+        rows = defaultdict(list)
+        for entry in batch:
+            rows[entry["table"]].append(entry["row"])
+        task_ids = list({r["task_id"] for entries in rows.values() for r in entries})
+        tasks = {t["id"]: t for t in fetch_in("tasks", "id", task_ids, "id,assigned_to,assigned_at,status")}
+        conf_task_ids = list({r["task_id"] for r in rows["task_confirmations"] if r.get("confirmed")})
+        # a task counts as completed once, at its first positive confirmation (as compute_metrics counts it)
+        confirmed_before = {c["task_id"] for c in fetch_in("task_confirmations", "task_id", conf_task_ids, "id,task_id",
+                                                           filters=[("confirmed", "eq", True)])}
+
+        # increments are journaled as soon as their rows are in, before anything else can fail
+        updates = _inserted("task_updates", rows["task_updates"])
+        self._journal_deltas(_progress_deltas(updates, tasks))
+        confs = _inserted("task_confirmations", rows["task_confirmations"])
+        self._journal_deltas(_completion_deltas(confs, tasks, confirmed_before))
+
+        final: Dict[Any, str] = {}
+        for c in sorted(rows["task_confirmations"], key=lambda r: str(r.get("created_at"))):
+            final[c["task_id"]] = "completed" if c.get("confirmed") else "cancelled"
+        by_status = defaultdict(list)
+        for tid, status in final.items():
+            by_status[status].append(tid)
+        now = datetime.utcnow().isoformat()
+        for status, ids in by_status.items():
+            for i in range(0, len(ids), IN_FILTER_SIZE):
+                supabase.table("tasks").update({"status": status, "updated_at": now}).in_("id", ids[i:i + IN_FILTER_SIZE]).execute()
+
+    def _journal_deltas(self, deltas: Dict[tuple, Dict[str, float]]):
+        if not deltas:
+            return
+        with self._lock:
+            for (employee_id, day), counts in deltas.items():
+                seq = self._append(BUCKET_DELTA, {
+                    "employee_id": employee_id, "day": day,
+                    "counts": {k: (int(v) if float(v).is_integer() else v) for k, v in counts.items()},
+                })
+        self._sync(seq)
+
+    def _apply_delta(self, entry: Dict[str, Any]):
+        delta = entry["row"]
+        try:
+            buckets.bump(delta["employee_id"], delta["day"], raise_errors=True, **delta["counts"])
+        except Exception as exc:
+            if not is_data_error(exc):
+                raise
+            self._dead_letter(entry, exc)
+
+    def _dead_letter(self, entry: Dict[str, Any], exc: Exception):
+        _logger.error("Dropping buffered %s row %s rejected by the database: %s",
+                      entry["table"], entry["row"].get("id"), exc)
+        self._dead.add(entry["seq"])
+        record = {"table": entry["table"], "row": entry["row"], "error": str(exc),
+                  "failed_at": datetime.utcnow().isoformat()}
+        with open(os.path.join(self.journal_dir, DEAD_LETTER_FILE), "a") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _inserted(table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Insert rows, skipping ids that already exist; returns the rows actually inserted."""
+    if not rows:
+        return []
+    data = extract_data(supabase.table(table).upsert(rows, on_conflict="id", ignore_duplicates=True).execute())
+    if not isinstance(data, list):
+        return rows
+    new = {r.get("id") for r in data}
+    return [r for r in rows if r["id"] in new]
+
+
+def _progress_deltas(updates: List[Dict[str, Any]], tasks: Dict[Any, Dict[str, Any]]) -> Dict[tuple, Dict[str, float]]:
+    deltas: Dict[tuple, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    for u in updates:
+        task = tasks.get(u["task_id"])
+        if task and u.get("progress_percent") is not None:
+            d = deltas[(task.get("assigned_to"), str(u["created_at"])[:10])]
+            d["progress_sum"] += u["progress_percent"]
+            d["progress_updates"] += 1
+    return deltas
+
+
+def _completion_deltas(confs: List[Dict[str, Any]], tasks: Dict[Any, Dict[str, Any]],
+                       confirmed_before: set) -> Dict[tuple, Dict[str, float]]:
+    """Completions among the inserted `confs`: the first positive confirmation of a task without one."""
+    deltas: Dict[tuple, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    counted = set(confirmed_before)
+    for c in sorted(confs, key=lambda r: (str(r.get("created_at")), str(r["id"]))):
+        task = tasks.get(c["task_id"])
+        if not c.get("confirmed") or c["task_id"] in counted or not task:
+            continue
+        counted.add(c["task_id"])
+        d = deltas[(task.get("assigned_to"), str(c["created_at"])[:10])]
+        d["tasks_completed"] += 1
+        d["completion_days_total"] += buckets.completion_days(task.get("assigned_at"), c["created_at"]) or 0
+    return deltas
+
+
+buffer = WriteBuffer()
+
+
+def enqueue(table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+    return buffer.enqueue(table, row)
+
+
+def start():
+    if WRITE_BEHIND:
+        buffer.start()
+
+
+def stop() -> int:
+    return buffer.stop()
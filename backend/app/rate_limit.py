@@ -0,0 +1,189 @@
+"""
+Sliding-window rate limiting with per-route costs and per-user keys.
+
+Requests are matched against the rules (first match wins) to get a policy and
+a cost: cheap dashboard reads draw one unit from the generous "default"
+policy, LLM and payroll calls draw several units from small dedicated
+policies, so a burst of interviews cannot starve dashboards and vice
+versa. Requests with a verified Supabase JWT are counted per user;
+everything else is counted per client IP.
+
+Each policy is a sliding window of `period` seconds approximated from two
+fixed windows: the previous window's total, weighted by how much of it
+still overlaps the sliding window, plus the current window's total.
+Counts live in Redis at `rate_limit:<policy>:<identity>:<window>`; each
+worker adds its own unsynced units locally and pushes them with one
+atomic INCRBY+EXPIRE once `sync_every` units have piled up or
+`sync_interval` seconds have passed. A request is refused only after a
+re-sync confirms the limit is exceeded, so most requests touch no
+network, and a worker overshoots by at most `sync_every` units.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import re
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.redis_client import INCR_WITH_TTL_SCRIPT, async_redis_client
+
+JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+MAX_TRACKED_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))
+
+
+class Policy(NamedTuple):
+    limit: int          # units per period
+    period: int = 60    # seconds
+
+
+class Rule(NamedTuple):
+    method: str         # "*" for any
+    pattern: str        # regex matched against the start of the path
+    policy: str
+    cost: int = 1
+
+
+DEFAULT_POLICIES: Dict[str, Policy] = {
+    "default": Policy(limit=100),
+    "llm": Policy(limit=30),
+    "payroll": Policy(limit=20),
+}
+
+DEFAULT_RULES: List[Rule] = [
+    Rule("POST", r"/interview/conversation$", "llm", 3),
+    Rule("POST", r"/interview/start-analysis$", "llm", 10),
+    Rule("POST", r"/api/payroll/(run|runs/[^/]+/resume)$", "payroll", 10),
+    Rule("POST", r"/api/payroll/(simulate|persist/bulk)$", "payroll", 5),
+    Rule("POST", r"/api/payroll/compute$", "payroll", 1),
+    Rule("POST", r"/api/performance/(compute-metrics|predict-batch|metrics/rebuild-buckets)$", "default", 10),
+    Rule("*", r"/", "default", 1),
+]
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def user_id_from_token(token: str, secret: Optional[str] = JWT_SECRET) -> Optional[str]:
+    """
+    `sub` of a Supabase access token, or None. Without SUPABASE_JWT_SECRET
+    tokens cannot be verified locally and are ignored: an unverified
+    subject would let a client pick a fresh key for every request.
+    """
+    if not secret:
+        return None
+    try:
+        header, payload, signature = token.split(".")
+        if json.loads(_b64decode(header)).get("alg") != "HS256":
+            return None
+        expected = hmac.new(secret.encode(), f"{header}.{payload}".encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64decode(signature)):
+            return None
+        claims = json.loads(_b64decode(payload))
+        if claims.get("exp") is not None and claims["exp"] < time.time():
+            return None
+        return claims.get("sub")
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+class SlidingWindowLimiter:
+    def __init__(self, policies: Optional[Dict[str, Policy]] = None, rules: Optional[List[Rule]] = None,
+                 sync_every: Optional[int] = None, sync_interval: float = 1.0):
+        self.policies = dict(policies or DEFAULT_POLICIES)
+        self.rules = [(r.method.upper(), re.compile(r.pattern), r.policy, r.cost) for r in (rules or DEFAULT_RULES)]
+        for _, _, policy, _ in self.rules:
+            if policy not in self.policies:
+                raise ValueError(f"rate limit rule refers to unknown policy {policy!r}")
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        # (policy, identity) -> [window, previous window total (None until read),
+        #                        current window total last seen in Redis, unsynced units, last sync]
+        self._state: Dict[Tuple[str, str], list] = {}
+
+    def match(self, method: str, path: str) -> Optional[Tuple[str, int]]:
+        """(policy, cost) of the first rule matching the request, or None if unlimited."""
+        for rule_method, pattern, policy, cost in self.rules:
+            if rule_method in ("*", method) and pattern.match(path):
+                return policy, cost
+        return None
+
+    def _sync_threshold(self, policy: Policy) -> int:
+        return self.sync_every or max(1, policy.limit // 10)
+
+    @staticmethod
+    def _key(name: str, identity: str, window: int) -> str:
+        return f"rate_limit:{name}:{identity}:{window}"
+
+    async def _sync(self, name: str, identity: str, policy: Policy, state: list):
+        window, pending = state[0], state[3]
+        # units arriving during the round-trip stay pending for the next sync
+        state[3] = 0
+        state[4] = time.monotonic()
+        key = self._key(name, identity, window)
+        ttl = 2 * policy.period
+        if state[1] is None:
+            # first sync of this key in this worker: read the previous window in the same request
+            try:
+                pipe = async_redis_client.pipeline()
+                pipe.eval(INCR_WITH_TTL_SCRIPT, keys=[key], args=[str(pending), str(ttl)])
+                pipe.get(self._key(name, identity, window - 1))
+                total, previous = await pipe.exec()
+                total = int(total)
+                if state[1] is None:
+                    state[1] = int(previous or 0)
+            except Exception as e:
+                print(f"Redis rate limit sync error: {e}")
+                total = None
+        else:
+            total = await async_redis_client.incr_with_ttl(key, pending, ttl)
+        if total is None:
+            state[3] += pending  # Redis unavailable: keep counting locally
+        else:
+            state[2] = max(state[2], total)
+
+    @staticmethod
+    def _estimate(policy: Policy, state: list, now: float) -> float:
+        overlap = 1.0 - (now % policy.period) / policy.period
+        return (state[1] or 0) * overlap + state[2] + state[3]
+
+    def _state_for(self, name: str, identity: str, window: int) -> Tuple[list, Optional[list]]:
+        """Local state of the current window, plus the state it replaced if that was the previous window."""
+        key = (name, identity)
+        state = self._state.get(key)
+        if state is not None and state[0] == window:
+            return state, None
+        if state is None and len(self._state) >= MAX_TRACKED_KEYS:
+            self._state = {k: st for k, st in self._state.items() if st[0] >= window - 1}
+        replaced = state if state is not None and state[0] == window - 1 else None
+        # previous window total: known locally after a rollover, otherwise read on the first sync
+        self._state[key] = [window, replaced[2] + replaced[3] if replaced else None, 0, 0, 0.0]
+        return self._state[key], replaced
+
+    async def hit(self, name: str, identity: str, cost: int = 1) -> Tuple[bool, int]:
+        """
+        Charge `cost` units of policy `name` to `identity`.
+        Returns (allowed, seconds until the request would fit).
+        """
+        policy = self.policies[name]
+        now = time.time()
+        window = int(now // policy.period)
+        state, replaced = self._state_for(name, identity, window)
+        if replaced is not None and replaced[3]:
+            # push the last units of the previous window; its total weighs on this one
+            await self._sync(name, identity, policy, replaced)
+            state[1] = max(state[1], replaced[2] + replaced[3])
+
+        if self._estimate(policy, state, now) + cost > policy.limit:
+            # other workers may have been counted since the last sync; only refuse on fresh data
+            if time.monotonic() - state[4] >= self.sync_interval:
+                await self._sync(name, identity, policy, state)
+            if self._estimate(policy, state, now) + cost > policy.limit:
+                return False, max(1, int(policy.period - now % policy.period))
+
+        state[3] += cost
+        if state[3] >= self._sync_threshold(policy) or time.monotonic() - state[4] >= self.sync_interval:
+            await self._sync(name, identity, policy, state)
+        return True, 0
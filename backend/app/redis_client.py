@@ -1,8 +1,18 @@
 import os
 from upstash_redis import Redis
-from typing import Any, Optional
+from upstash_redis.asyncio import Redis as AsyncRedis
+from typing import Any, List, Optional
 import json
 
+# INCRBY and set the TTL only if the key has none, in one atomic round-trip
+INCR_WITH_TTL_SCRIPT = """
+local n = redis.call('INCRBY', KEYS[1], ARGV[1])
+if redis.call('TTL', KEYS[1]) < 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return n
+"""
+
 class RedisClient:
     def __init__(self):
         self.redis = Redis(
@@ -67,17 +77,87 @@ class RedisClient:
             print(f"Redis expire error: {e}")
             return False
 
-    def scan(self, cursor: int, match: str) -> tuple:
-        """Scan keys matching pattern (simplified implementation)"""
+    def mget(self, *keys: str) -> list:
+        """Get several values in one round-trip (None for missing keys)"""
+        try:
+            values = self.redis.mget(*keys)
+            return [json.loads(v) if v else None for v in values]
+        except Exception as e:
+            print(f"Redis mget error: {e}")
+            return [None] * len(keys)
+
+class AsyncRedisClient:
+    """
+    Async counterpart of RedisClient for code running on the event loop.
+    The underlying client keeps one pooled HTTP connection to Upstash;
+    pipeline() batches commands into one request and incr_with_ttl() is
+    a single atomic script call.
+    """
+
+    def __init__(self):
+        self._redis: Optional[AsyncRedis] = None
+
+    @property
+    def redis(self) -> AsyncRedis:
+        if self._redis is None:
+            self._redis = AsyncRedis(
+                url=os.getenv("UPSTASH_REDIS_REST_URL"),
+                token=os.getenv("UPSTASH_REDIS_REST_TOKEN")
+            )
+        return self._redis
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Get value from Redis"""
+        try:
+            value = await self.redis.get(key)
+            return json.loads(value) if value else None
+        except Exception as e:
+            print(f"Redis get error: {e}")
+            return None
+
+    async def set(self, key: str, value: Any, ex: Optional[int] = None) -> bool:
+        """Set value in Redis with optional expiration in seconds"""
+        try:
+            await self.redis.set(key, json.dumps(value), ex=ex)
+            return True
+        except Exception as e:
+            print(f"Redis set error: {e}")
+            return False
+
+    async def mget(self, *keys: str) -> List[Optional[Any]]:
+        """Get several values in one round-trip (None for missing keys)"""
         try:
-            # Upstash Redis doesn't support SCAN command directly
-            # We'll use a workaround by getting all keys (if small dataset)
-            # or implement a different invalidation strategy
-            # For now, return empty results to avoid errors
-            return 0, []
+            values = await self.redis.mget(*keys)
+            return [json.loads(v) if v else None for v in values]
         except Exception as e:
-            print(f"Redis scan error: {e}")
-            return 0, []
+            print(f"Redis mget error: {e}")
+            return [None] * len(keys)
+
+    async def incr(self, key: str) -> int:
+        """Increment value in Redis"""
+        try:
+            return await self.redis.incr(key)
+        except Exception as e:
+            print(f"Redis incr error: {e}")
+            return 0
+
+    async def incr_with_ttl(self, key: str, amount: int = 1, ttl: int = 60) -> Optional[int]:
+        """Add `amount` to a counter and give it a TTL if it has none; None on failure"""
+        try:
+            return int(await self.redis.eval(INCR_WITH_TTL_SCRIPT, keys=[key], args=[str(amount), str(ttl)]))
+        except Exception as e:
+            print(f"Redis incr error: {e}")
+            return None
+
+    def pipeline(self):
+        """Commands queued on the pipeline are sent in one request by `await pipeline.exec()`"""
+        return self.redis.pipeline()
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
 
-# Global instance
+# Global instances
 redis_client = RedisClient()
+async_redis_client = AsyncRedisClient()
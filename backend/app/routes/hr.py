@@ -25,7 +25,7 @@ def create_job(job: JobCreate, current=Depends(require_hr_role)):
         if response.data and len(response.data) > 0:
             created_job = response.data[0]
             # Invalidate cache for jobs-related endpoints
-            invalidate_cache("hr_employees")  # Since jobs might affect employee listings
+            invalidate_cache("job_postings")
             return JobResponse(
                 id=created_job['id'],
                 title=created_job['title'],
@@ -55,9 +55,8 @@ def create_department(dept: DepartmentCreate, current=Depends(require_hr_role)):
         response = supabase.table('departments').insert(data).execute()
         if response.data and len(response.data) > 0:
             created_dept = response.data[0]
-            # Invalidate cache for employee-related endpoints since departments affect employee data
-            invalidate_cache("hr_employees")
-            invalidate_cache("hr_employee_profile")
+            # Invalidate cache for department listings and employee profiles (they embed department names)
+            invalidate_cache("departments")
             return DepartmentResponse(
                 id=created_dept['id'],
                 name=created_dept['name'],
@@ -79,7 +78,7 @@ def update_job(job_id: str, job: Job, current=Depends(require_hr_role)):
         if not response.data:
             raise HTTPException(status_code=404, detail="Job not found")
         # Invalidate cache for jobs-related endpoints
-        invalidate_cache("hr_employees")  # Since job updates might affect employee listings
+        invalidate_cache("job_postings")
         return response.data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -93,7 +92,7 @@ def create_company(company: CompanyCreate, current=Depends(require_hr_role)):
         if response.data and len(response.data) > 0:
             created_company = response.data[0]
             # Invalidate cache for company-related endpoints
-            invalidate_cache("hr_companies")
+            invalidate_cache("companies")
             return CompanyResponse(**created_company)
         else:
             raise HTTPException(status_code=400, detail="Failed to create company")
@@ -101,7 +100,7 @@ def create_company(company: CompanyCreate, current=Depends(require_hr_role)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/companies", response_model=list[CompanyResponse])
-@cached_endpoint("hr_companies")
+@cached_endpoint("hr_companies", tags=("companies",))
 def get_companies(current=Depends(require_hr_role)):
     try:
         response = supabase.table('companies').select('*').execute()
@@ -143,8 +142,7 @@ def add_employee_to_company(company_id: str, employee: EmployeeCreate, current=D
         if response.data and len(response.data) > 0:
             created_employee = response.data[0]
             # Invalidate cache for employee-related endpoints
-            invalidate_cache("hr_employees")
-            invalidate_cache("hr_employee_profile")
+            invalidate_cache("employees")
             return EmployeeResponse(**created_employee)
         else:
             raise HTTPException(status_code=400, detail="Failed to create employee")
@@ -157,7 +155,7 @@ def add_employee_to_company(company_id: str, employee: EmployeeCreate, current=D
 
 # All employees of a company
 @router.get("/companies/{company_id}/employees", response_model=list[EmployeeResponse])
-@cached_endpoint("hr_employees")
+@cached_endpoint("hr_employees", tags=("employees", "companies"))
 def get_employees_by_company(company_id: str, current=Depends(require_hr_role)):
     try:
         # First verify company exists
@@ -175,7 +173,7 @@ def get_employees_by_company(company_id: str, current=Depends(require_hr_role)):
         raise HTTPException(status_code=500, detail=f"Failed to fetch employees: {str(e)}")
 
 @router.get("/employees", response_model=list[EmployeeResponse])
-@cached_endpoint("hr_employees")
+@cached_endpoint("hr_employees", tags=("employees", "companies"))
 def get_employees_by_hr_company(current=Depends(require_hr_role)):
     try:
         # Get HR user's company_id from user metadata or profile
@@ -202,7 +200,7 @@ def get_employees_by_hr_company(current=Depends(require_hr_role)):
 
 # Employee info my Employee id 
 @router.get("/employees/{employee_id}", response_model=EmployeeResponse)
-@cached_endpoint("hr_employee_profile")
+@cached_endpoint("hr_employee_profile", tags=("employees", "departments"))
 def get_employee_profile(employee_id: str, current=Depends(require_hr_role)):
     try:
         # Get HR user's company_id from user metadata
@@ -240,7 +238,7 @@ def get_employee_profile(employee_id: str, current=Depends(require_hr_role)):
 
 
 @router.get("/departments", response_model=list[DepartmentResponse])
-@cached_endpoint("hr_departments")
+@cached_endpoint("hr_departments", tags=("departments",))
 def get_departments(company_id: str = None, current=Depends(require_hr_role)):
     try:
         query = supabase.table('departments').select('*')
@@ -256,7 +254,7 @@ def get_departments(company_id: str = None, current=Depends(require_hr_role)):
 
 # Applications Management Endpoints
 @router.get("/applications", response_model=List[JobApplicationResponse])
-@cached_endpoint("hr_applications")
+@cached_endpoint("hr_applications", tags=("applications", "job_postings"))
 def get_applications(
     status: Optional[str] = None,
     job_id: Optional[str] = None,
@@ -329,7 +327,7 @@ def update_application_status(
             raise HTTPException(status_code=403, detail="Access denied. You can only update applications for jobs you created.")
 
         # Invalidate cache
-        invalidate_cache("hr_applications")
+        invalidate_cache("applications")
 
         return {"message": "Application status updated successfully", "application": response.data[0]}
     except HTTPException:
@@ -339,7 +337,7 @@ def update_application_status(
 
 
 @router.get("/companies/{company_id}/jobs", response_model=List[JobResponse])
-@cached_endpoint("hr_company_jobs")
+@cached_endpoint("hr_company_jobs", tags=("job_postings", "companies"))
 def get_jobs_by_company(company_id: str, current=Depends(require_hr_role)):
     try:
         # First verify company exists
@@ -394,7 +392,7 @@ def create_application(application: HRJobApplicationCreate, current=Depends(requ
 
         created_application = response.data[0]
         # Invalidate cache
-        invalidate_cache("hr_applications")
+        invalidate_cache("applications")
 
         return JobApplicationResponse(**created_application)
 
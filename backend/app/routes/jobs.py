@@ -4,7 +4,7 @@ from app.supabase_client import supabase
 from app.schemas.job import Job
 from app.schemas.hr import JobResponse
 from app.schemas.application import JobApplicationCreate, JobApplicationResponse
-from app.decorators import cached_endpoint
+from app.decorators import cached_endpoint, invalidate_cache
 from typing import List
 
 security = HTTPBearer()
@@ -14,7 +14,7 @@ router = APIRouter(prefix="/jobs", tags=["jobs"])
 
 # Get all Jobs
 @router.get("/", response_model=List[JobResponse])
-@cached_endpoint("open_jobs", ttl=300)
+@cached_endpoint("open_jobs", tags=("job_postings",))
 def get_open_jobs(page: int = 1, limit: int = 10):
     try:
         # Fetch from database
@@ -28,7 +28,7 @@ def get_open_jobs(page: int = 1, limit: int = 10):
 
 # Get Job By JobId
 @router.get("/{job_id}")
-@cached_endpoint("job_details", ttl=300)
+@cached_endpoint("job_details", tags=("job_postings",))
 def get_job_details(job_id: str):
     try:
         # Fetch from database
@@ -104,6 +104,8 @@ def apply_for_job(
             raise HTTPException(status_code=500, detail="Failed to submit application")
 
         created_application = response.data[0]
+        # Invalidate cache
+        invalidate_cache("applications")
         return JobApplicationResponse(**created_application)
 
     except HTTPException:
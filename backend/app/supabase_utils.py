@@ -0,0 +1,56 @@
+# backend/app/supabase_utils.py
+"""
+Paged and batched reads through the Supabase client, shared by the payroll
+and performance packages. PostgREST caps the rows of one response
+(PAGE_SIZE) and long `in_` lists make URLs too long (IN_FILTER_SIZE).
+"""
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+PAGE_SIZE = 1000
+IN_FILTER_SIZE = 150
+
+
+def _data(res: Any):
+    return getattr(res, "data", None) if res is not None else None
+
+
+def fetch_paged(build_query, page_size: int = PAGE_SIZE) -> List[Dict[str, Any]]:
+    """
+    Run `build_query()` (a zero-arg function returning a fresh, ordered
+    select builder) page by page with `.range()` until a short page comes back.
+    """
+    rows: List[Dict[str, Any]] = []
+    offset = 0
+    while True:
+        data = _data(build_query().range(offset, offset + page_size - 1).execute()) or []
+        rows.extend(data)
+        if len(data) < page_size:
+            return rows
+        offset += page_size
+
+
+def fetch_in(table: str, column: str, values, columns: str = "*", order: Union[str, Sequence[str]] = "id",
+             filters: Optional[List[tuple]] = None) -> List[Dict[str, Any]]:
+    """
+    All rows of `table` whose `column` is in `values`, a few `in_` queries at
+    a time instead of one query per value. `filters` are extra
+    (column, op, value) predicates, e.g. ("day", "gte", "2025-01-01") or
+    (None, "or", "is_paid.eq.false,..."). `order` must be unique per row
+    (pages are read by offset); pass several columns for a composite key.
+    """
+    from app.supabase_client import supabase
+
+    def _query(part):
+        q = supabase.table(table).select(columns).in_(column, part)
+        for col, op, val in filters or []:
+            q = q.or_(val) if op == "or" else getattr(q, op)(col, val)
+        for col in ([order] if isinstance(order, str) else order):
+            q = q.order(col)
+        return q
+
+    values = [v for v in dict.fromkeys(values) if v is not None]
+    rows: List[Dict[str, Any]] = []
+    for i in range(0, len(values), IN_FILTER_SIZE):
+        part = values[i:i + IN_FILTER_SIZE]
+        rows.extend(fetch_paged(lambda: _query(part)))
+    return rows
@@ -0,0 +1,423 @@
+# backend/scripts/bench/fake_supabase.py
+"""
+In-memory stand-in for the Supabase client, for benchmarks.
+
+Implements the subset of the postgrest-py query builder the backend uses
+(select/insert/upsert/update/delete, eq/neq/gt/gte/lt/lte/is_/in_/or_,
+order/limit/range/single/maybe_single) over dict rows with lazily built
+hash indexes, so 100k-row tables stay fast. Every execute() counts as one
+round-trip and can sleep a configurable latency.
+
+install() registers the fake as `app.supabase_client.supabase`; it must run
+before any `app.*` module is imported.
+"""
+import sys
+import time
+import types
+from collections import Counter
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class APIError(Exception):
+    """Mirrors postgrest.exceptions.APIError closely enough for the callers."""
+
+    def __init__(self, message: str, code: Optional[str] = None):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+class FakeResponse:
+    def __init__(self, data, status_code: int = 200, count: Optional[int] = None):
+        self.data = data
+        self.status_code = status_code
+        self.count = count
+
+
+def _key(v):
+    """Normalised value used for equality and hash indexes ('5' matches 5)."""
+    if v is None:
+        return None
+    if isinstance(v, bool):
+        return 'true' if v else 'false'
+    if isinstance(v, (date, datetime)):
+        return v.isoformat()
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v)
+
+
+def _cmp_pair(stored, given):
+    if isinstance(stored, (int, float)) and not isinstance(stored, bool):
+        try:
+            return stored, float(given)
+        except (TypeError, ValueError):
+            pass
+    return _key(stored), _key(given)
+
+
+def _compare(op: str, stored, given):
+    """Three-valued SQL comparison: None when `stored` is NULL."""
+    if op == 'is':
+        g = _key(given)
+        if g in (None, 'null'):
+            return stored is None
+        return stored is (g == 'true')
+    if stored is None:
+        return None
+    if op == 'eq':
+        return _key(stored) == _key(given)
+    if op == 'neq':
+        return _key(stored) != _key(given)
+    if op == 'in':
+        return _key(stored) in given
+    a, b = _cmp_pair(stored, given)
+    if op == 'gt':
+        return a > b
+    if op == 'gte':
+        return a >= b
+    if op == 'lt':
+        return a < b
+    if op == 'lte':
+        return a <= b
+    raise APIError(f'operator {op} not supported by the fake', 'FAKE')
+
+
+# -------------------------
+# PostgREST logic-tree parsing (or_ / and(...))
+# -------------------------
+def _split_top(s: str) -> List[str]:
+    parts, depth, quoted, cur = [], 0, False, []
+    for ch in s:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == '(':
+            depth += 1
+        elif not quoted and ch == ')':
+            depth -= 1
+        if ch == ',' and depth == 0 and not quoted:
+            parts.append(''.join(cur))
+            cur = []
+        else:
+            cur.append(ch)
+    if cur:
+        parts.append(''.join(cur))
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _unquote(v: str) -> str:
+    return v[1:-1] if len(v) >= 2 and v[0] == v[-1] == '"' else v
+
+
+def _parse_condition(expr: str) -> Callable[[Dict[str, Any]], Optional[bool]]:
+    negate = False
+    if expr.startswith('not.'):
+        negate, expr = True, expr[4:]
+    for logic in ('and', 'or'):
+        if expr.startswith(logic + '(') and expr.endswith(')'):
+            inner = _parse_logic(logic, expr[len(logic) + 1:-1])
+            return (lambda r: _not(inner(r))) if negate else inner
+    col, rest = expr.split('.', 1)
+    if rest.startswith('not.'):
+        negate, rest = not negate, rest[4:]
+    op, value = rest.split('.', 1)
+    given: Any = value
+    if op == 'in':
+        given = {_key(_unquote(v)) for v in _split_top(value.strip()[1:-1])}
+    else:
+        given = _unquote(value)
+    pred = lambda r: _compare(op, r.get(col), given)
+    return (lambda r: _not(pred(r))) if negate else pred
+
+
+def _not(v):
+    return None if v is None else not v
+
+
+def _parse_logic(logic: str, body: str) -> Callable[[Dict[str, Any]], Optional[bool]]:
+    conds = [_parse_condition(p) for p in _split_top(body)]
+
+    def _eval(r):
+        vals = [c(r) for c in conds]
+        if logic == 'or':
+            return True if any(v is True for v in vals) else (None if any(v is None for v in vals) else False)
+        return False if any(v is False for v in vals) else (None if any(v is None for v in vals) else True)
+    return _eval
+
+
+# -------------------------
+# Tables and query builder
+# -------------------------
+class FakeTable:
+    def __init__(self, name: str):
+        self.name = name
+        self.rows: Dict[Any, Dict[str, Any]] = {}
+        self.next_id = 1
+        self._indexes: Dict[Tuple[str, ...], Dict[tuple, List[Any]]] = {}
+
+    def index(self, cols: Tuple[str, ...]) -> Dict[tuple, List[Any]]:
+        idx = self._indexes.get(cols)
+        if idx is None:
+            idx = {}
+            for pk, r in self.rows.items():
+                idx.setdefault(tuple(_key(r.get(c)) for c in cols), []).append(pk)
+            self._indexes[cols] = idx
+        return idx
+
+    def insert(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        row = dict(row)
+        if row.get('id') is None:
+            row['id'] = self.next_id
+            self.next_id += 1
+        elif isinstance(row['id'], int) and row['id'] >= self.next_id:
+            self.next_id = row['id'] + 1
+        if row['id'] in self.rows:
+            raise APIError(f'duplicate key value violates unique constraint "{self.name}_pkey"', '23505')
+        self.rows[row['id']] = row
+        for cols, idx in self._indexes.items():
+            idx.setdefault(tuple(_key(row.get(c)) for c in cols), []).append(row['id'])
+        return row
+
+    def update(self, row: Dict[str, Any], values: Dict[str, Any]):
+        changed = {k for k, v in values.items() if _key(row.get(k)) != _key(v)}
+        row.update(values)
+        for cols in [c for c in self._indexes if changed & set(c)]:
+            del self._indexes[cols]
+
+    def delete(self, pks: List[Any]):
+        for pk in pks:
+            self.rows.pop(pk, None)
+        self._indexes.clear()
+
+
+class FakeQuery:
+    def __init__(self, client: 'FakeSupabase', table: str):
+        self.client = client
+        self.table = client._table(table)
+        self.op = 'select'
+        self.columns = '*'
+        self.count_mode = None
+        self.payload: Any = None
+        self.on_conflict: Optional[List[str]] = None
+        self.ignore_duplicates = False
+        self.filters: List[Tuple[str, str, Any]] = []
+        self.predicates: List[Callable] = []
+        self.orders: List[Tuple[str, bool]] = []
+        self._limit: Optional[int] = None
+        self._range: Optional[Tuple[int, int]] = None
+        self._single: Optional[str] = None
+
+    # --- statements ---
+    def select(self, *columns, count=None, **kwargs):
+        self.columns = ','.join(columns) if columns else '*'
+        self.count_mode = count
+        return self
+
+    def insert(self, payload, **kwargs):
+        self.op, self.payload = 'insert', payload
+        return self
+
+    def upsert(self, payload, on_conflict=None, ignore_duplicates=False, **kwargs):
+        self.op, self.payload = 'upsert', payload
+        if isinstance(on_conflict, str):
+            on_conflict = [c.strip() for c in on_conflict.split(',') if c.strip()]
+        self.on_conflict = list(on_conflict or ['id'])
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, payload, **kwargs):
+        self.op, self.payload = 'update', payload
+        return self
+
+    def delete(self, **kwargs):
+        self.op = 'delete'
+        return self
+
+    # --- filters ---
+    def _filter(self, col, op, value):
+        self.filters.append((col, op, value))
+        return self
+
+    def eq(self, col, value):
+        return self._filter(col, 'eq', value)
+
+    def neq(self, col, value):
+        return self._filter(col, 'neq', value)
+
+    def gt(self, col, value):
+        return self._filter(col, 'gt', value)
+
+    def gte(self, col, value):
+        return self._filter(col, 'gte', value)
+
+    def lt(self, col, value):
+        return self._filter(col, 'lt', value)
+
+    def lte(self, col, value):
+        return self._filter(col, 'lte', value)
+
+    def is_(self, col, value):
+        return self._filter(col, 'is', value)
+
+    def in_(self, col, values):
+        return self._filter(col, 'in', {_key(v) for v in values})
+
+    def or_(self, filters: str, **kwargs):
+        self.predicates.append(_parse_logic('or', filters))
+        return self
+
+    # --- modifiers ---
+    def order(self, column, desc=False, **kwargs):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, n, **kwargs):
+        self._limit = n
+        return self
+
+    def range(self, start, end, **kwargs):
+        self._range = (start, end)
+        return self
+
+    def single(self):
+        self._single = 'single'
+        return self
+
+    def maybe_single(self):
+        self._single = 'maybe'
+        return self
+
+    # --- execution ---
+    def _candidates(self) -> List[Dict[str, Any]]:
+        t = self.table
+        pks = None
+        for col, op, value in self.filters:
+            if op == 'eq':
+                pks = t.index((col,)).get((_key(value),), [])
+                break
+            if op == 'in':
+                idx = t.index((col,))
+                pks = [pk for v in value for pk in idx.get((v,), [])]
+                break
+        rows = t.rows.values() if pks is None else [t.rows[pk] for pk in pks if pk in t.rows]
+        out = []
+        for r in rows:
+            if all(_compare(op, r.get(col), value) is True for col, op, value in self.filters) \
+                    and all(p(r) is True for p in self.predicates):
+                out.append(r)
+        return out
+
+    def _project(self, r: Dict[str, Any]) -> Dict[str, Any]:
+        cols = [c.strip() for c in self.columns.split(',')]
+        if '*' in cols:
+            return dict(r)
+        # embedded resources (`rel(col)`) are not modelled
+        return {c: r.get(c) for c in cols if c and '(' not in c}
+
+    def _select(self):
+        rows = self._candidates()
+        count = len(rows) if self.count_mode else None
+        for col, desc in reversed(self.orders):
+            # PostgreSQL default: NULLS LAST ascending, NULLS FIRST descending
+            present = [r for r in rows if r.get(col) is not None]
+            nulls = [r for r in rows if r.get(col) is None]
+            present.sort(key=lambda r: r.get(col), reverse=desc)
+            rows = nulls + present if desc else present + nulls
+        if self._range:
+            rows = rows[self._range[0]:self._range[1] + 1]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        data = [self._project(r) for r in rows]
+        if self._single:
+            if len(data) > 1 or (self._single == 'single' and not data):
+                raise APIError('JSON object requested, multiple (or no) rows returned', 'PGRST116')
+            return FakeResponse(data[0] if data else None, 200, count)
+        return FakeResponse(data, 200, count)
+
+    def _write(self):
+        t = self.table
+        payload = self.payload if isinstance(self.payload, list) else [self.payload]
+        out = []
+        if self.op == 'insert':
+            out = [t.insert(p) for p in payload]
+        elif self.op == 'upsert':
+            keys = tuple(self.on_conflict)
+            if len({tuple(_key(p.get(k)) for k in keys) for p in payload}) < len(payload):
+                raise APIError('ON CONFLICT DO UPDATE command cannot affect row a second time', '21000')
+            idx = t.index(keys)
+            for p in payload:
+                hit = [pk for pk in idx.get(tuple(_key(p.get(k)) for k in keys), []) if pk in t.rows]
+                if hit and self.ignore_duplicates:
+                    continue  # ON CONFLICT DO NOTHING returns only inserted rows
+                if hit:
+                    row = t.rows[hit[0]]
+                    t.update(row, p)
+                    out.append(row)
+                else:
+                    out.append(t.insert(p))
+        elif self.op == 'update':
+            rows = self._candidates()
+            for r in rows:
+                t.update(r, self.payload)
+            out = rows
+        elif self.op == 'delete':
+            out = self._candidates()
+            t.delete([r['id'] for r in out])
+        return FakeResponse([dict(r) for r in out], 201 if self.op in ('insert', 'upsert') else 200)
+
+    def execute(self):
+        c = self.client
+        c.round_trips += 1
+        c.by_table[(self.table.name, self.op)] += 1
+        res = self._select() if self.op == 'select' else self._write()
+        rows = len(res.data) if isinstance(res.data, list) else int(res.data is not None)
+        c.rows_transferred += rows + (len(self.payload) if isinstance(self.payload, list) else int(self.payload is not None))
+        if c.latency_ms or c.per_row_us:
+            time.sleep(c.latency_ms / 1000.0 + rows * c.per_row_us / 1e6)
+        return res
+
+
+class FakeSupabase:
+    """Client object exposing `.table(name)` like supabase.Client."""
+
+    def __init__(self, latency_ms: float = 0.0, per_row_us: float = 0.0):
+        self.latency_ms = latency_ms
+        self.per_row_us = per_row_us
+        self.tables: Dict[str, FakeTable] = {}
+        self.round_trips = 0
+        self.rows_transferred = 0
+        self.by_table: Counter = Counter()
+
+    def _table(self, name: str) -> FakeTable:
+        t = self.tables.get(name)
+        if t is None:
+            t = self.tables[name] = FakeTable(name)
+        return t
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    from_ = table
+
+    def load(self, name: str, rows: List[Dict[str, Any]]):
+        t = self._table(name)
+        for r in rows:
+            t.insert(r)
+
+    def reset_counters(self):
+        self.round_trips = 0
+        self.rows_transferred = 0
+        self.by_table = Counter()
+
+
+def install(latency_ms: float = 0.0, per_row_us: float = 0.0) -> FakeSupabase:
+    """Register a fresh fake as `app.supabase_client.supabase` and return it."""
+    if 'app.supabase_client' in sys.modules and not getattr(sys.modules['app.supabase_client'], '_fake', False):
+        raise RuntimeError('app.supabase_client was imported before the fake was installed')
+    fake = FakeSupabase(latency_ms, per_row_us)
+    mod = types.ModuleType('app.supabase_client')
+    mod.supabase = fake
+    mod._fake = True
+    sys.modules['app.supabase_client'] = mod
+    return fake
@@ -0,0 +1,131 @@
+# backend/scripts/bench/synthetic.py
+"""
+Synthetic payroll data for benchmarks: companies, grades, a component
+catalog with PERCENT_OF and FORMULA chains, tax regimes, PT rules,
+employees with CTC history, overrides and long bonus histories.
+Deterministic for a given (employees, seed).
+"""
+import random
+from datetime import date
+from typing import Any, Dict, List
+
+PERIOD_ID = 1
+PERIOD_START = date(2026, 3, 1)
+PERIOD_END = date(2026, 3, 31)
+
+STATES = ['KA', 'MH', 'TN', 'WB', 'DL', None]
+
+COMPONENTS = [
+    # code, type, method, value, base, taxable, ordering
+    ('BASIC', 'EARNING', 'PERCENT_OF', '40', None, True, 1),
+    ('HRA', 'EARNING', 'PERCENT_OF', '50', 'BASIC', True, 2),
+    ('DA', 'EARNING', 'FORMULA', 'BASIC * 0.1', None, True, 3),
+    ('CONVEYANCE', 'EARNING', 'FIXED', '1600', None, False, 4),
+    ('LTA', 'EARNING', 'FORMULA', '(BASIC + DA) / 12', None, False, 5),
+    ('EPF_ER', 'EMPLOYER_CONTRIBUTION', 'PERCENT_OF', '12', 'BASIC', True, 20),
+    ('GRATUITY', 'EMPLOYER_CONTRIBUTION', 'PERCENT_OF', '4.81', 'BASIC', True, 21),
+    ('SPECIAL', 'EARNING', 'FORMULA', 'MONTHLY_CTC - BASIC - HRA - DA - CONVEYANCE - LTA - EPF_ER - GRATUITY', None, True, 9),
+    ('PF', 'DEDUCTION', 'PERCENT_OF', '12', 'BASIC', True, 30),
+    ('LWF', 'DEDUCTION', 'FIXED', '25', None, True, 31),
+]
+
+SLABS = {
+    'new': [(0, 400000, 0), (400000, 800000, 5), (800000, 1200000, 10), (1200000, 1600000, 15),
+            (1600000, 2000000, 20), (2000000, 2400000, 25), (2400000, None, 30)],
+    'old': [(0, 250000, 0), (250000, 500000, 5), (500000, 1000000, 20), (1000000, None, 30)],
+}
+
+PT_RULES = {
+    'KA': [(0, 24999, 0), (25000, None, 200)],
+    'MH': [(0, 7500, 0), (7501, 10000, 175), (10001, None, 200)],
+    'TN': [(0, 21000, 0), (21001, 30000, 135), (30001, 45000, 315), (45001, 60000, 690), (60001, 75000, 1025), (75001, None, 1250)],
+    'WB': [(0, 10000, 0), (10001, 15000, 110), (15001, 25000, 130), (25001, 40000, 150), (40001, None, 200)],
+}
+
+
+def _uuid(prefix: int, i: int) -> str:
+    return f'{prefix:08x}-0000-4000-8000-{i:012x}'
+
+
+def generate(employees: int, seed: int = 0) -> Dict[str, List[Dict[str, Any]]]:
+    rnd = random.Random(seed)
+    t: Dict[str, List[Dict[str, Any]]] = {}
+
+    n_companies = max(1, employees // 5000)
+    t['companies'] = [{'id': _uuid(1, c), 'name': f'Company {c}'} for c in range(n_companies)]
+    t['payroll_periods'] = [{'id': PERIOD_ID, 'period_start': PERIOD_START.isoformat(),
+                             'period_end': PERIOD_END.isoformat(), 'status': 'OPEN'}]
+    t['salary_components'] = [
+        {'id': i + 1, 'code': code, 'name': code.title(), 'type': typ, 'calc_method': method, 'calc_value': value,
+         'base_component_code': base, 'is_taxable': taxable, 'ordering': ordering}
+        for i, (code, typ, method, value, base, taxable, ordering) in enumerate(COMPONENTS)
+    ]
+    t['tax_regimes'] = [{'id': i + 1, 'name': name} for i, name in enumerate(SLABS)]
+    t['tax_slabs'] = [
+        {'id': None, 'tax_regime_id': i + 1, 'from_amount': frm, 'to_amount': to, 'rate_percent': rate}
+        for i, name in enumerate(SLABS) for frm, to, rate in SLABS[name]
+    ]
+    t['professional_tax_rules'] = [
+        {'id': None, 'state_code': st, 'min_monthly_salary': lo, 'max_monthly_salary': hi, 'monthly_amount': amt}
+        for st, bands in PT_RULES.items() for lo, hi, amt in bands
+    ]
+    t['employee_grades'] = [
+        {'id': g + 1, 'company_id': _uuid(1, c), 'name': f'G{g % 20 + 1}',
+         'annual_ctc': round(300000 * (1.18 ** (g % 20)), -3)}
+        for c in range(n_companies) for g in range(c * 20, c * 20 + 20)
+    ]
+
+    emps, assigns, overrides, bonuses = [], [], [], []
+    for i in range(employees):
+        eid = _uuid(2, i)
+        company = i % n_companies
+        emps.append({'id': eid, 'company_id': _uuid(1, company), 'first_name': f'Emp{i}', 'last_name': 'Bench',
+                     'email': f'emp{i}@bench.local', 'is_active': rnd.random() < 0.97,
+                     'work_state': rnd.choice(STATES)})
+        # CTC history: older grade assignments, the latest sometimes a custom CTC
+        years = rnd.randint(1, 4)
+        for y in range(years):
+            latest = y == years - 1
+            row = {'id': None, 'employee_id': eid, 'effective_from': date(2026 - years + y, 4, 1).isoformat(),
+                   'grade_id': company * 20 + rnd.randint(1, 20)}
+            if latest and rnd.random() < 0.2:
+                row['custom_annual_ctc'] = round(rnd.uniform(250000, 6000000), 2)
+            assigns.append(row)
+        if rnd.random() < 0.1:
+            overrides.append({'id': None, 'employee_id': eid, 'component_id': 1,
+                              'value_override': str(rnd.choice([35, 45, 50]))})
+        # long-tenured employees accumulate expired monthly bonuses and paid one-time rows
+        for k in range(rnd.choice([0, 0, 1, 2, 6, 24])):
+            start = date(2024 + k // 12, k % 12 + 1, 1)
+            bonuses.append({'id': None, 'employee_id': eid, 'code': 'RETENTION', 'bonus_type': 'RECURRING_MONTHLY',
+                            'amount': 1500, 'is_percentage': False, 'effective_from': start.isoformat(),
+                            'effective_to': start.replace(day=28).isoformat(), 'is_paid': True})
+        r = rnd.random()
+        if r < 0.15:
+            bonuses.append({'id': None, 'employee_id': eid, 'code': 'SPOT', 'bonus_type': 'ONE_TIME',
+                            'amount': rnd.choice([2500, 5000, 10000]), 'is_percentage': False,
+                            'effective_from': date(2026, 3, rnd.randint(1, 28)).isoformat(), 'is_paid': False})
+        elif r < 0.25:
+            bonuses.append({'id': None, 'employee_id': eid, 'code': 'SHIFT', 'bonus_type': 'RECURRING_MONTHLY',
+                            'amount': 10, 'is_percentage': True, 'percent_of_component': 'BASIC',
+                            'effective_from': '2025-01-01', 'effective_to': None, 'is_paid': False})
+        elif r < 0.30:
+            bonuses.append({'id': None, 'employee_id': eid, 'code': 'ANNUAL', 'bonus_type': 'RECURRING_YEARLY',
+                            'amount': 8.33, 'is_percentage': True, 'percent_of_component': 'BASIC',
+                            'effective_from': '2024-03-15', 'effective_to': None, 'is_paid': False})
+    t['employees'] = emps
+    t['employee_salary_assignments'] = assigns
+    t['employee_salary_components'] = overrides
+    t['employee_bonuses'] = bonuses
+    t['payroll'] = []
+    t['payroll_runs'] = []
+    return t
+
+
+def populate(fake, employees: int, seed: int = 0) -> Dict[str, int]:
+    """Load a generated company set into a FakeSupabase; returns row counts."""
+    counts = {}
+    for name, rows in generate(employees, seed).items():
+        fake.load(name, rows)
+        counts[name] = len(rows)
+    return counts
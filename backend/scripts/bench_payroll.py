@@ -0,0 +1,151 @@
+# backend/scripts/bench_payroll.py
+"""
+Payroll throughput benchmark against an in-memory Supabase stand-in
+(scripts/bench/fake_supabase.py); no live project needed.
+
+For every workforce size it generates a synthetic company set and measures
+payslips/sec, round-trips per payslip and peak RSS of:
+
+  compute_payslip           per-employee preview (sample of --sample employees)
+  persist_payslip           per-payslip upsert (same sample)
+  persist_payslips_bulk     chunked upsert of every payslip
+  run_payroll_for_period    full bulk run on an empty payroll table
+  run_payroll_rerun         incremental re-run (fingerprints unchanged)
+
+Each (size, benchmark) runs in its own process so peak RSS is not shared.
+
+Usage:
+  cd backend
+  python -m scripts.bench_payroll --sizes 1000 10000 100000 --latency-ms 2
+  python -m scripts.bench_payroll --sizes 1000 --json bench.json
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+BENCHMARKS = ('compute_payslip', 'persist_payslip', 'persist_payslips_bulk',
+              'run_payroll_for_period', 'run_payroll_rerun')
+
+
+def _peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024, 1)
+
+
+def run_one(bench: str, size: int, latency_ms: float, per_row_us: float, sample: int, seed: int) -> dict:
+    """Run a single benchmark in this process and return its measurements."""
+    from scripts.bench import fake_supabase, synthetic
+    fake = fake_supabase.install(latency_ms, per_row_us)
+    counts = synthetic.populate(fake, size, seed)
+    # imported after install(): services binds the client at import time
+    from app.payroll import services
+
+    rss_loaded = _peak_rss_mb()
+    emps = [e for e in fake.tables['employees'].rows.values() if e.get('is_active')]
+    picked = emps[:min(sample, len(emps))]
+    pid = synthetic.PERIOD_ID
+
+    def _timed(fn):
+        fake.reset_counters()
+        t0 = time.perf_counter()
+        n = fn()
+        return n, time.perf_counter() - t0
+
+    if bench == 'compute_payslip':
+        # warm-up outside the timing: reference-data cache and the fake's lookup indexes
+        services.compute_payslip(emps[-1]['id'], pid, {}, 'new')
+        n, elapsed = _timed(lambda: len([services.compute_payslip(e['id'], pid, {}, 'new') for e in picked]))
+    elif bench in ('persist_payslip', 'persist_payslips_bulk'):
+        ctx = services.load_payroll_context(pid)
+        targets = picked if bench == 'persist_payslip' else emps
+        payslips = []
+        for i in range(0, len(targets), services.PAYROLL_CHUNK_SIZE):
+            part = targets[i:i + services.PAYROLL_CHUNK_SIZE]
+            inputs = services.load_employee_inputs([e['id'] for e in part], ctx['period_start'], ctx['period_end'])
+            payslips.extend(services.compute_payslip_from_context(e, ctx, inputs) for e in part)
+        if bench == 'persist_payslip':
+            n, elapsed = _timed(lambda: len([services.persist_payslip(ps) for ps in payslips]))
+        else:
+            n, elapsed = _timed(lambda: sum(r['success'] for r in services.persist_payslips_bulk(payslips)))
+    elif bench == 'run_payroll_for_period':
+        n, elapsed = _timed(lambda: services.run_payroll_for_period(pid, run_by='bench')['succeeded'])
+    elif bench == 'run_payroll_rerun':
+        services.run_payroll_for_period(pid, run_by='bench')
+        res, elapsed = _timed(lambda: services.run_payroll_for_period(pid, run_by='bench'))
+        n = res['succeeded'] + res['skipped']
+    else:
+        raise SystemExit(f'unknown benchmark {bench}')
+
+    return {
+        'benchmark': bench,
+        'employees': size,
+        'active_employees': len(emps),
+        'payslips': n,
+        'seconds': round(elapsed, 3),
+        'payslips_per_sec': round(n / elapsed, 1) if elapsed > 0 else None,
+        'round_trips': fake.round_trips,
+        'round_trips_per_payslip': round(fake.round_trips / n, 3) if n else None,
+        'rows_transferred': fake.rows_transferred,
+        'peak_rss_mb': _peak_rss_mb(),
+        'rss_after_load_mb': rss_loaded,
+        'latency_ms': latency_ms,
+        'rows': counts,
+    }
+
+
+def _run_isolated(bench: str, size: int, args) -> dict:
+    cmd = [sys.executable, '-m', 'scripts.bench_payroll', '--worker', bench, '--sizes', str(size),
+           '--latency-ms', str(args.latency_ms), '--per-row-us', str(args.per_row_us),
+           '--sample', str(args.sample), '--seed', str(args.seed)]
+    out = subprocess.run(cmd, capture_output=True, text=True, cwd=os.getcwd())
+    if out.returncode != 0:
+        return {'benchmark': bench, 'employees': size, 'error': out.stderr.strip().splitlines()[-1:] or ['failed']}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _print_table(results):
+    cols = ('benchmark', 'employees', 'payslips', 'seconds', 'payslips_per_sec', 'round_trips_per_payslip', 'peak_rss_mb')
+    widths = [max([len(c)] + [len(str(r.get(c))) for r in results]) for c in cols]
+    print('  '.join(c.ljust(w) for c, w in zip(cols, widths)))
+    for r in results:
+        if 'error' in r:
+            print(f"{r['benchmark']:<{widths[0]}}  {r['employees']:<{widths[1]}}  ERROR {r['error']}")
+            continue
+        print('  '.join(str(r.get(c)).ljust(w) for c, w in zip(cols, widths)))
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    p.add_argument('--benchmarks', nargs='+', choices=BENCHMARKS, default=list(BENCHMARKS))
+    p.add_argument('--latency-ms', type=float, default=0.0, help='simulated latency per round-trip')
+    p.add_argument('--per-row-us', type=float, default=0.0, help='simulated transfer time per returned row')
+    p.add_argument('--sample', type=int, default=200, help='employees for the per-employee benchmarks')
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--json', help='also write the results to this file')
+    p.add_argument('--worker', choices=BENCHMARKS, help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_one(args.worker, args.sizes[0], args.latency_ms, args.per_row_us, args.sample, args.seed)))
+        return
+
+    results = []
+    for size in args.sizes:
+        for bench in args.benchmarks:
+            r = _run_isolated(bench, size, args)
+            results.append(r)
+            print(json.dumps({k: v for k, v in r.items() if k != 'rows'}), file=sys.stderr)
+    _print_table(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
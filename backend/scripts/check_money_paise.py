@@ -0,0 +1,155 @@
+# backend/scripts/check_money_paise.py
+"""
+Property check: build_payslip in integer-paise mode (PAYROLL_MONEY_MODE=paise)
+produces byte-identical payslips (JSON, computed_at aside) to the Decimal
+mode. Inputs are generated at random with a bias towards rounding edges:
+half-paise ties, sub-paise percentages, negative amounts, proration,
+overlapping and fractional tax slabs, formulas with division, and cycles.
+Nothing is read from Supabase.
+
+Usage:
+  cd backend
+  python scripts/check_money_paise.py [cases] [seed]
+"""
+import json
+import os
+import random
+import sys
+from decimal import Decimal
+
+# runnable as `python scripts/<name>.py` from backend/, with no live Supabase project
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.bench import fake_supabase  # noqa: E402
+
+fake_supabase.install()
+
+from app.payroll import money, services  # noqa: E402
+from app.payroll.refdata import TaxSlabTable, ProfessionalTaxBands  # noqa: E402
+from app.payroll.structure import get_plan  # noqa: E402
+
+FORMULAS = [
+    'MONTHLY_CTC - BASIC - HRA',
+    'BASIC / 3',
+    'BASIC * 0.0833 + 0.005',
+    '(BASIC + HRA) / 7 - 1',
+    'MONTHLY_CTC % 1000',
+    'BASIC // 12',
+    '2 ** 3 * HRA / 11',
+    'HRA / (BASIC - BASIC)',  # division by zero -> 0
+    'X1 + 1',                 # cycle with X1 -> 0
+]
+
+
+def amount(rnd, lo, hi):
+    v = rnd.uniform(lo, hi)
+    return rnd.choice([round(v), round(v, 2), round(v, 3), round(v, 2) + 0.005, round(v, 4)])
+
+
+def percent(rnd):
+    return str(rnd.choice([0, 12, 40, 50, 12.5, 33.333, 4.81, 13.61, 0.005, -5, 100, rnd.uniform(0, 60)]))
+
+
+def random_catalog(rnd):
+    cat = [
+        {'id': 1, 'code': 'BASIC', 'type': 'EARNING', 'calc_method': 'PERCENT_OF', 'calc_value': percent(rnd), 'ordering': 1},
+        {'id': 2, 'code': 'HRA', 'type': 'EARNING', 'calc_method': 'PERCENT_OF', 'calc_value': percent(rnd),
+         'base_component_code': 'BASIC', 'ordering': 2},
+        {'id': 3, 'code': 'PF', 'type': 'DEDUCTION', 'calc_method': 'PERCENT_OF', 'calc_value': percent(rnd),
+         'base_component_code': rnd.choice(['BASIC', 'HRA', 'MISSING']), 'ordering': 6},
+        {'id': 4, 'code': 'ER', 'type': 'EMPLOYER_CONTRIBUTION', 'calc_method': 'PERCENT_OF', 'calc_value': percent(rnd),
+         'base_component_code': 'BASIC', 'ordering': 7},
+        {'id': 5, 'code': 'MEAL', 'type': 'EARNING', 'is_taxable': False, 'calc_method': 'FIXED',
+         'calc_value': str(amount(rnd, -50, 3000)), 'ordering': 5},
+    ]
+    for i in range(rnd.randint(0, 3)):
+        cat.append({'id': 10 + i, 'code': f'X{i}', 'type': rnd.choice(['EARNING', 'DEDUCTION', 'EMPLOYER_CONTRIBUTION']),
+                    'is_taxable': rnd.random() < 0.8, 'calc_method': 'FORMULA', 'calc_value': rnd.choice(FORMULAS),
+                    'ordering': rnd.randint(1, 50)})
+    if rnd.random() < 0.2:
+        cat.append({'id': 20, 'code': 'BAD', 'type': 'EARNING', 'calc_method': 'FIXED', 'calc_value': 'abc', 'ordering': 9})
+    return cat
+
+
+def random_slabs(rnd):
+    edges = sorted(rnd.sample(range(0, 4000000, 25000), rnd.randint(1, 6)))
+    slabs = []
+    for i, frm in enumerate(edges):
+        slabs.append({'from_amount': frm if rnd.random() < 0.9 else frm + 0.005,
+                      'to_amount': edges[i + 1] if i + 1 < len(edges) else None,
+                      'rate_percent': rnd.choice([0, 5, 10, 12.5, 30, 33.33, 7.125, 0.001, -1])})
+    if rnd.random() < 0.3:
+        slabs.append({'from_amount': rnd.randint(0, 2000000), 'to_amount': None, 'rate_percent': 4})
+    return slabs
+
+
+def random_pt(rnd):
+    rules = [
+        {'min_monthly_salary': 0, 'max_monthly_salary': 7500, 'monthly_amount': 0},
+        {'min_monthly_salary': 7500.005, 'max_monthly_salary': 15000, 'monthly_amount': rnd.choice([175, 175.555, -0.004])},
+        {'min_monthly_salary': rnd.choice([15000.01, 12000]), 'max_monthly_salary': None, 'monthly_amount': 200},
+    ]
+    return ProfessionalTaxBands(rules) if rnd.random() < 0.5 else rules
+
+
+def random_bonuses(rnd):
+    out = []
+    for i in range(rnd.randint(0, 3)):
+        pct = rnd.random() < 0.5
+        out.append({'id': i, 'code': 'B', 'is_percentage': pct,
+                    'percent_of_component': rnd.choice(['BASIC', 'HRA', 'NOPE', None, 'BONUS_0']),
+                    'amount': rnd.choice([percent(rnd), amount(rnd, -100, 20000), None, 0, -0.001])})
+    return out
+
+
+def random_attendance(rnd):
+    r = rnd.random()
+    if r < 0.4:
+        return {}
+    wd = rnd.choice([0, 22, 30, 31, 26])
+    if r < 0.6:
+        return {'working_days': wd}
+    return {'working_days': wd, 'present_days': rnd.randint(0, max(wd, 1))}
+
+
+def payslip_json(ps):
+    ps = dict(ps)
+    ps.pop('computed_at', None)
+    return json.dumps(ps, sort_keys=False)
+
+
+def main():
+    cases = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rnd = random.Random(int(sys.argv[2]) if len(sys.argv) > 2 else 11)
+    bad = 0
+    for _ in range(cases):
+        catalog = random_catalog(rnd)
+        overrides = [{'component_id': 1, 'value_override': percent(rnd)}] if rnd.random() < 0.2 else []
+        plan = get_plan(services.build_comp_map(catalog, overrides))
+        slabs = random_slabs(rnd)
+        slabs = TaxSlabTable(slabs) if rnd.random() < 0.5 else slabs
+        pt = random_pt(rnd)
+        bonuses = random_bonuses(rnd)
+        attendance = random_attendance(rnd)
+        annual = Decimal(str(amount(rnd, 0, 8000000)))
+        if rnd.random() < 0.1:
+            annual = Decimal(rnd.randint(1000, 100000) * 12 + 6).scaleb(-2)  # monthly CTC ends in half a paisa
+
+        results = []
+        for mode in ('decimal', 'paise'):
+            money.MONEY_MODE = mode
+            try:
+                results.append(payslip_json(services.build_payslip('e1', 1, annual, plan, bonuses, slabs, pt, attendance)))
+            except Exception as ex:
+                results.append(f'error: {type(ex).__name__}')
+        if results[0] != results[1]:
+            bad += 1
+            if bad <= 5:
+                print('mismatch', annual, attendance, bonuses, '\n  decimal:', results[0], '\n  paise:  ', results[1])
+    money.MONEY_MODE = 'decimal'
+    if bad:
+        raise SystemExit(f"{bad}/{cases} payslips differ between the Decimal and paise modes")
+    print(f"OK: {cases} random payslips identical in Decimal and paise modes")
+
+
+if __name__ == "__main__":
+    main()
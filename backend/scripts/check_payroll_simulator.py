@@ -0,0 +1,154 @@
+# backend/scripts/check_payroll_simulator.py
+"""
+Parity check: the vectorised what-if simulator (app/payroll/simulator.py)
+must give exactly the payslips of the Decimal path (services.build_payslip /
+compute_annual_tax_from_slabs) for a regular month. Runs on random
+structures, CTCs, slabs and PT rules; nothing is read from Supabase.
+
+Usage:
+  cd backend
+  python scripts/check_payroll_simulator.py [rounds] [employees]
+"""
+import os
+import random
+import sys
+from decimal import Decimal
+
+import numpy as np
+
+# runnable as `python scripts/<name>.py` from backend/, with no live Supabase project
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.bench import fake_supabase  # noqa: E402
+
+fake_supabase.install()
+
+from app.payroll import services, simulator  # noqa: E402
+from app.payroll.refdata import TaxSlabTable, ProfessionalTaxBands  # noqa: E402
+from app.payroll.structure import get_plan  # noqa: E402
+
+
+def random_amount(rnd, lo, hi):
+    # sub-paise digits exercise the half-up rounding of _to_decimal
+    return round(rnd.uniform(lo, hi), rnd.choice([0, 2, 3]))
+
+
+def random_catalog(rnd, with_formula):
+    catalog = [
+        {'id': 1, 'code': 'BASIC', 'name': 'Basic', 'type': 'EARNING', 'calc_method': 'PERCENT_OF',
+         'calc_value': str(rnd.choice([35, 40, 45, 50, 33.333])), 'ordering': 1},
+        {'id': 2, 'code': 'HRA', 'name': 'HRA', 'type': 'EARNING', 'calc_method': 'PERCENT_OF',
+         'calc_value': str(rnd.choice([40, 50, 12.5])), 'base_component_code': 'BASIC', 'ordering': 2},
+        {'id': 3, 'code': 'PF', 'name': 'PF', 'type': 'DEDUCTION', 'calc_method': 'PERCENT_OF',
+         'calc_value': '12', 'base_component_code': 'BASIC', 'ordering': 6},
+        {'id': 4, 'code': 'EPF_ER', 'name': 'ER PF', 'type': 'EMPLOYER_CONTRIBUTION', 'calc_method': 'PERCENT_OF',
+         'calc_value': str(rnd.choice([12, 13.61])), 'base_component_code': 'BASIC', 'ordering': 7},
+        {'id': 5, 'code': 'MEAL', 'name': 'Meal', 'type': 'EARNING', 'is_taxable': False, 'calc_method': 'FIXED',
+         'calc_value': str(random_amount(rnd, 0, 3000)), 'ordering': 5},
+        {'id': 6, 'code': 'LOOP', 'name': 'Broken', 'type': 'EARNING', 'calc_method': 'PERCENT_OF',
+         'calc_value': '10', 'base_component_code': 'LOOP', 'ordering': 8},
+    ]
+    if with_formula:
+        catalog.append({'id': 7, 'code': 'SPECIAL', 'name': 'Special', 'type': 'EARNING', 'calc_method': 'FORMULA',
+                        'calc_value': 'MONTHLY_CTC - BASIC - HRA - MEAL', 'ordering': 4})
+    return catalog
+
+
+def random_slabs(rnd):
+    edges = sorted(rnd.sample(range(100000, 3000000, 50000), rnd.randint(2, 6)))
+    bounds = [0] + edges
+    slabs = [{'from_amount': bounds[i], 'to_amount': bounds[i + 1] if i + 1 < len(bounds) else None,
+              'rate_percent': rnd.choice([0, 5, 10, 12.5, 15, 20, 30, 33.33, 7.125])} for i in range(len(bounds))]
+    if rnd.random() < 0.3:
+        # overlapping slab: compute_annual_tax_from_slabs still sums every slab
+        slabs.append({'from_amount': rnd.choice(edges), 'to_amount': None, 'rate_percent': 4})
+    rnd.shuffle(slabs)
+    return slabs
+
+
+def random_pt(rnd):
+    return {
+        'KA': ProfessionalTaxBands([
+            {'min_monthly_salary': 0, 'max_monthly_salary': 14999, 'monthly_amount': 0},
+            {'min_monthly_salary': 15000, 'max_monthly_salary': None, 'monthly_amount': 200},
+        ]),
+        'MH': ProfessionalTaxBands([
+            {'min_monthly_salary': 0, 'max_monthly_salary': 7500, 'monthly_amount': 0},
+            {'min_monthly_salary': 7500.005, 'max_monthly_salary': 10000, 'monthly_amount': 175.5},
+            {'min_monthly_salary': 9000, 'max_monthly_salary': None, 'monthly_amount': 200},
+        ]),
+    }
+
+
+def random_workforce(rnd, n):
+    grades = [{'id': g, 'annual_ctc': random_amount(rnd, 150000, 4000000)} for g in range(1, 6)]
+    employees, assignments, overrides = [], [], []
+    for i in range(n):
+        eid = f'e{i:06d}'
+        employees.append({'id': eid, 'work_state': rnd.choice(['KA', 'MH', 'TN', None])})
+        if rnd.random() < 0.5:
+            ctc = random_amount(rnd, 100000, 6000000)
+            if rnd.random() < 0.1:
+                ctc = rnd.randint(10000, 500000) * 12 + 0.06  # monthly CTC ends in a half paisa
+            assignments.append({'id': f'a{i}', 'employee_id': eid, 'custom_annual_ctc': ctc, 'effective_from': '2025-04-01'})
+        else:
+            assignments.append({'id': f'a{i}', 'employee_id': eid, 'grade_id': rnd.randint(1, 5), 'effective_from': '2025-04-01'})
+        if rnd.random() < 0.15:
+            overrides.append({'id': f'o{i}', 'employee_id': eid, 'component_id': 1, 'value_override': str(rnd.choice([30, 45, 52.5]))})
+    return simulator.Workforce(employees, assignments, grades, overrides), employees, assignments, grades, overrides
+
+
+def check_tax(rnd, cases=20000):
+    bad = 0
+    for _ in range(cases):
+        slabs = random_slabs(rnd)
+        incomes = [Decimal(rnd.randint(0, 5_000_000_00)).scaleb(-2) for _ in range(8)]
+        vec = simulator.annual_tax(np.array([int(x.scaleb(2)) for x in incomes], dtype=np.int64), TaxSlabTable(slabs))
+        for x, got in zip(incomes, vec):
+            want = services.compute_annual_tax_from_slabs(x, slabs)
+            if int(want.scaleb(2)) != int(got):
+                bad += 1
+                print('tax mismatch', x, want, int(got) / 100, slabs)
+    return bad
+
+
+def check_payslips(rnd, n):
+    wf, employees, assignments, grades, overrides = random_workforce(rnd, n)
+    catalog = random_catalog(rnd, with_formula=rnd.random() < 0.5)
+    slabs = random_slabs(rnd)
+    pt = random_pt(rnd)
+    res = simulator.run_scenario(wf, catalog, TaxSlabTable(slabs), pt)
+
+    grade_by_id = {g['id']: g for g in grades}
+    assign_by_emp = {a['employee_id']: a for a in assignments}
+    bad = 0
+    for i, e in enumerate(employees):
+        a = assign_by_emp[e['id']]
+        annual = services.annual_ctc_from_assignment(a, grade_by_id.get(a.get('grade_id')))
+        plan = get_plan(services.build_comp_map(catalog, [o for o in overrides if o['employee_id'] == e['id']]))
+        ps = services.build_payslip(e['id'], 1, annual, plan, [], slabs, pt.get(e['work_state']) or [], {})
+        want = {
+            'gross': ps['gross_salary'], 'total_deductions': ps['total_deductions'], 'net': ps['net_salary'],
+            'employer_cost': ps['total_employer_cost'], 'income_tax': ps['breakdown']['INCOME_TAX']['amount'],
+            'professional_tax': ps['breakdown']['PROFESSIONAL_TAX']['amount'],
+        }
+        got = {k: int(res[k][i]) / 100 for k in want}
+        if got != want:
+            bad += 1
+            print('payslip mismatch', e['id'], annual, want, got)
+    return bad
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    rnd = random.Random(7)
+    bad = check_tax(rnd)
+    for _ in range(rounds):
+        bad += check_payslips(rnd, n)
+    if bad:
+        raise SystemExit(f"{bad} mismatches between the simulator and the Decimal path")
+    print(f"OK: simulator matches the Decimal path ({rounds} x {n} payslips, 20000 tax cases)")
+
+
+if __name__ == "__main__":
+    main()
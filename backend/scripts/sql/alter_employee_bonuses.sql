@@ -0,0 +1,4 @@
+-- Bonus eligibility lookups (app/payroll/bonus_eligibility.py) filter by
+-- employee and effective window for a payroll period.
+CREATE INDEX IF NOT EXISTS idx_employee_bonuses_employee_window
+ON employee_bonuses (employee_id, effective_from, effective_to);
@@ -0,0 +1,11 @@
+-- Incremental payroll recompute (app/payroll/services.run_payroll_chunk).
+-- Each draft payslip stores a hash of the inputs it was computed from;
+-- re-runs skip employees whose fingerprint is unchanged.
+ALTER TABLE payroll
+ADD COLUMN input_fingerprint TEXT;
+
+ALTER TABLE payroll_runs
+ADD COLUMN incremental BOOLEAN DEFAULT TRUE,
+ADD COLUMN skipped_count INT DEFAULT 0;
+
+COMMENT ON COLUMN payroll.input_fingerprint IS 'SHA-256 of the payslip inputs (structure, CTC, bonuses, slabs, PT, attendance); NULL forces recompute';
@@ -0,0 +1,22 @@
+-- Sharded, resumable payroll runs (app/payroll/executor.py).
+-- A run is a parent row; each shard of active employees is a child row
+-- pointing at it through parent_run_id and checkpointing its own progress.
+ALTER TABLE payroll_runs
+ADD COLUMN parent_run_id BIGINT REFERENCES payroll_runs(id) ON DELETE CASCADE,
+ADD COLUMN shard_index INT,
+ADD COLUMN shard_count INT,
+ADD COLUMN executor TEXT,
+ADD COLUMN employee_id_from UUID,
+ADD COLUMN employee_id_to UUID,
+ADD COLUMN last_employee_id UUID,
+ADD COLUMN total_count INT DEFAULT 0,
+ADD COLUMN processed_count INT DEFAULT 0,
+ADD COLUMN failed_count INT DEFAULT 0,
+ADD COLUMN errors JSONB DEFAULT '[]'::jsonb,
+ADD COLUMN heartbeat_at TIMESTAMPTZ;
+
+CREATE INDEX IF NOT EXISTS idx_payroll_runs_parent ON payroll_runs(parent_run_id, shard_index);
+
+COMMENT ON COLUMN payroll_runs.parent_run_id IS 'Set on shard rows: the run this shard belongs to';
+COMMENT ON COLUMN payroll_runs.last_employee_id IS 'Checkpoint: last employee id persisted by this shard';
+COMMENT ON COLUMN payroll_runs.heartbeat_at IS 'Last checkpoint time; stale IN_PROGRESS shards are resumable';
@@ -0,0 +1,10 @@
+-- Period range reads of the set-based metrics engine (app/performance/metrics.py).
+CREATE INDEX IF NOT EXISTS idx_tasks_assigned_at ON tasks (assigned_at);
+CREATE INDEX IF NOT EXISTS idx_task_confirmations_created_at ON task_confirmations (created_at) WHERE confirmed;
+CREATE INDEX IF NOT EXISTS idx_task_confirmations_task_id ON task_confirmations (task_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance (date);
+
+-- Keyset pages of an employee's tasks (services.list_tasks_for_employee)
+-- and the latest progress of each task on the page.
+CREATE INDEX IF NOT EXISTS idx_tasks_assignee_created ON tasks (assigned_to, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_task_updates_task_created ON task_updates (task_id, created_at DESC);
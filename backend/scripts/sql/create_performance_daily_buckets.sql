@@ -0,0 +1,96 @@
+-- Per-employee daily performance buckets (app/performance/buckets.py).
+-- Task events add to them through bump_performance_daily(); window metrics
+-- are sums over at most one row per employee per day.
+CREATE TABLE IF NOT EXISTS performance_daily_buckets (
+    employee_id UUID NOT NULL REFERENCES employees(id),
+    day DATE NOT NULL,
+    tasks_assigned INTEGER NOT NULL DEFAULT 0,
+    tasks_completed INTEGER NOT NULL DEFAULT 0,
+    completion_days_total INTEGER NOT NULL DEFAULT 0,
+    progress_sum NUMERIC NOT NULL DEFAULT 0,
+    progress_updates INTEGER NOT NULL DEFAULT 0,
+    attendance_present INTEGER NOT NULL DEFAULT 0,
+    attendance_total INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (employee_id, day)
+);
+
+CREATE INDEX IF NOT EXISTS idx_performance_daily_buckets_day ON performance_daily_buckets (day);
+
+-- Atomic increment of one bucket (creates it on first use).
+CREATE OR REPLACE FUNCTION bump_performance_daily(
+    p_employee_id UUID,
+    p_day DATE,
+    p_tasks_assigned INTEGER DEFAULT 0,
+    p_tasks_completed INTEGER DEFAULT 0,
+    p_completion_days_total INTEGER DEFAULT 0,
+    p_progress_sum NUMERIC DEFAULT 0,
+    p_progress_updates INTEGER DEFAULT 0,
+    p_attendance_present INTEGER DEFAULT 0,
+    p_attendance_total INTEGER DEFAULT 0
+) RETURNS VOID LANGUAGE SQL AS $$
+    INSERT INTO performance_daily_buckets AS b (
+        employee_id, day, tasks_assigned, tasks_completed, completion_days_total,
+        progress_sum, progress_updates, attendance_present, attendance_total, updated_at
+    ) VALUES (
+        p_employee_id, p_day, p_tasks_assigned, p_tasks_completed, p_completion_days_total,
+        p_progress_sum, p_progress_updates, p_attendance_present, p_attendance_total, NOW()
+    )
+    ON CONFLICT (employee_id, day) DO UPDATE SET
+        tasks_assigned = b.tasks_assigned + EXCLUDED.tasks_assigned,
+        tasks_completed = b.tasks_completed + EXCLUDED.tasks_completed,
+        completion_days_total = b.completion_days_total + EXCLUDED.completion_days_total,
+        progress_sum = b.progress_sum + EXCLUDED.progress_sum,
+        progress_updates = b.progress_updates + EXCLUDED.progress_updates,
+        attendance_present = b.attendance_present + EXCLUDED.attendance_present,
+        attendance_total = b.attendance_total + EXCLUDED.attendance_total,
+        updated_at = NOW();
+$$;
+
+-- rebuild_buckets(): replace the buckets of [p_start, p_end] with p_rows in
+-- one transaction. Buckets bumped at or after p_since (when the rebuild
+-- started reading its sources) are left alone; returns how many.
+CREATE OR REPLACE FUNCTION replace_performance_daily_buckets(
+    p_start DATE,
+    p_end DATE,
+    p_rows JSONB,
+    p_since TIMESTAMPTZ
+) RETURNS INTEGER LANGUAGE plpgsql AS $$
+DECLARE
+    skipped INTEGER;
+BEGIN
+    SELECT count(*) INTO skipped FROM performance_daily_buckets
+    WHERE day BETWEEN p_start AND p_end AND updated_at >= p_since;
+
+    DELETE FROM performance_daily_buckets b
+    WHERE b.day BETWEEN p_start AND p_end AND b.updated_at < p_since
+      AND NOT EXISTS (
+          SELECT 1 FROM jsonb_to_recordset(p_rows) AS r(employee_id UUID, day DATE)
+          WHERE r.employee_id = b.employee_id AND r.day = b.day
+      );
+
+    INSERT INTO performance_daily_buckets AS b (
+        employee_id, day, tasks_assigned, tasks_completed, completion_days_total,
+        progress_sum, progress_updates, attendance_present, attendance_total, updated_at
+    )
+    SELECT r.employee_id, r.day, r.tasks_assigned, r.tasks_completed, r.completion_days_total,
+           r.progress_sum, r.progress_updates, r.attendance_present, r.attendance_total, NOW()
+    FROM jsonb_to_recordset(p_rows) AS r(
+        employee_id UUID, day DATE, tasks_assigned INTEGER, tasks_completed INTEGER,
+        completion_days_total INTEGER, progress_sum NUMERIC, progress_updates INTEGER,
+        attendance_present INTEGER, attendance_total INTEGER
+    )
+    ON CONFLICT (employee_id, day) DO UPDATE SET
+        tasks_assigned = EXCLUDED.tasks_assigned,
+        tasks_completed = EXCLUDED.tasks_completed,
+        completion_days_total = EXCLUDED.completion_days_total,
+        progress_sum = EXCLUDED.progress_sum,
+        progress_updates = EXCLUDED.progress_updates,
+        attendance_present = EXCLUDED.attendance_present,
+        attendance_total = EXCLUDED.attendance_total,
+        updated_at = NOW()
+    WHERE b.updated_at < p_since;
+
+    RETURN skipped;
+END;
+$$;
@@ -4,26 +4,47 @@ Usage:
   cd backend
   .venv\Scripts\activate  # windows
   pip install -r requirements.txt  # ensure sklearn, pandas, joblib added
-  python scripts/train_performance_model.py
+  python scripts/train_performance_model.py [--n-jobs N] [--warm-start [--add-trees 50]] [--full-refresh]
+
+performance_metrics is synced page by page into a local Parquet cache
+(app/performance/feature_cache.py) that only fetches rows added since the
+last run. --warm-start continues the latest published model with more
+trees instead of refitting. Timings and peak memory end up in
+ml_models.metrics["training"].
 """
-import os
-import pandas as pd
+import argparse
+import time
 from app.supabase_client import supabase
-from app.performance.utils import extract_data
-from app.performance.ml_model import train_supervised, train_unsupervised
-import getpass
+from app.performance import feature_cache
+from app.performance.ml_model import load_model, train_supervised, train_unsupervised, TRAIN_N_JOBS, WARM_START_TREES
 import json
 
-# Fetch performance_metrics from Supabase
-def fetch_metrics():
-    res = supabase.table("performance_metrics").select("*").execute()
-    data = extract_data(res) or []
-    df = pd.DataFrame(data)
-    return df
+# Fetch performance_metrics from Supabase (incrementally, through the feature cache)
+def fetch_metrics(full_refresh: bool = False):
+    t0 = time.perf_counter()
+    synced = feature_cache.sync(full_refresh=full_refresh)
+    df = synced["frame"]
+    stats = {"rows": len(df), "new_rows": synced["new_rows"], "cached": synced["cached"],
+             "parts": synced["parts"], "seconds": round(time.perf_counter() - t0, 3)}
+    return df, stats
 
 def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--n-jobs", type=int, default=TRAIN_N_JOBS, help="cores for fitting (-1: all)")
+    p.add_argument("--warm-start", action="store_true", help="add trees to the latest model instead of refitting")
+    p.add_argument("--add-trees", type=int, default=WARM_START_TREES)
+    p.add_argument("--full-refresh", action="store_true", help="rebuild the feature cache from scratch")
+    args = p.parse_args()
+
     print("Fetching metrics from Supabase...")
-    df = fetch_metrics()
+    df, extraction = fetch_metrics(args.full_refresh)
+    print("Extraction:", extraction)
+    previous = None
+    if args.warm_start:
+        try:
+            previous = load_model()
+        except FileNotFoundError:
+            print("No previous model -> training from scratch")
     if df.empty:
         print("No metrics found. Run compute-metrics endpoint or seed data before training.")
         return
@@ -33,18 +54,21 @@ def main():
         # pick features - ensure numeric columns exist
         feature_cols = ["tasks_assigned", "tasks_completed", "avg_task_completion_days", "attendance_rate"]
         df_feat = df[feature_cols + ["label"]].dropna()
-        meta = train_supervised(df_feat, label_col="label")
+        meta = train_supervised(df_feat, label_col="label", n_jobs=args.n_jobs,
+                                warm_start_from=previous, add_trees=args.add_trees)
     else:
         print("No label column -> running unsupervised training (IsolationForest)")
         feature_cols = ["tasks_assigned", "tasks_completed", "avg_task_completion_days", "attendance_rate"]
         df_feat = df[feature_cols].fillna(0)
-        meta = train_unsupervised(df_feat)
+        meta = train_unsupervised(df_feat, n_jobs=args.n_jobs, warm_start_from=previous, add_trees=args.add_trees)
+    meta.setdefault("metrics", {}).setdefault("training", {})["extraction"] = extraction
     print("Training finished. Meta:", meta)
     # Persist model metadata to Supabase table ml_models
     model_record = {
         "name": "performance_model",
-        "version": meta.get("trained_at", ""),
-        "model_path": os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app", "models", "perf_model.pkl")),
+        "version": meta.get("version", ""),
+        # versioned store directory (app/performance/model_store.py)
+        "model_path": meta.get("model_path"),
         "notes": json.dumps(meta.get("metrics", {})),
         "metrics": meta.get("metrics", {})
     }